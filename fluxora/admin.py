@@ -47,6 +47,24 @@ from .models import (
     MLModel, MLTrainingRun, MLCityPriceCache,
     # Activity & Settings
     ActivityLog, BuildingSetting,
+    # Background jobs
+    BillingJob,
+    # Dashboard rollups
+    BuildingStats,
+    # Invoice reminders
+    InvoiceReminder,
+    # Notification outbox
+    NotificationOutbox,
+    # Realtime building events
+    BuildingEvent,
+    # Log archive
+    ArchivePartition,
+    # Lift current status
+    LiftCurrentStatus,
+    # Gate traffic rollups
+    GateTrafficRollup,
+    # Recurring bookings
+    RecurringBooking, RecurringBookingException,
 )
 
 
@@ -78,6 +96,12 @@ class OptionInline(admin.TabularInline):
     fields = ('option_text',)
 
 
+class RecurringBookingExceptionInline(admin.TabularInline):
+    model = RecurringBookingException
+    extra = 0
+    fields = ('occurrence_start', 'action', 'start_time', 'end_time')
+
+
 class DocumentACLUserInline(admin.TabularInline):
     model = DocumentACLUser
     extra = 0
@@ -333,8 +357,8 @@ class EmergencyAdmin(admin.ModelAdmin):
 
 @admin.register(IntercomDevice)
 class IntercomDeviceAdmin(admin.ModelAdmin):
-    list_display = ('device_name', 'building', 'ip_address')
-    list_filter = ('building',)
+    list_display = ('device_name', 'building', 'ip_address', 'is_online', 'last_seen_at')
+    list_filter = ('building', 'is_online')
     search_fields = ('device_name', 'ip_address')
     autocomplete_fields = ('building',)
 
@@ -449,6 +473,13 @@ class GateEventAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
     readonly_fields = ('timestamp',)
 
+    # Append-only: the traffic rollups count events as they arrive (see services.gates)
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(LiftStatusLog)
 class LiftStatusLogAdmin(admin.ModelAdmin):
@@ -584,3 +615,80 @@ class OptionAdmin(admin.ModelAdmin):
     list_display = ('poll', 'option_text')
     search_fields = ('option_text', 'poll__question')
     autocomplete_fields = ('poll',)
+
+
+@admin.register(BillingJob)
+class BillingJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'building', 'status', 'processed', 'total', 'created_count', 'skipped_count', 'created_at')
+    list_filter = ('job_type', 'status', 'building')
+    autocomplete_fields = ('building',)
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'updated_at', 'finished_at')
+
+
+@admin.register(BuildingStats)
+class BuildingStatsAdmin(admin.ModelAdmin):
+    list_display = ('building', 'invoices_count', 'payments_sum', 'open_tickets', 'bookings_count', 'occupied_units', 'refreshed_at')
+    autocomplete_fields = ('building',)
+    readonly_fields = ('refreshed_at', 'updated_at')
+
+
+@admin.register(InvoiceReminder)
+class InvoiceReminderAdmin(admin.ModelAdmin):
+    list_display = ('invoice', 'recipient', 'status', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('invoice__invoice_number', 'recipient')
+    autocomplete_fields = ('invoice',)
+    date_hierarchy = 'sent_at'
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'recipient', 'building', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('channel', 'status', 'building')
+    search_fields = ('recipient', 'subject')
+    autocomplete_fields = ('building', 'resident')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'sent_at', 'locked_at')
+
+
+@admin.register(BuildingEvent)
+class BuildingEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'building', 'kind', 'action', 'object_id', 'created_at')
+    list_filter = ('kind', 'action', 'building')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at',)
+
+
+@admin.register(ArchivePartition)
+class ArchivePartitionAdmin(admin.ModelAdmin):
+    list_display = ('source', 'building', 'month', 'row_count', 'path', 'updated_at')
+    list_filter = ('source', 'building')
+    date_hierarchy = 'month'
+    readonly_fields = ('source', 'building', 'month', 'path', 'row_count', 'min_ts', 'max_ts', 'created_at', 'updated_at')
+
+
+@admin.register(LiftCurrentStatus)
+class LiftCurrentStatusAdmin(admin.ModelAdmin):
+    list_display = ('building', 'asset', 'status', 'since', 'last_reported_at')
+    list_filter = ('status', 'building')
+    autocomplete_fields = ('building', 'asset')
+    readonly_fields = ('status', 'since', 'last_reported_at', 'last_log_id')
+
+
+@admin.register(GateTrafficRollup)
+class GateTrafficRollupAdmin(admin.ModelAdmin):
+    list_display = ('building', 'period', 'bucket', 'opens', 'closes')
+    list_filter = ('period', 'building')
+    date_hierarchy = 'bucket'
+    readonly_fields = ('building', 'period', 'bucket', 'opens', 'closes')
+
+
+@admin.register(RecurringBooking)
+class RecurringBookingAdmin(admin.ModelAdmin):
+    list_display = ('resource', 'resident', 'frequency', 'interval', 'weekdays', 'start_time', 'end_time', 'until', 'status')
+    list_filter = ('status', 'frequency', 'resource__building')
+    search_fields = ('resident__user__name', 'resource__name', 'purpose')
+    autocomplete_fields = ('resource', 'resident')
+    inlines = [RecurringBookingExceptionInline]
+    readonly_fields = ('created_at',)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class FluxoraConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fluxora'
+
+    def ready(self):
+        # Connect signal receivers (role/device/slot caches, dashboard rollups, chat counters, event stream,
+        # lift status, gate rollups)
+        from .services import bookings, chat, events, gates, intercom, lifts, roles, stats  # noqa: F401
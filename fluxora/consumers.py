@@ -1,4 +1,11 @@
 # fluxora/consumers.py
+import asyncio
+import uuid
+from collections import deque
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
 try:
     from channels.generic.websocket import AsyncJsonWebsocketConsumer  # type: ignore
 except Exception:
@@ -10,41 +17,287 @@ except Exception:
         async def close(self):
             pass
 
+from .services.chat import (
+    chat_resident, chat_topic, database_sync_to_async, mark_read, message_buffer, room_history, ws_counters,
+)
+from .services import events
+from .services.ratelimit import TokenBucket
+
+
+class OutboundBuffer:
+    """
+    Bounded per-connection send queue, drained by its own task.
+
+    Channel-layer handlers only enqueue, so a client that reads slowly never stalls the
+    consumer's receive loop (or, with it, the channel-layer capacity for the room). When the
+    queue is full the oldest frame is dropped and the client gets a ``{"type": "gap"}`` frame
+    with the count before the next delivery, so it can refetch history. Frames put with a
+    ``coalesce_key`` replace a queued frame with the same key instead of queueing again.
+    """
+
+    def __init__(self, send, maxsize: int = 200):
+        self._send = send
+        self.maxsize = maxsize
+        self._queue = deque()  # (coalesce_key, frame)
+        self._gap = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def put(self, frame: dict, coalesce_key=None) -> None:
+        if coalesce_key is not None:
+            for i, (key, _) in enumerate(self._queue):
+                if key == coalesce_key:
+                    self._queue[i] = (key, frame)
+                    ws_counters['coalesced'] += 1
+                    return
+        if len(self._queue) >= self.maxsize:
+            self._queue.popleft()
+            self._gap += 1
+            ws_counters['dropped_outbound'] += 1
+        self._queue.append((coalesce_key, frame))
+        ws_counters['max_outbound_depth'] = max(ws_counters['max_outbound_depth'], len(self._queue))
+        self._wake.set()
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._queue:
+                if self._gap:
+                    dropped, self._gap = self._gap, 0
+                    await self._send({'type': 'gap', 'dropped': dropped})
+                _, frame = self._queue.popleft()
+                await self._send(frame)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
 class ChatConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope.get('url_route', {}).get('kwargs', {}).get('room_id')
-        self.group_name = f"chat_{self.room_id}"
+        self.group_name = chat_topic(self.room_id)
+        # Per-connection inbound limit; frames over it are dropped, not relayed
+        self.bucket = TokenBucket(getattr(settings, 'CHAT_RATE_PER_SEC', 5), getattr(settings, 'CHAT_RATE_BURST', 10))
+        self.throttle_noticed = False
+        self.outbound = OutboundBuffer(self.send_json, getattr(settings, 'CHAT_SEND_QUEUE', 200))
+        # Only residents of the room's building may read or post; the sender name comes from
+        # their record, never from the client
+        try:
+            resident = await database_sync_to_async(chat_resident)(self.scope.get('user'), self.room_id)
+        except Exception:
+            resident = None
+        if resident is None:
+            await self.close(code=4403)
+            return
+        self.resident_id, self.sender = resident
         try:
             await self.channel_layer.group_add(self.group_name, self.channel_name)
         except Exception:
             pass
         await self.accept()
+        # Recent history from the per-room ring buffer (no queries once the room is warm)
+        try:
+            await self.send_json({'type': 'backlog', 'messages': await room_history.backlog(self.room_id)})
+        except Exception:
+            pass
+        self.outbound.start()
+        ws_counters['connections_open'] += 1
 
     async def disconnect(self, close_code):
         try:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
         except Exception:
             pass
+        outbound = getattr(self, 'outbound', None)
+        if outbound is not None and outbound.running:
+            await outbound.close()
+            ws_counters['connections_open'] -= 1
+        # Don't let this connection's last messages wait for the next timed flush
+        try:
+            await message_buffer.flush()
+        except Exception:
+            pass
 
     async def receive_json(self, content, **kwargs):
-        # Expected payload: {"type":"message", "text":"...", "sender":"..."}
+        # Expected payload: {"type":"message", "text":"..."}
+        # or {"type":"read", "message_id": N} (message_id optional: everything so far)
+        ws_counters['frames_in'] += 1
+        if not self.bucket.try_acquire():
+            ws_counters['throttled'] += 1
+            if not self.throttle_noticed:
+                # One notice per throttled burst; re-armed by the next accepted frame
+                self.throttle_noticed = True
+                self.outbound.put({'type': 'throttled', 'retry_after': round(self.bucket.wait_time(), 3)})
+            return
+        self.throttle_noticed = False
         msg_type = content.get('type')
+        if msg_type == 'read' and self.resident_id is not None:
+            # Persist our own pending frames first so they are not counted as unread later
+            await message_buffer.flush()
+            try:
+                member = await database_sync_to_async(mark_read)(self.room_id, self.resident_id, content.get('message_id'))
+            except (TypeError, ValueError):
+                member = None
+            if member is not None:
+                self.outbound.put({
+                    'type': 'read',
+                    'last_read_message_id': member.last_read_message_id,
+                    'unread_count': member.unread_count,
+                }, coalesce_key='read')
+            return
         if msg_type == 'message':
+            text = content.get('text')
+            # Lets every worker record the relayed frame in its room history exactly once
+            key = uuid.uuid4().hex
+            if text and self.resident_id is not None:
+                # Write-behind: the row is bulk-inserted by the buffer, not on this frame
+                message = message_buffer.add(self.room_id, self.resident_id, text, key=key)
+                room_history.record(self.room_id, text, self.sender, message, key=key)
+            ws_counters['relayed'] += 1
             try:
                 await self.channel_layer.group_send(
                     self.group_name,
                     {
                         'type': 'chat.message',
                         'text': content.get('text'),
-                        'sender': content.get('sender'),
+                        'sender': self.sender,
+                        'key': key,
                     }
                 )
             except Exception:
                 # Fallback: just echo back
-                await self.send_json({'text': content.get('text'), 'sender': content.get('sender')})
+                self.outbound.put({'text': content.get('text'), 'sender': self.sender})
 
     async def chat_message(self, event):
-        await self.send_json({
+        if event.get('text') and event.get('key'):
+            # No-op in the sending process, and for every consumer after the first elsewhere
+            room_history.record(self.room_id, event['text'], event.get('sender'), key=event['key'])
+        self.outbound.put({
             'text': event.get('text'),
             'sender': event.get('sender'),
         })
+
+    async def chat_persisted(self, event):
+        # Ids of stored messages, for history entries recorded from relayed frames
+        room_history.assign_ids(self.room_id, event.get('ids', ()))
+
+
+class BuildingEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live gate / lift / emergency / notification events for one building.
+
+    Events are coalesced into ``{"type": "events", "events": [...], "last_seq": N}`` frames
+    (every BUILDING_EVENTS_BATCH_MS or BUILDING_EVENTS_BATCH_MAX events). Clients narrow the
+    stream with ``?kinds=gate_event,lift_status`` or a ``{"type": "subscribe", "kinds": [...]}``
+    frame, and resume after a reconnect with ``?since=<last_seq>`` (or ``"since"`` in the
+    subscribe frame); missed events are replayed from the log before live ones.
+    """
+
+    async def connect(self):
+        self.building_id = self.scope.get('url_route', {}).get('kwargs', {}).get('building_id')
+        self.group_name = events.group_name(self.building_id)
+        self.viewer = await database_sync_to_async(events.building_viewer)(self.scope.get('user'), self.building_id)
+        if self.viewer is None:
+            await self.close(code=4403)
+            return
+        self.batch_delay = getattr(settings, 'BUILDING_EVENTS_BATCH_MS', 100) / 1000.0
+        self.batch_max = getattr(settings, 'BUILDING_EVENTS_BATCH_MAX', 50)
+        self.kinds = None  # None = every kind
+        self.last_seq = 0
+        self.pending = []
+        self.flush_handle = None
+        self.outbound = OutboundBuffer(self.send_json, getattr(settings, 'CHAT_SEND_QUEUE', 200))
+
+        params = parse_qs((self.scope.get('query_string') or b'').decode())
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.outbound.start()
+        await self.subscribe(
+            kinds=params['kinds'][0].split(',') if 'kinds' in params else None,
+            since=params['since'][0] if 'since' in params else None,
+        )
+
+    async def disconnect(self, close_code):
+        try:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        except Exception:
+            pass
+        if getattr(self, 'flush_handle', None) is not None:
+            self.flush_handle.cancel()
+        outbound = getattr(self, 'outbound', None)
+        if outbound is not None:
+            await outbound.close()
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'subscribe':
+            await self.subscribe(kinds=content.get('kinds'), since=content.get('since'))
+
+    async def subscribe(self, kinds=None, since=None):
+        kinds = [k for k in (kinds or []) if k in events.EVENT_KINDS] or None
+        self.kinds = set(kinds) if kinds else None
+        try:
+            since = int(since) if since not in (None, '') else None
+        except (TypeError, ValueError):
+            since = None
+        if since is None:
+            # Live only, starting now
+            self.last_seq = await database_sync_to_async(events.latest_seq)(self.building_id)
+        else:
+            # Channel-layer handlers don't run while we await here, so the replay and the live
+            # events queued meanwhile cannot interleave; seq filtering drops the overlap
+            frames, complete = await database_sync_to_async(events.events_since)(self.building_id, since, kinds)
+            if not complete:
+                latest = await database_sync_to_async(events.latest_seq)(self.building_id)
+                self.last_seq = max(latest, since)
+                self.outbound.put({'type': 'reset', 'reason': 'too_far_behind', 'last_seq': self.last_seq})
+            else:
+                self.last_seq = max([since] + [f['seq'] for f in frames])
+                frames = events.visible_frames(frames, self.viewer)
+                if frames:
+                    self.outbound.put({'type': 'events', 'replay': True, 'events': frames, 'last_seq': self.last_seq})
+        self.outbound.put({
+            'type': 'subscribed',
+            'kinds': sorted(self.kinds) if self.kinds else list(events.EVENT_KINDS),
+            'last_seq': self.last_seq,
+        })
+
+    async def building_events(self, event):
+        for frame in event.get('events', ()):
+            seq = frame.get('seq')
+            if seq is not None and seq <= self.last_seq:
+                continue
+            if seq is not None:
+                self.last_seq = seq
+            if self.kinds is not None and frame.get('kind') not in self.kinds:
+                continue
+            self.pending.extend(events.visible_frames([frame], self.viewer))
+        if len(self.pending) >= self.batch_max:
+            self.flush_events()
+        elif self.pending and self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.batch_delay, self.flush_events)
+
+    def flush_events(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.pending:
+            batch, self.pending = self.pending, []
+            self.outbound.put({'type': 'events', 'events': batch, 'last_seq': self.last_seq})
@@ -0,0 +1,136 @@
+# fluxora/fastpath.py
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Field classes whose to_representation() is a no-op for the Python value the DB adapter returns
+_IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.ReadOnlyField,
+)
+
+
+class Unsupported(Exception):
+    """The serializer uses a field the values() renderer cannot reproduce."""
+
+
+class CompiledSerializer:
+    """
+    A ModelSerializer flattened into a values()-based row renderer.
+
+    Each output field maps to one ``values()`` column plus an optional converter (the DRF
+    field's own ``to_representation``), so rendering a row is a dict build with no
+    get_attribute()/source walking. Nested ``many=True`` model serializers over a reverse FK
+    (e.g. ``Invoice.items``) are loaded with one extra query for the whole page.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        opts = model._meta
+        self.model = model
+        self.pk_key = opts.pk.attname
+        self.plan = []       # (output name, values() key, converter or None)
+        self.nested = []     # (output name, child CompiledSerializer, FK attname on the child)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if not source or source == '*' or '.' in source:
+                raise Unsupported(name)
+            if isinstance(field, serializers.ListSerializer):
+                if not isinstance(field.child, serializers.ModelSerializer):
+                    raise Unsupported(name)
+                relation = opts.get_field(source)
+                if not relation.one_to_many or not relation.auto_created:
+                    raise Unsupported(name)
+                self.nested.append((name, CompiledSerializer(field.child), relation.field.attname))
+                self.plan.append((name, None, None))
+            elif type(field) is serializers.PrimaryKeyRelatedField:
+                if field.pk_field is not None:
+                    raise Unsupported(name)
+                self.plan.append((name, opts.get_field(source).attname, None))
+            elif isinstance(field, (serializers.Serializer, serializers.RelatedField,
+                                    serializers.ManyRelatedField, serializers.SerializerMethodField)):
+                raise Unsupported(name)
+            else:
+                model_field = opts.get_field(source)
+                if not model_field.concrete or model_field.is_relation:
+                    raise Unsupported(name)
+                convert = None if type(field) in _IDENTITY_FIELDS else field.to_representation
+                self.plan.append((name, model_field.attname, convert))
+
+    def columns(self, extra=()) -> list:
+        cols = [self.pk_key]
+        for _, key, _ in self.plan:
+            if key is not None and key not in cols:
+                cols.append(key)
+        for key in extra:
+            if key not in cols:
+                cols.append(key)
+        return cols
+
+    def render(self, rows) -> list:
+        out = []
+        for row in rows:
+            item = {}
+            for name, key, convert in self.plan:
+                if key is None:
+                    item[name] = None  # nested placeholder, keeps field order
+                    continue
+                value = row[key]
+                item[name] = value if value is None or convert is None else convert(value)
+            out.append(item)
+        for name, child, fk_key in self.nested:
+            ids = [row[self.pk_key] for row in rows]
+            grouped = defaultdict(list)
+            if ids:
+                child_rows = (
+                    child.model.objects
+                    .filter(**{f'{fk_key}__in': ids})
+                    .order_by(child.pk_key)
+                    .values(*child.columns(extra=[fk_key]))
+                )
+                for child_row in child_rows:
+                    grouped[child_row[fk_key]].append(child_row)
+            for item, row in zip(out, rows):
+                item[name] = child.render(grouped.get(row[self.pk_key], []))
+        return out
+
+
+def compile_serializer(serializer):
+    """Return a CompiledSerializer for a (bound) ModelSerializer, or None when unsupported."""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    try:
+        return CompiledSerializer(serializer)
+    except (Unsupported, LookupError, AttributeError):
+        return None
+
+
+class FastListMixin:
+    """
+    Serve ``list`` through the compiled values() renderer; falls back to DRF when unsupported.
+
+    Output matches the regular serializer (including ``?fields=``/``?omit=``). Disable per
+    request with ``?fast=0``.
+    """
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        compiled = None
+        if self.fast_list and request.query_params.get('fast') != '0':
+            compiled = compile_serializer(self.get_serializer(many=True))
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        extra = [getattr(self, 'cursor_ordering_field', None) or getattr(self.pagination_class, 'ordering_field', None)]
+        concrete = {f.attname for f in queryset.model._meta.concrete_fields}
+        rows = queryset.values(*compiled.columns(extra=[c for c in extra if c in concrete]))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render(list(page)))
+        return Response(compiled.render(list(rows)))
@@ -0,0 +1,105 @@
+# fluxora/filters.py
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _split(value) -> list:
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def sparse_fieldset(request):
+    """
+    Parse ``?fields=a,b`` / ``?omit=c,d`` from a read request.
+
+    Returns ``(wanted, omitted)`` lists; both are empty for writes or when not requested.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return [], []
+    params = getattr(request, 'query_params', None)
+    if params is None:
+        params = getattr(request, 'GET', {})
+    return _split(params.get(FIELDS_PARAM)), _split(params.get(OMIT_PARAM))
+
+
+def _select_related_paths(tree, prefix='') -> list:
+    """Flatten Query.select_related ({'a': {'b': {}}}) into ['a__b'] lookup paths."""
+    paths = []
+    for name, children in tree.items():
+        path = f'{prefix}{name}'
+        nested = _select_related_paths(children, f'{path}__') if children else []
+        paths.extend(nested or [path])
+    return paths
+
+
+def _declared_sources(view, keep):
+    """
+    Model attributes read by the serializer's declared (non-model) fields that stay in the output.
+
+    A ``SerializerMethodField`` reads whatever its method reads, so it must list its columns in
+    ``Meta.field_sources``; returns None when one does not and the columns are unknown.
+    """
+    get_serializer_class = getattr(view, 'get_serializer_class', None)
+    serializer_class = get_serializer_class() if get_serializer_class else None
+    declared = getattr(serializer_class, '_declared_fields', {})
+    listed = getattr(getattr(serializer_class, 'Meta', None), 'field_sources', {})
+    sources = set()
+    for name, field in declared.items():
+        if not keep(name):
+            continue
+        if name in listed:
+            sources.update(listed[name])
+        elif isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            return None
+        else:
+            sources.add((field.source or name).split('.', 1)[0])
+    return sources
+
+
+class SparseFieldsetFilter:
+    """
+    Narrow the SELECT list to the fields a client asked for with ``?fields=``/``?omit=``.
+
+    Pairs with ``AutoModelSerializer``, which drops the same fields from the output, so unused
+    columns (large text bodies, FKs) are neither read from the database nor serialized.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        wanted, omitted = sparse_fieldset(request)
+        if not (wanted or omitted):
+            return queryset
+        opts = queryset.model._meta
+        concrete = {f.name for f in opts.concrete_fields}
+        # Columns the view itself needs regardless of the output (pk, keyset cursor column)
+        required = {opts.pk.name}
+        cursor_field = getattr(view, 'cursor_ordering_field', None) or getattr(
+            getattr(view, 'pagination_class', None), 'ordering_field', None)
+        if cursor_field in concrete:
+            required.add(cursor_field)
+        keep = (lambda name: name in wanted) if wanted else (lambda name: name not in omitted)
+        sources = _declared_sources(view, keep)
+        if sources is None:
+            return queryset
+        required |= sources & concrete
+
+        if wanted:
+            loaded = (set(wanted) & concrete) | required
+            queryset = self._prune_select_related(queryset, lambda root: root in loaded)
+            return queryset.only(*loaded)
+        deferred = (set(omitted) & concrete) - required
+        if not deferred:
+            return queryset
+        queryset = self._prune_select_related(queryset, lambda root: root not in deferred)
+        return queryset.defer(*deferred)
+
+    @staticmethod
+    def _prune_select_related(queryset, keep):
+        # A deferred FK cannot also be traversed with select_related()
+        tree = queryset.query.select_related
+        if not isinstance(tree, dict):
+            return queryset
+        paths = [p for p in _select_related_paths(tree) if keep(p.split('__', 1)[0])]
+        queryset = queryset.select_related(None)
+        return queryset.select_related(*paths) if paths else queryset
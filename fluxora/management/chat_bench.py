@@ -0,0 +1,67 @@
+# fluxora/management/chat_bench.py
+# Shared by the bench_websockets and chat_loadgen commands
+import json
+import uuid
+from contextlib import contextmanager
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+
+from fluxora.models import Building, ChatRoom, Resident, User
+from fluxora.services.bulk import bulk_insert
+
+
+class WebsocketClient(ApplicationCommunicator):
+    """
+    Websocket client driven straight through an ASGI app, like ``channels.testing.WebsocketCommunicator``
+    but without needing daphne installed.
+    """
+
+    def __init__(self, application, path, user=None):
+        super().__init__(application, {
+            'type': 'websocket', 'path': path, 'headers': [], 'query_string': b'', 'subprotocols': [],
+            'user': user,
+        })
+
+    async def connect(self, timeout=10):
+        """``(accepted, close code or None)``."""
+        await self.send_input({'type': 'websocket.connect'})
+        response = await self.receive_output(timeout)
+        if response['type'] == 'websocket.close':
+            return False, response.get('code', 1000)
+        return True, None
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self, timeout=10):
+        response = await self.receive_output(timeout)
+        return json.loads(response['text'])
+
+    async def disconnect(self, code=1000, timeout=10):
+        await self.send_input({'type': 'websocket.disconnect', 'code': code})
+        await self.wait(timeout)
+
+
+@contextmanager
+def bench_chat_rooms(count: int, label: str = 'chat'):
+    """
+    Throwaway building with ``count`` chat rooms and one resident allowed into all of them.
+
+    Yields ``(room_ids, user)``: ``user`` is an unsaved auth user whose email matches the
+    resident, ready for the websocket scope. The rows are committed (consumers read them from
+    other threads) and deleted on exit, messages included.
+    """
+    tag = uuid.uuid4().hex[:12]
+    email = f'bench-{label}-{tag}@example.com'
+    building = Building.objects.create(name=f'Bench {label} {tag}', address='Bench Road')
+    member = User.objects.create(name=f'Bench {label}', email=email, password_hash='x')
+    try:
+        Resident.objects.create(user=member, building=building)
+        rooms = bulk_insert(ChatRoom, [ChatRoom(name=f'bench-{i}', building=building) for i in range(count)])
+        yield [room.id for room in rooms], get_user_model()(username=f'bench-{label}-{tag}', email=email)
+    finally:
+        # Rooms take their messages and members with them, the user its resident row
+        ChatRoom.objects.filter(building=building).delete()
+        member.delete()
+        building.delete()
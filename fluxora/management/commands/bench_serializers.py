@@ -0,0 +1,77 @@
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fluxora.fastpath import compile_serializer
+from fluxora.models import (
+    User, Building, Resident, Invoice, InvoiceItem, Ticket, Notification,
+)
+from fluxora.views import InvoiceSerializer, NotificationSerializer, TicketSerializer
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark DRF list serialization vs. the compiled values() renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page (e.g. 20 or 100)')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            self._seed(rows)
+            cases = [
+                ('invoices', Invoice.objects.order_by('-created_at'), InvoiceSerializer),
+                ('tickets', Ticket.objects.order_by('-created_at'), TicketSerializer),
+                ('notifications', Notification.objects.order_by('-sent_at'), NotificationSerializer),
+            ]
+            for label, qs, serializer_class in cases:
+                compiled = compile_serializer(serializer_class())
+                page = qs[:rows]
+                drf = self._time(repeat, lambda: serializer_class(list(page), many=True).data)
+                fast = self._time(repeat, lambda: compiled.render(list(page.values(*compiled.columns()))))
+                self.stdout.write(
+                    f"{label:>13} x{rows}: drf p50={statistics.median(drf):.2f}ms  "
+                    f"fast p50={statistics.median(fast):.2f}ms  "
+                    f"speedup={statistics.median(drf) / max(statistics.median(fast), 1e-9):.1f}x"
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def _seed(self, rows):
+        user = User.objects.create(name='Bench', email='bench-serializers@example.com', password_hash='x')
+        building = Building.objects.create(name='Bench Tower', address='Bench Road')
+        resident = Resident.objects.create(user=user, building=building)
+        invoices = Invoice.objects.bulk_create([
+            Invoice(invoice_number=f'BENCH-{i}', resident=resident, building=building, amount=Decimal('2150.00'),
+                    due_date=date(2025, 1, 1) + timedelta(days=i % 28))
+            for i in range(rows)
+        ])
+        if invoices[0].pk is None:
+            invoices = list(Invoice.objects.filter(invoice_number__startswith='BENCH-'))
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=inv, description=desc, unit_price=amount, total_amount=amount)
+            for inv in invoices
+            for desc, amount in (('Service', Decimal('2000')), ('Water', Decimal('150')))
+        ])
+        Ticket.objects.bulk_create([
+            Ticket(building=building, resident=resident, category='Plumbing', description='Leak ' * 40)
+            for _ in range(rows)
+        ])
+        Notification.objects.bulk_create([
+            Notification(building=building, resident=resident, type='bill', message='Invoice due soon')
+            for _ in range(rows)
+        ])
+
+    @staticmethod
+    def _time(repeat, fn):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
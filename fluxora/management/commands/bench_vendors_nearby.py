@@ -0,0 +1,116 @@
+import math
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fluxora.models import Service, Vendor
+from fluxora.services import geo
+from fluxora.views import NEARBY_DEFAULT_LIMIT, VendorSerializer
+
+
+class Command(BaseCommand):
+    help = "Benchmark VendorViewSet.nearby (grid-cell index vs. full scan) on synthetic vendors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=1_000_000, help='Synthetic vendors to insert')
+        parser.add_argument('--queries', type=int, default=200, help='Indexed nearby queries to time')
+        parser.add_argument('--scan-queries', type=int, default=3, help='Full-scan queries to time (slow)')
+        parser.add_argument('--radius-km', type=float, default=5.0)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Roughly the extent of Bangladesh
+        lat_range, lng_range = (20.6, 26.6), (88.0, 92.7)
+
+        with transaction.atomic():
+            service = Service.objects.create(name='bench-nearby')
+            started = time.perf_counter()
+            self._insert_vendors(service, options['vendors'], rng, lat_range, lng_range)
+            self.stdout.write(f"Inserted {options['vendors']} vendors in {time.perf_counter() - started:.1f}s")
+
+            points = [(rng.uniform(*lat_range), rng.uniform(*lng_range)) for _ in range(max(options['queries'], options['scan_queries']))]
+            radius = options['radius_km']
+            qs = Vendor.objects.filter(service=service)
+
+            scan = [self._timed(self._full_scan, qs, lat, lng, radius) for lat, lng in points[:options['scan_queries']]]
+            indexed = [self._timed(self._indexed, qs, lat, lng, radius) for lat, lng in points[:options['queries']]]
+            scan_ms = [ms for ms, _ in scan]
+            indexed_ms = [ms for ms, _ in indexed]
+
+            # Both strategies must agree on the result set
+            for (_, scan_hits), (_, hits) in zip(scan, indexed):
+                assert [pk for _, pk in scan_hits] == [pk for _, pk in hits]
+
+            self._report('full scan', scan_ms)
+            self._report('grid index', indexed_ms)
+            self.stdout.write(f"avg hits/query: {statistics.mean(len(hits) for _, hits in indexed):.1f}")
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def _insert_vendors(self, service, count, rng, lat_range, lng_range, batch_size=5000):
+        for offset in range(0, count, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, count)):
+                lat = Decimal(f'{rng.uniform(*lat_range):.6f}')
+                lng = Decimal(f'{rng.uniform(*lng_range):.6f}')
+                lat_cell, lng_cell = geo.geo_cell(lat, lng)
+                batch.append(Vendor(service=service, name=f'bench-{i}', latitude=lat, longitude=lng,
+                                    lat_cell=lat_cell, lng_cell=lng_cell))
+            # bulk_create skips Vendor.save(), so cells are filled in above
+            Vendor.objects.bulk_create(batch)
+
+    @staticmethod
+    def _full_scan(qs, lat, lng, radius_km):
+        """
+        The pre-index endpoint body: load every vendor with coordinates as a model instance,
+        a pure-math haversine per row, then serialize every hit.
+        """
+        def haversine(lat1, lon1, lat2, lon2):
+            R = 6371.0
+            phi1, phi2 = math.radians(lat1), math.radians(lat2)
+            dphi = math.radians(lat2 - lat1)
+            dlambda = math.radians(lon2 - lon1)
+            a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+            return 2 * R * math.asin(math.sqrt(a))
+
+        results = []
+        for v in qs.filter(latitude__isnull=False, longitude__isnull=False):
+            d = haversine(lat, lng, float(v.latitude), float(v.longitude))
+            if d <= radius_km:
+                results.append((d, v))
+        results.sort(key=lambda x: x[0])
+        VendorSerializer([v for _, v in results], many=True).data
+        return [(d, v.pk) for d, v in results]
+
+    @staticmethod
+    def _indexed(qs, lat, lng, radius_km):
+        """The current endpoint body: grid-cell lookup, then serialize the first page."""
+        hits = geo.nearby(qs, lat, lng, radius_km)
+        page = hits[:NEARBY_DEFAULT_LIMIT]
+        vendors = qs.select_related('service', 'building').in_bulk([pk for _, pk in page])
+        [VendorSerializer(vendors[pk]).data for _, pk in page]
+        return hits
+
+    @staticmethod
+    def _timed(fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        return (time.perf_counter() - started) * 1000, result
+
+    def _report(self, label, samples):
+        if not samples:
+            return
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(
+            f"{label:>10}: n={len(samples)} mean={statistics.mean(samples):.2f}ms "
+            f"p50={statistics.median(samples):.2f}ms p95={p95:.2f}ms"
+        )
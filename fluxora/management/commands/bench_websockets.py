@@ -0,0 +1,220 @@
+import asyncio
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from fluxora.management.chat_bench import WebsocketClient, bench_chat_rooms
+from fluxora.routing import websocket_urlpatterns
+from fluxora.services.chat import message_buffer, ws_counters
+
+
+def percentile(samples: list, pct: int) -> float:
+    """``pct``-th percentile of sorted ``samples`` (0.0 when empty)."""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return round(samples[0], 3)
+    return round(statistics.quantiles(samples, n=100)[pct - 1], 3)
+
+
+class BenchClient:
+    """One websocket client on a room, timing every relayed frame it receives."""
+
+    def __init__(self, communicator, room):
+        self.communicator = communicator
+        self.room = room
+        self.latencies = []  # ms, send -> receive
+        self.gaps = 0
+        self.throttled = 0
+        self.task = None
+
+    async def read(self):
+        while True:
+            frame = await self.communicator.receive_json_from(timeout=3600)
+            received = time.perf_counter_ns()
+            kind = frame.get('type')
+            if kind is None:
+                sent = int(frame['text'].split(':', 1)[1])
+                self.latencies.append((received - sent) / 1e6)
+            elif kind == 'gap':
+                self.gaps += frame.get('dropped', 0)
+            elif kind == 'throttled':
+                self.throttled += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ChatConsumer fan-out: N clients across M rooms over InMemoryChannelLayer. "
+        "Reports delivery latency percentiles, messages/sec and memory per connection, optionally as JSON. "
+        "Runs in a throwaway building and rooms that are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Connections in total (N)')
+        parser.add_argument('--rooms', type=int, default=10, help='Rooms the clients are spread over (M)')
+        parser.add_argument('--senders', type=int, default=1, help='Sending clients per room')
+        parser.add_argument('--messages', type=int, default=100, help='Messages per sender')
+        parser.add_argument('--rate', type=float, default=50, help='Messages/sec per sender (0 = as fast as possible)')
+        parser.add_argument('--capacity', type=int, default=1000, help='InMemoryChannelLayer per-channel capacity')
+        parser.add_argument('--rate-limit', action='store_true',
+                            help='Keep the CHAT_RATE_PER_SEC inbound limit (off by default: measure fan-out, not throttling)')
+        parser.add_argument('--drain-timeout', type=float, default=30.0, help='Seconds to wait for deliveries after sending')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Earlier JSON result to print deltas against')
+
+    def handle(self, *args, **options):
+        if options['clients'] < options['rooms'] or options['rooms'] < 1:
+            raise CommandError('--clients must be at least --rooms (and --rooms at least 1)')
+        layers = {'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': options['capacity']},
+        }}
+        overrides = {'CHANNEL_LAYERS': layers}
+        if not options['rate_limit']:
+            overrides['CHAT_RATE_PER_SEC'] = 0
+        with override_settings(**overrides), bench_chat_rooms(options['rooms'], 'websockets') as (rooms, user):
+            results = asyncio.run(self._run(options, rooms, user))
+
+        self._report(results)
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self._compare(json.load(fh), results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    async def _run(self, options, rooms, user):
+        import channels
+        import django
+        from channels.routing import URLRouter
+
+        app = URLRouter(websocket_urlpatterns)
+        before = dict(ws_counters)
+
+        # Memory per connection: Python allocations made while the connections were opened
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        clients = []
+        for i in range(options['clients']):
+            room = rooms[i % len(rooms)]
+            communicator = WebsocketClient(app, f'/ws/chat/{room}/', user)
+            connected, code = await communicator.connect()
+            if not connected:
+                raise CommandError(f'Connection to room {room} was refused ({code})')
+            await communicator.receive_json_from()  # backlog frame
+            clients.append(BenchClient(communicator, room))
+        connected_memory = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        for client in clients:
+            client.task = asyncio.get_running_loop().create_task(client.read())
+        members = {room: [c for c in clients if c.room == room] for room in rooms}
+        senders = [c for room in rooms for c in members[room][:options['senders']]]
+        expected = sum(len(members[c.room]) for c in senders) * options['messages']
+        interval = 1.0 / options['rate'] if options['rate'] > 0 else 0
+
+        async def send(client, n):
+            for i in range(options['messages']):
+                await client.communicator.send_json_to({
+                    'type': 'message', 'sender': f'bench-{n}', 'text': f'{i}:{time.perf_counter_ns()}',
+                })
+                await asyncio.sleep(interval)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(client, n) for n, client in enumerate(senders)))
+        send_elapsed = time.perf_counter() - started
+        deadline = time.monotonic() + options['drain_timeout']
+        while sum(len(c.latencies) for c in clients) < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        for client in clients:
+            client.task.cancel()
+        await asyncio.gather(*(c.task for c in clients), return_exceptions=True)
+        for client in clients:
+            await client.communicator.disconnect()
+        # Write what is still buffered now, before the rooms are deleted
+        await message_buffer.flush()
+
+        latencies = sorted(ms for c in clients for ms in c.latencies)
+        delivered = len(latencies)
+        sent = len(senders) * options['messages']
+        counters = {key: ws_counters[key] - before.get(key, 0) for key in ws_counters}
+        return {
+            'benchmark': 'websocket_chat_fanout',
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'channels': channels.__version__,
+                'platform': platform.platform(),
+            },
+            'config': {key: options[key] for key in (
+                'clients', 'rooms', 'senders', 'messages', 'rate', 'capacity', 'rate_limit',
+            )},
+            'results': {
+                'sent': sent,
+                'expected_deliveries': expected,
+                'delivered': delivered,
+                'delivery_ratio': round(delivered / expected, 4) if expected else None,
+                'elapsed_s': round(elapsed, 3),
+                'send_rate': round(sent / max(send_elapsed, 1e-9), 1),
+                'delivered_per_sec': round(delivered / max(elapsed, 1e-9), 1),
+                'latency_ms': {
+                    'p50': percentile(latencies, 50),
+                    'p90': percentile(latencies, 90),
+                    'p99': percentile(latencies, 99),
+                    'max': round(latencies[-1], 3) if latencies else 0.0,
+                    'mean': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+                },
+                'memory_per_connection_kb': round(connected_memory / len(clients) / 1024, 2),
+                'gaps_dropped': sum(c.gaps for c in clients),
+                'throttle_notices': sum(c.throttled for c in clients),
+                'counters': counters,
+            },
+        }
+
+    def _report(self, data):
+        config, results = data['config'], data['results']
+        latency = results['latency_ms']
+        self.stdout.write(
+            f"{config['clients']} clients in {config['rooms']} rooms, {config['senders']} sender(s)/room x "
+            f"{config['messages']} msgs @ {config['rate'] or 'max'}/s"
+        )
+        self.stdout.write(
+            f"delivered {results['delivered']}/{results['expected_deliveries']} in {results['elapsed_s']}s  "
+            f"({results['delivered_per_sec']}/s delivered, {results['send_rate']}/s sent)"
+        )
+        self.stdout.write(
+            f"latency p50={latency['p50']}ms  p90={latency['p90']}ms  p99={latency['p99']}ms  max={latency['max']}ms"
+        )
+        self.stdout.write(
+            f"memory/connection={results['memory_per_connection_kb']}KB  gaps_dropped={results['gaps_dropped']}  "
+            f"throttle_notices={results['throttle_notices']}"
+        )
+
+    def _compare(self, previous, current):
+        def metrics(data):
+            results = data['results']
+            return {
+                'delivered_per_sec': results['delivered_per_sec'],
+                'latency_p50_ms': results['latency_ms']['p50'],
+                'latency_p99_ms': results['latency_ms']['p99'],
+                'memory_per_connection_kb': results['memory_per_connection_kb'],
+            }
+
+        if previous.get('config') != current['config']:
+            self.stdout.write(self.style.WARNING('Baseline was recorded with a different configuration'))
+        before, after = metrics(previous), metrics(current)
+        for key, value in after.items():
+            old = before.get(key)
+            change = f"{(value - old) / old * 100:+.1f}%" if old else 'n/a'
+            self.stdout.write(f"{key:>26}: {old} -> {value} ({change})")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from fluxora.management.chat_bench import bench_chat_rooms
+from fluxora.routing import websocket_urlpatterns
+from fluxora.services.chat import message_buffer, ws_counters
+
+
+class LoadClient:
+    """A websocket client driven straight through the ASGI app (no server, no socket)."""
+
+    def __init__(self, app, path, user, read_delay=0.0):
+        self.app = app
+        self.path = path
+        self.user = user
+        self.read_delay = read_delay
+        self.inbox = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.messages = 0
+        self.gaps = 0
+        self.dropped = 0
+        self.throttle_notices = 0
+        self.closed_code = None
+        self.task = None
+
+    async def _send(self, event):
+        if event['type'] == 'websocket.accept':
+            self.accepted.set()
+            return
+        if event['type'] == 'websocket.close':
+            self.closed_code = event.get('code', 1000)
+            self.accepted.set()
+            return
+        if event['type'] != 'websocket.send':
+            return
+        if self.read_delay:
+            # A slow reader: the consumer's writer task waits on every frame
+            await asyncio.sleep(self.read_delay)
+        frame = json.loads(event.get('text') or '{}')
+        kind = frame.get('type')
+        if kind == 'gap':
+            self.gaps += 1
+            self.dropped += frame.get('dropped', 0)
+        elif kind == 'throttled':
+            self.throttle_notices += 1
+        elif kind is None:
+            self.messages += 1
+
+    async def connect(self):
+        scope = {
+            'type': 'websocket', 'path': self.path, 'headers': [], 'query_string': b'', 'subprotocols': [],
+            'user': self.user,
+        }
+        await self.inbox.put({'type': 'websocket.connect'})
+        self.task = asyncio.get_running_loop().create_task(self.app(scope, self.inbox.get, self._send))
+        await asyncio.wait_for(self.accepted.wait(), timeout=10)
+        if self.closed_code is not None:
+            raise CommandError(f'Connection to {self.path} was refused ({self.closed_code})')
+
+    async def send(self, content):
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(content)})
+
+    async def disconnect(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        try:
+            await asyncio.wait_for(self.task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.task.cancel()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive ChatConsumer over InMemoryChannelLayer with noisy and slow clients to check rate limits and "
+        "backpressure. Runs in a throwaway building and room that are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=20, help='Well-behaved listening clients')
+        parser.add_argument('--slow', type=int, default=3, help='Clients that read slowly')
+        parser.add_argument('--slow-delay-ms', type=float, default=50)
+        parser.add_argument('--noisy', type=int, default=2, help='Clients that flood the room')
+        parser.add_argument('--noisy-rate', type=float, default=200, help='Frames/sec per noisy client')
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--capacity', type=int, default=1000, help='InMemoryChannelLayer per-channel capacity')
+
+    def handle(self, *args, **options):
+        layers = {'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': options['capacity']},
+        }}
+        with override_settings(CHANNEL_LAYERS=layers), bench_chat_rooms(1, 'loadgen') as (rooms, user):
+            report = asyncio.run(self._run(options, rooms[0], user))
+        for line in report:
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    async def _run(self, options, room_id, user):
+        from channels.routing import URLRouter
+
+        app = URLRouter(websocket_urlpatterns)
+        path = f"/ws/chat/{room_id}/"
+        readers = [LoadClient(app, path, user) for _ in range(options['readers'])]
+        slow = [LoadClient(app, path, user, options['slow_delay_ms'] / 1000) for _ in range(options['slow'])]
+        noisy = [LoadClient(app, path, user) for _ in range(options['noisy'])]
+        clients = readers + slow + noisy
+        for client in clients:
+            await client.connect()
+
+        before = dict(ws_counters)
+        interval = 1.0 / options['noisy_rate'] if options['noisy_rate'] > 0 else 0
+        sent = 0
+
+        async def flood(client, n):
+            nonlocal sent
+            deadline = time.monotonic() + options['duration']
+            i = 0
+            while time.monotonic() < deadline:
+                await client.send({'type': 'message', 'text': f'noise {n}-{i}', 'sender': f'noisy-{n}'})
+                sent += 1
+                i += 1
+                await asyncio.sleep(interval)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(flood(client, n) for n, client in enumerate(noisy)))
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.5)  # let fast readers drain
+        for client in clients:
+            await client.disconnect()
+        # Write what is still buffered now, before the room is deleted
+        await message_buffer.flush()
+        delta = {key: ws_counters[key] - before.get(key, 0) for key in ws_counters}
+
+        relayed = delta.get('relayed', 0)
+        return [
+            f"{len(clients)} clients ({len(readers)} readers, {len(slow)} slow, {len(noisy)} noisy) for {elapsed:.1f}s",
+            f"noisy frames sent={sent}  relayed={relayed}  throttled={delta.get('throttled', 0)}  "
+            f"notices={sum(c.throttle_notices for c in noisy)}",
+            f"relayed rate={relayed / max(elapsed, 1e-9):.1f}/s for {len(noisy)} noisy clients",
+            f"readers received min={min((c.messages for c in readers), default=0)} "
+            f"max={max((c.messages for c in readers), default=0)}",
+            f"slow readers received={[c.messages for c in slow]} gaps={[c.gaps for c in slow]} "
+            f"dropped={[c.dropped for c in slow]}",
+            f"dropped_outbound={delta.get('dropped_outbound', 0)}  max_outbound_depth={ws_counters['max_outbound_depth']}",
+        ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('monthly_invoices', 'Monthly Invoices'), ('utility_bills', 'Utility Bills')], max_length=20)),
+                ('params_json', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=9)),
+                ('total', models.IntegerField(default=0)),
+                ('processed', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='fluxora.building')),
+            ],
+            options={
+                'db_table': 'billing_jobs',
+                'indexes': [models.Index(fields=['building', 'status'], name='idx_billing_jobs_building')],
+            },
+        ),
+    ]
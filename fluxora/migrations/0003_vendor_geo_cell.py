@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+from fluxora.services.geo import geo_cell
+
+
+def backfill_geo_cells(apps, schema_editor):
+    Vendor = apps.get_model('fluxora', 'Vendor')
+    qs = Vendor.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+    batch = []
+    for vendor in qs.iterator(chunk_size=2000):
+        vendor.lat_cell, vendor.lng_cell = geo_cell(vendor.latitude, vendor.longitude)
+        batch.append(vendor)
+        if len(batch) >= 2000:
+            Vendor.objects.bulk_update(batch, ['lat_cell', 'lng_cell'])
+            batch = []
+    if batch:
+        Vendor.objects.bulk_update(batch, ['lat_cell', 'lng_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0002_billing_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='lat_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='lng_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['service', 'lat_cell', 'lng_cell'], name='idx_vendor_geo_cell'),
+        ),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0003_vendor_geo_cell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='idx_activity_logs_time'),
+        ),
+        migrations.AddIndex(
+            model_name='documentauditlog',
+            index=models.Index(fields=['event_time', 'id'], name='idx_doc_audit_time'),
+        ),
+        migrations.AddIndex(
+            model_name='gateevent',
+            index=models.Index(fields=['timestamp', 'id'], name='idx_gate_events_time'),
+        ),
+        migrations.AddIndex(
+            model_name='intercomlog',
+            index=models.Index(fields=['timestamp', 'id'], name='idx_intercom_logs_time'),
+        ),
+        migrations.AddIndex(
+            model_name='liftstatuslog',
+            index=models.Index(fields=['timestamp', 'id'], name='idx_lift_logs_time'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sent_at', 'id'], name='idx_messages_time'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoices_count', models.IntegerField(default=0)),
+                ('payments_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('open_tickets', models.IntegerField(default=0)),
+                ('bookings_count', models.IntegerField(default=0)),
+                ('occupied_units', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='fluxora.building')),
+            ],
+            options={
+                'db_table': 'building_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0005_building_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=150)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed')], max_length=8)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='fluxora.invoice')),
+            ],
+            options={
+                'db_table': 'invoice_reminders',
+                'indexes': [models.Index(fields=['invoice', 'status', 'sent_at'], name='idx_invoice_reminders')],
+            },
+        ),
+    ]
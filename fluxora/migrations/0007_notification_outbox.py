@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0006_invoice_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('push', 'Push')], max_length=8)),
+                ('recipient', models.CharField(max_length=255)),
+                ('subject', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField()),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=8)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fluxora.building')),
+                ('resident', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='fluxora.resident')),
+            ],
+            options={
+                'db_table': 'notification_outbox',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='idx_outbox_due'), models.Index(fields=['building', 'created_at'], name='idx_outbox_building')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+def backfill_chat_counters(apps, schema_editor):
+    # Existing history counts as read; rooms get their latest message denormalized
+    ChatRoom = apps.get_model('fluxora', 'ChatRoom')
+    RoomMember = apps.get_model('fluxora', 'RoomMember')
+    Message = apps.get_model('fluxora', 'Message')
+    for room in ChatRoom.objects.only('id').iterator(chunk_size=2000):
+        last = (
+            Message.objects.filter(room_id=room.id).order_by('-id')
+            .values('id', 'sent_at', 'content', 'resident_id').first()
+        )
+        if last is None:
+            continue
+        ChatRoom.objects.filter(pk=room.id).update(
+            last_message_id=last['id'], last_message_at=last['sent_at'],
+            last_message_preview=(last['content'] or '')[:255], last_message_resident_id=last['resident_id'],
+        )
+        RoomMember.objects.filter(room_id=room.id).update(last_read_message_id=last['id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0007_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_resident_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='roommember',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='roommember',
+            name='last_read_message_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='roommember',
+            name='unread_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_chat_counters, migrations.RunPython.noop),
+    ]
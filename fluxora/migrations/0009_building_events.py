@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0008_chat_unread_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('action', models.CharField(max_length=10)),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fluxora.building')),
+            ],
+            options={
+                'db_table': 'building_events',
+                'indexes': [models.Index(fields=['building', 'id'], name='idx_building_events_seq'), models.Index(fields=['created_at'], name='idx_building_events_time')],
+            },
+        ),
+    ]
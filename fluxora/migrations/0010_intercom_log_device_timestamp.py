@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0009_building_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='intercomlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
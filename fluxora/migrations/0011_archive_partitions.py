@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0010_intercom_log_device_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivePartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=255)),
+                ('row_count', models.IntegerField(default=0)),
+                ('min_ts', models.DateTimeField()),
+                ('max_ts', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='fluxora.building')),
+            ],
+            options={
+                'db_table': 'archive_partitions',
+                'indexes': [models.Index(fields=['source', 'max_ts'], name='idx_archive_source_time')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'building', 'month'), name='ux_archive_partition')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_current_status(apps, schema_editor):
+    # Latest log per (building, asset); "since" is the start of its current run of that status
+    LiftStatusLog = apps.get_model('fluxora', 'LiftStatusLog')
+    LiftCurrentStatus = apps.get_model('fluxora', 'LiftCurrentStatus')
+    pairs = LiftStatusLog.objects.values_list('building_id', 'asset_id').distinct().order_by()
+    rows = []
+    for building_id, asset_id in pairs.iterator(chunk_size=2000):
+        logs = LiftStatusLog.objects.filter(building_id=building_id, asset_id=asset_id)
+        latest = logs.order_by('-timestamp', '-id').values('id', 'status', 'timestamp').first()
+        changed = (
+            logs.exclude(status=latest['status']).order_by('-timestamp', '-id')
+            .values_list('timestamp', flat=True).first()
+        )
+        run = logs.filter(status=latest['status'])
+        if changed is not None:
+            run = run.filter(timestamp__gt=changed)
+        since = run.order_by('timestamp', 'id').values_list('timestamp', flat=True).first()
+        rows.append(LiftCurrentStatus(
+            building_id=building_id, asset_id=asset_id, status=latest['status'],
+            since=since or latest['timestamp'], last_reported_at=latest['timestamp'], last_log_id=latest['id'],
+        ))
+    LiftCurrentStatus.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0011_archive_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiftCurrentStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('operational', 'Operational'), ('maintenance', 'Maintenance'), ('offline', 'Offline')], max_length=12)),
+                ('since', models.DateTimeField()),
+                ('last_reported_at', models.DateTimeField()),
+                ('last_log_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'lift_current_status',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='liftstatuslog',
+            index=models.Index(fields=['building', 'asset', 'timestamp'], name='idx_lift_logs_asset'),
+        ),
+        migrations.AddField(
+            model_name='liftcurrentstatus',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='fluxora.asset'),
+        ),
+        migrations.AddField(
+            model_name='liftcurrentstatus',
+            name='building',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fluxora.building'),
+        ),
+        migrations.AddConstraint(
+            model_name='liftcurrentstatus',
+            constraint=models.UniqueConstraint(fields=('building', 'asset'), name='ux_lift_current_asset'),
+        ),
+        migrations.AddConstraint(
+            model_name='liftcurrentstatus',
+            constraint=models.UniqueConstraint(condition=models.Q(('asset__isnull', True)), fields=('building',), name='ux_lift_current_unnamed'),
+        ),
+        migrations.RunPython(backfill_current_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_last_seen(apps, schema_editor):
+    # Start from each device's latest log; the sweeper decides online/offline from there
+    IntercomDevice = apps.get_model('fluxora', 'IntercomDevice')
+    IntercomLog = apps.get_model('fluxora', 'IntercomLog')
+    latest = IntercomLog.objects.values_list('device_id').annotate(last=Max('timestamp')).order_by()
+    devices = [IntercomDevice(pk=device_id, last_seen_at=last) for device_id, last in latest.iterator(chunk_size=2000)]
+    IntercomDevice.objects.bulk_update(devices, ['last_seen_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0012_lift_current_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intercomdevice',
+            name='is_online',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='intercomdevice',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_last_seen, migrations.RunPython.noop),
+    ]
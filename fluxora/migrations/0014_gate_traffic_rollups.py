@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    # Hourly and daily counts of the events still in the live table (TruncHour/Day use TIME_ZONE)
+    GateEvent = apps.get_model('fluxora', 'GateEvent')
+    GateTrafficRollup = apps.get_model('fluxora', 'GateTrafficRollup')
+    rows = []
+    for period, trunc in (('hour', TruncHour), ('day', TruncDay)):
+        grouped = (
+            GateEvent.objects.annotate(bucket=trunc('timestamp')).values_list('building_id', 'bucket')
+            .annotate(opens=Count('id', filter=Q(event_type='open')), closes=Count('id', filter=Q(event_type='close')))
+            .order_by()
+        )
+        rows.extend(
+            GateTrafficRollup(building_id=b, period=period, bucket=bucket, opens=opens, closes=closes)
+            for b, bucket, opens, closes in grouped.iterator(chunk_size=2000)
+        )
+    GateTrafficRollup.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0013_intercom_device_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gateevent',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='GateTrafficRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('opens', models.IntegerField(default=0)),
+                ('closes', models.IntegerField(default=0)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fluxora.building')),
+            ],
+            options={
+                'db_table': 'gate_traffic_rollups',
+                'constraints': [models.UniqueConstraint(fields=('building', 'period', 'bucket'), name='ux_gate_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0014_gate_traffic_rollups'),
+    ]
+
+    operations = [
+        # Added first: MySQL needs an index on resource_id for the foreign key at every step
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['resource', 'start_time', 'end_time'], name='idx_booking_overlap'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='booking',
+            name='ux_booking_exact',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='idx_booking_window',
+        ),
+    ]
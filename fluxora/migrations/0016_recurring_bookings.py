@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fluxora', '0015_booking_overlap_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('weekdays', models.CharField(blank=True, default='', max_length=20)),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='pending', max_length=10)),
+                ('purpose', models.CharField(blank=True, max_length=150, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='fluxora.resident')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='fluxora.resource')),
+            ],
+            options={
+                'db_table': 'recurring_bookings',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurringBookingException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_start', models.DateTimeField()),
+                ('action', models.CharField(choices=[('cancelled', 'Cancelled'), ('moved', 'Moved')], max_length=10)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recurrence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='fluxora.recurringbooking')),
+            ],
+            options={
+                'db_table': 'recurring_booking_exceptions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurringbooking',
+            index=models.Index(fields=['resource', 'start_time'], name='idx_recurring_resource'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringbooking',
+            index=models.Index(fields=['resident'], name='idx_recurring_resident'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringbookingexception',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'occurrence_start'), name='ux_recurrence_exception'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # models.py
 from django.db import models
+from django.utils import timezone
+
+from .services.geo import geo_cell
 
 
 # ---------- Shared Choices ----------
@@ -219,6 +222,9 @@ class Vendor(models.Model):
     rating = models.DecimalField(max_digits=2, decimal_places=1, null=True, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Lat/lng grid bucket (fluxora.services.geo.geo_cell), kept in sync on save
+    lat_cell = models.IntegerField(null=True, blank=True, editable=False)
+    lng_cell = models.IntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -226,11 +232,19 @@ class Vendor(models.Model):
         indexes = [
             models.Index(fields=['building'], name='idx_vendor_building'),
             models.Index(fields=['service'], name='idx_vendor_service'),
+            models.Index(fields=['service', 'lat_cell', 'lng_cell'], name='idx_vendor_geo_cell'),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.lat_cell, self.lng_cell = geo_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'lat_cell', 'lng_cell'}
+        super().save(*args, **kwargs)
+
 
 class Review(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.PROTECT)
@@ -478,11 +492,9 @@ class Booking(models.Model):
 
     class Meta:
         db_table = 'bookings'
-        constraints = [
-            models.UniqueConstraint(fields=['resource', 'start_time', 'end_time'], name='ux_booking_exact'),
-        ]
+        # Overlaps (and capacity) are checked under a resource row lock in services.bookings.reserve
         indexes = [
-            models.Index(fields=['resource', 'start_time'], name='idx_booking_window'),
+            models.Index(fields=['resource', 'start_time', 'end_time'], name='idx_booking_overlap'),
             models.Index(fields=['resident', 'start_time'], name='idx_booking_resident'),
         ]
 
@@ -578,6 +590,9 @@ class DocumentAuditLog(models.Model):
 
     class Meta:
         db_table = 'document_audit_logs'
+        indexes = [
+            models.Index(fields=['event_time', 'id'], name='idx_doc_audit_time'),
+        ]
 
 
 # ---------- 14) EMERGENCY / SOS ----------
@@ -602,6 +617,9 @@ class IntercomDevice(models.Model):
     building = models.ForeignKey(Building, on_delete=models.PROTECT)
     device_name = models.CharField(max_length=100)
     ip_address = models.CharField(max_length=45)
+    # Liveness, written through from the in-memory heartbeat map (fluxora.services.intercom)
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
+    is_online = models.BooleanField(default=False, editable=False)
 
     class Meta:
         db_table = 'intercom_devices'
@@ -613,13 +631,15 @@ class IntercomDevice(models.Model):
 class IntercomLog(models.Model):
     device = models.ForeignKey(IntercomDevice, on_delete=models.PROTECT)
     event_type = models.CharField(max_length=50)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the device saw the event (sent by the device; defaults to receipt time)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     details = models.TextField(null=True, blank=True)
 
     class Meta:
         db_table = 'intercom_logs'
         indexes = [
             models.Index(fields=['device', 'timestamp'], name='idx_intercom_logs_device'),
+            models.Index(fields=['timestamp', 'id'], name='idx_intercom_logs_time'),
         ]
 
 
@@ -629,6 +649,11 @@ class ChatRoom(models.Model):
     name = models.CharField(max_length=100)
     is_public = models.BooleanField(default=True)
     building = models.ForeignKey(Building, on_delete=models.PROTECT)
+    # Denormalized latest message for room lists (maintained by fluxora.services.chat)
+    last_message_id = models.BigIntegerField(null=True, blank=True, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_preview = models.CharField(max_length=255, blank=True, default='', editable=False)
+    last_message_resident_id = models.BigIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         db_table = 'chat_rooms'
@@ -644,6 +669,10 @@ class RoomMember(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE)
     resident = models.ForeignKey(Resident, on_delete=models.CASCADE)
     joined_at = models.DateTimeField(auto_now_add=True)
+    # Plain id (not a FK) so archiving old messages never touches member rows
+    last_read_message_id = models.BigIntegerField(null=True, blank=True, editable=False)
+    last_read_at = models.DateTimeField(null=True, blank=True, editable=False)
+    unread_count = models.IntegerField(default=0, editable=False)
 
     class Meta:
         db_table = 'room_members'
@@ -662,6 +691,7 @@ class Message(models.Model):
         db_table = 'messages'
         indexes = [
             models.Index(fields=['room', 'sent_at'], name='idx_messages_room'),
+            models.Index(fields=['sent_at', 'id'], name='idx_messages_time'),
         ]
 
 
@@ -775,13 +805,15 @@ class AssetMaintenance(models.Model):
 class GateEvent(models.Model):
     building = models.ForeignKey(Building, on_delete=models.PROTECT)
     event_type = models.CharField(max_length=5, choices=GateEventType.choices)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the controller saw the event (batched uploads send it; defaults to receipt time)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     actor = models.ForeignKey(User, null=True, blank=True, on_delete=models.PROTECT)
 
     class Meta:
         db_table = 'gate_events'
         indexes = [
             models.Index(fields=['building', 'timestamp'], name='idx_gate_events_building'),
+            models.Index(fields=['timestamp', 'id'], name='idx_gate_events_time'),
         ]
 
 
@@ -797,6 +829,8 @@ class LiftStatusLog(models.Model):
         db_table = 'lift_status_logs'
         indexes = [
             models.Index(fields=['building', 'timestamp'], name='idx_lift_logs_building'),
+            models.Index(fields=['timestamp', 'id'], name='idx_lift_logs_time'),
+            models.Index(fields=['building', 'asset', 'timestamp'], name='idx_lift_logs_asset'),
         ]
 
 
@@ -964,6 +998,9 @@ class ActivityLog(models.Model):
 
     class Meta:
         db_table = 'activity_logs'
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='idx_activity_logs_time'),
+        ]
 
 
 # ---------- 29) SYSTEM/BUILDING SETTINGS ----------
@@ -979,3 +1016,255 @@ class BuildingSetting(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['building', 'key_name'], name='ux_building_setting'),
         ]
+
+
+# ---------- 30) BACKGROUND BILLING JOBS ----------
+
+class BillingJobType(models.TextChoices):
+    MONTHLY_INVOICES = 'monthly_invoices', 'Monthly Invoices'
+    UTILITY_BILLS = 'utility_bills', 'Utility Bills'
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+
+
+class BillingJob(models.Model):
+    job_type = models.CharField(max_length=20, choices=BillingJobType.choices)
+    building = models.ForeignKey(Building, on_delete=models.PROTECT)
+    params_json = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=9, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    # Last source row id (resident/meter) committed; a restarted job resumes after it
+    cursor = models.BigIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'billing_jobs'
+        indexes = [
+            models.Index(fields=['building', 'status'], name='idx_billing_jobs_building'),
+        ]
+
+
+# ---------- 31) DASHBOARD ROLLUPS ----------
+
+# Per-building dashboard counters, kept current by fluxora.services.stats
+class BuildingStats(models.Model):
+    building = models.OneToOneField(Building, on_delete=models.CASCADE, related_name='stats')
+    invoices_count = models.IntegerField(default=0)
+    payments_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    open_tickets = models.IntegerField(default=0)
+    bookings_count = models.IntegerField(default=0)
+    occupied_units = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)  # last full recompute
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'building_stats'
+
+
+# ---------- 32) INVOICE REMINDERS ----------
+
+class DeliveryStatus(models.TextChoices):
+    SENT = 'sent', 'Sent'
+    FAILED = 'failed', 'Failed'
+
+
+# One row per reminder email attempt, written in bulk by fluxora.services.reminders
+class InvoiceReminder(models.Model):
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='reminders')
+    recipient = models.EmailField(max_length=150)
+    status = models.CharField(max_length=8, choices=DeliveryStatus.choices)
+    error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'invoice_reminders'
+        indexes = [
+            models.Index(fields=['invoice', 'status', 'sent_at'], name='idx_invoice_reminders'),
+        ]
+
+
+# ---------- 33) NOTIFICATION OUTBOX ----------
+
+class OutboxChannel(models.TextChoices):
+    EMAIL = 'email', 'Email'
+    SMS = 'sms', 'SMS'
+    PUSH = 'push', 'Push'
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    SENDING = 'sending', 'Sending'
+    SENT = 'sent', 'Sent'
+    FAILED = 'failed', 'Failed'
+
+
+# Durable queue of external deliveries, drained by fluxora.services.dispatcher
+class NotificationOutbox(models.Model):
+    building = models.ForeignKey(Building, on_delete=models.CASCADE)
+    resident = models.ForeignKey(Resident, null=True, blank=True, on_delete=models.SET_NULL)
+    channel = models.CharField(max_length=8, choices=OutboxChannel.choices)
+    recipient = models.CharField(max_length=255)  # email address, phone number or push target
+    subject = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField()
+    payload = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=8, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)  # set while a dispatcher holds the row
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notification_outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_outbox_due'),
+            models.Index(fields=['building', 'created_at'], name='idx_outbox_building'),
+        ]
+
+
+# ---------- 34) REALTIME BUILDING EVENTS ----------
+
+# Log behind the building event stream; the id is the sequence number clients resume from
+class BuildingEvent(models.Model):
+    building = models.ForeignKey(Building, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20)  # gate_event, lift_status, emergency, notification, device_status
+    action = models.CharField(max_length=10)  # created, updated, broadcast
+    object_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'building_events'
+        indexes = [
+            models.Index(fields=['building', 'id'], name='idx_building_events_seq'),
+            models.Index(fields=['created_at'], name='idx_building_events_time'),
+        ]
+
+
+# ---------- 35) LOG ARCHIVE ----------
+
+# One compressed NDJSON file of archived log rows per (source table, building, month)
+class ArchivePartition(models.Model):
+    source = models.CharField(max_length=50)  # db_table of the archived model, e.g. gate_events
+    building = models.ForeignKey(Building, on_delete=models.PROTECT)
+    month = models.DateField()  # first day of the month
+    path = models.CharField(max_length=255)  # name in default_storage
+    row_count = models.IntegerField(default=0)
+    min_ts = models.DateTimeField()
+    max_ts = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'archive_partitions'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'building', 'month'], name='ux_archive_partition'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'max_ts'], name='idx_archive_source_time'),
+        ]
+
+
+# ---------- 36) LIFT CURRENT STATUS ----------
+
+# Latest reported status per lift (maintained from LiftStatusLog inserts by fluxora.services.lifts)
+class LiftCurrentStatus(models.Model):
+    building = models.ForeignKey(Building, on_delete=models.CASCADE)
+    asset = models.ForeignKey(Asset, null=True, blank=True, on_delete=models.CASCADE)  # null: the building's unnamed lift
+    status = models.CharField(max_length=12, choices=LiftStatus.choices)
+    since = models.DateTimeField()  # when the lift entered this status
+    last_reported_at = models.DateTimeField()
+    last_log_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'lift_current_status'
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'asset'], name='ux_lift_current_asset'),
+            models.UniqueConstraint(fields=['building'], condition=models.Q(asset__isnull=True),
+                                    name='ux_lift_current_unnamed'),
+        ]
+
+
+# ---------- 37) GATE TRAFFIC ROLLUPS ----------
+
+class RollupPeriod(models.TextChoices):
+    HOUR = 'hour', 'Hour'
+    DAY = 'day', 'Day'
+
+
+# Open/close counts per building per local hour and day (maintained by fluxora.services.gates)
+class GateTrafficRollup(models.Model):
+    building = models.ForeignKey(Building, on_delete=models.CASCADE)
+    period = models.CharField(max_length=4, choices=RollupPeriod.choices)
+    bucket = models.DateTimeField()  # start of the hour/day in TIME_ZONE
+    opens = models.IntegerField(default=0)
+    closes = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'gate_traffic_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'period', 'bucket'], name='ux_gate_rollup_bucket'),
+        ]
+
+
+# ---------- 38) RECURRING BOOKINGS ----------
+
+class RecurrenceFrequency(models.TextChoices):
+    DAILY = 'daily', 'Daily'
+    WEEKLY = 'weekly', 'Weekly'
+
+
+class OccurrenceAction(models.TextChoices):
+    CANCELLED = 'cancelled', 'Cancelled'
+    MOVED = 'moved', 'Moved'
+
+
+# A repeating booking stored as one rule; occurrences are expanded on demand (fluxora.services.recurrence)
+class RecurringBooking(models.Model):
+    resource = models.ForeignKey(Resource, on_delete=models.PROTECT)
+    resident = models.ForeignKey(Resident, on_delete=models.PROTECT)
+    # First occurrence; later ones keep its local wall-clock time and length
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    frequency = models.CharField(max_length=10, choices=RecurrenceFrequency.choices, default=RecurrenceFrequency.WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1)  # every N days/weeks
+    weekdays = models.CharField(max_length=20, blank=True, default='')  # weekly: ISO days "1,3" (Mon=1); empty = start's
+    until = models.DateTimeField(null=True, blank=True)  # no occurrence starts at/after this; null = open-ended
+    status = models.CharField(max_length=10, choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='pending')
+    purpose = models.CharField(max_length=150, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'recurring_bookings'
+        indexes = [
+            models.Index(fields=['resource', 'start_time'], name='idx_recurring_resource'),
+            models.Index(fields=['resident'], name='idx_recurring_resident'),
+        ]
+
+
+# One occurrence of a recurring booking cancelled or moved, keyed by its original start
+class RecurringBookingException(models.Model):
+    recurrence = models.ForeignKey(RecurringBooking, on_delete=models.CASCADE, related_name='exceptions')
+    occurrence_start = models.DateTimeField()
+    action = models.CharField(max_length=10, choices=OccurrenceAction.choices)
+    start_time = models.DateTimeField(null=True, blank=True)  # moved occurrences only
+    end_time = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'recurring_booking_exceptions'
+        constraints = [
+            models.UniqueConstraint(fields=['recurrence', 'occurrence_start'], name='ux_recurrence_exception'),
+        ]
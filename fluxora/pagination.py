@@ -0,0 +1,130 @@
+# fluxora/pagination.py
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .services.retention import merge_archived
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on ``(<timestamp field>, id)``, newest first.
+
+    Each page is a ``WHERE (ts, id) < (last_ts, last_id) ORDER BY ts DESC, id DESC LIMIT n``
+    range scan, so there is no COUNT(*) and no OFFSET: page 10,000 costs the same as page 1.
+    Views pick the timestamp column with ``cursor_ordering_field`` (default ``timestamp``) and
+    should have a matching ``(field, id)`` index. Views with ``include_archived = True`` also
+    page through rows that retention moved to archive files, after the live ones.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    ordering_field = 'timestamp'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = getattr(view, 'cursor_ordering_field', self.ordering_field)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+            qs = queryset.order_by(f'-{field}', '-pk')
+        else:
+            reverse, ts, pk = cursor
+            if reverse:
+                qs = queryset.filter(Q(**{f'{field}__gt': ts}) | Q(**{field: ts, 'pk__gt': pk})).order_by(field, 'pk')
+            else:
+                qs = queryset.filter(Q(**{f'{field}__lt': ts}) | Q(**{field: ts, 'pk__lt': pk})).order_by(f'-{field}', '-pk')
+
+        rows = list(qs[:self.page_size + 1])
+        if getattr(view, 'include_archived', False):
+            # Rows moved to cold storage (fluxora.services.retention) page in after live ones
+            rows = merge_archived(queryset.model, field, rows, cursor, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.field = field
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = tokens.get('r', ['0'])[0] == '1'
+            ts = parse_datetime(tokens['t'][0])
+            pk = int(tokens['k'][0])
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise NotFound(self.invalid_cursor_message)
+        if ts is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, ts, pk
+
+    def encode_cursor(self, reverse, obj):
+        if isinstance(obj, dict):
+            # values() rows (see fluxora.fastpath)
+            ts, pk = obj[self.field], obj['id']
+        else:
+            ts, pk = getattr(obj, self.field), obj.pk
+        tokens = {'t': ts.isoformat(), 'k': pk}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Walked past the end; the first page is the safest way back
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
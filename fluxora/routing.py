@@ -1,8 +1,9 @@
 # fluxora/routing.py
 from django.urls import re_path
-from .consumers import ChatConsumer
+from .consumers import BuildingEventsConsumer, ChatConsumer
 
 websocket_urlpatterns = [
     re_path(r"^ws/chat/(?P<room_id>\d+)/$", ChatConsumer.as_asgi()),
+    re_path(r"^ws/buildings/(?P<building_id>\d+)/events/$", BuildingEventsConsumer.as_asgi()),
 ]
 
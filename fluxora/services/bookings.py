@@ -0,0 +1,396 @@
+# fluxora/services/bookings.py
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from fluxora.models import Booking, OccurrenceAction, RecurringBooking, RecurringBookingException, Resource
+from fluxora.services import recurrence
+
+ACTIVE_STATUSES = ('pending', 'confirmed')
+MAX_SEARCH_DAYS = 31
+
+
+class BookingConflict(Exception):
+    """The slot is full (or the resident already holds an overlapping booking)."""
+
+    def __init__(self, message, conflicts=(), recurring=()):
+        super().__init__(message)
+        self.conflicts = list(conflicts)  # booking ids
+        self.recurring = list(recurring)  # {"recurrence_id", "start"} of recurring occurrences
+
+
+# One interval already holding the resource: a booking, or one occurrence of a recurring booking
+Busy = namedtuple('Busy', 'key resident_id start end')
+
+
+def overlapping(resource_id, start, end, exclude_id=None):
+    """
+    Active bookings of a resource that intersect ``[start, end)``.
+
+    ``resource = ? AND start_time < end AND end_time > start`` is a range scan on
+    ``idx_booking_overlap`` (resource, start_time, end_time); ``end_time`` is checked from the index.
+    """
+    qs = Booking.objects.filter(
+        resource_id=resource_id, start_time__lt=end, end_time__gt=start, status__in=ACTIVE_STATUSES,
+    )
+    if exclude_id is not None:
+        qs = qs.exclude(pk=exclude_id)
+    return qs
+
+
+def peak_usage(intervals, start, end) -> int:
+    """Most intervals in use at one instant within ``[start, end)`` (ends sort before starts)."""
+    edges = []
+    for lo, hi in intervals:
+        edges.append((max(lo, start), 1))
+        edges.append((min(hi, end), -1))
+    edges.sort()
+    peak = current = 0
+    for _, step in edges:
+        current += step
+        peak = max(peak, current)
+    return peak
+
+
+def _lock_resource(resource_id, start, end, exclude_booking=None, exclude_rule=None, exclude=None):
+    """
+    Lock the resource row (``SELECT ... FOR UPDATE``) and return its capacity and everything
+    holding it in ``[start, end)``, sorted by start.
+
+    Concurrent reservations of one resource queue up behind the lock and each sees the others'
+    rows. The reads are locking reads as well: under REPEATABLE READ they see rows committed
+    after the transaction's snapshot.
+    """
+    capacity = Resource.objects.select_for_update().values_list('capacity', flat=True).get(pk=resource_id)
+    busy = [
+        Busy(('booking', pk), resident_id, lo, hi)
+        for pk, resident_id, lo, hi in overlapping(resource_id, start, end, exclude_booking)
+        .select_for_update().values_list('id', 'resident_id', 'start_time', 'end_time')
+    ]
+    busy.extend(
+        Busy(('recurrence', occ.recurrence_id, occ.original_start), occ.resident_id, occ.start, occ.end)
+        for occ in recurrence.resource_occurrences([resource_id], start, end, exclude_rule, lock=True)[resource_id]
+    )
+    busy = [b for b in busy if b.key != exclude]
+    busy.sort(key=lambda b: (b.start, b.end))
+    return max(capacity, 1), busy
+
+
+def _check(busy, resident_id, start, end, capacity) -> None:
+    """Raise ``BookingConflict`` unless ``[start, end)`` fits among the ``busy`` intervals."""
+    hits = [b for b in busy if b.start < end and b.end > start]
+    own = [b for b in hits if b.resident_id == resident_id]
+    if own:
+        raise BookingConflict('You already have a booking in this slot', *_describe(own))
+    if peak_usage([(b.start, b.end) for b in hits], start, end) >= capacity:
+        raise BookingConflict('This slot is fully booked', *_describe(hits))
+
+
+def _describe(busy):
+    return (
+        [b.key[1] for b in busy if b.key[0] == 'booking'],
+        [{'recurrence_id': b.key[1], 'start': b.start} for b in busy if b.key[0] == 'recurrence'],
+    )
+
+
+def reserve(resource_id, resident_id, start, end, booking=None, **fields) -> Booking:
+    """
+    Create (or move, when ``booking`` is given) a booking if the resource has room.
+
+    Runs under the resource lock. Shared amenities take up to ``Resource.capacity`` overlapping
+    bookings (recurring occurrences included); a resident may not hold two overlapping bookings
+    of the same resource. Raises ``BookingConflict`` otherwise.
+    """
+    if end <= start:
+        raise ValueError('end_time must be after start_time')
+    with transaction.atomic():
+        capacity, busy = _lock_resource(resource_id, start, end, exclude_booking=booking.pk if booking else None)
+        _check(busy, resident_id, start, end, capacity)
+        if booking is None:
+            return Booking.objects.create(
+                resource_id=resource_id, resident_id=resident_id, start_time=start, end_time=end, **fields,
+            )
+        previous_resource = booking.resource_id
+        for name, value in dict(fields, resource_id=resource_id, resident_id=resident_id,
+                                start_time=start, end_time=end).items():
+            setattr(booking, name, value)
+        booking.save()
+        if previous_resource != resource_id:
+            _invalidate_slots(previous_resource)
+        return booking
+
+
+# ---------- Recurring bookings ----------
+
+SCHEDULE_FIELDS = ('resource_id', 'start_time', 'end_time', 'frequency', 'interval', 'weekdays')
+
+
+def reserve_recurring(rule: RecurringBooking) -> RecurringBooking:
+    """
+    Save a recurring booking if none of its occurrences conflicts.
+
+    Occurrences are checked from now (or the first one) up to ``until``, at most
+    ``BOOKING_RECURRENCE_CHECK_DAYS`` ahead; single bookings and other rules made later are
+    checked against this rule's occurrences when they are reserved. Changing the schedule of a
+    saved rule drops its exceptions.
+    """
+    if rule.end_time <= rule.start_time:
+        raise ValueError('end_time must be after start_time')
+    if rule.end_time - rule.start_time > recurrence.MAX_OCCURRENCE:
+        raise ValueError('occurrences may be at most a day long')
+    check_from = max(rule.start_time, timezone.now())
+    check_to = check_from + timedelta(days=getattr(settings, 'BOOKING_RECURRENCE_CHECK_DAYS', 365))
+    if rule.until:
+        check_to = min(check_to, rule.until + recurrence.MAX_OCCURRENCE)
+    previous = None
+    with transaction.atomic():
+        capacity, busy = _lock_resource(rule.resource_id, check_from, check_to, exclude_rule=rule.pk)
+        if rule.pk:
+            # Read the stored schedule under the lock, so a concurrent edit cannot slip in between
+            previous = RecurringBooking.objects.select_for_update().filter(pk=rule.pk).values(*SCHEDULE_FIELDS).first()
+        rescheduled = previous is not None and any(previous[f] != getattr(rule, f) for f in SCHEDULE_FIELDS)
+        exceptions = {}
+        if rule.pk and not rescheduled:
+            exceptions = {
+                original: (action, lo, hi) for original, action, lo, hi in rule.exceptions.values_list(
+                    'occurrence_start', 'action', 'start_time', 'end_time')
+            }
+        starts = [b.start for b in busy]
+        longest = max((b.end - b.start for b in busy), default=timedelta(0))
+        for occ in recurrence.occurrences(rule, exceptions, check_from, check_to):
+            # Only the busy intervals starting within ``longest`` before the occurrence can reach it
+            window = busy[bisect_left(starts, occ.start - longest):bisect_left(starts, occ.end)]
+            try:
+                _check(window, rule.resident_id, occ.start, occ.end, capacity)
+            except BookingConflict as exc:
+                exc.args = (f'{exc.args[0]} ({timezone.localtime(occ.start):%Y-%m-%d %H:%M})',)
+                raise
+        if rescheduled:
+            rule.exceptions.all().delete()
+        rule.save()
+    if previous is not None and previous['resource_id'] != rule.resource_id:
+        _invalidate_slots(previous['resource_id'])
+    return rule
+
+
+def _occurrence_exists(rule, original_start) -> bool:
+    return recurrence.is_occurrence(rule, original_start) or rule.exceptions.filter(
+        occurrence_start=original_start).exists()
+
+
+def cancel_occurrence(rule, original_start) -> RecurringBookingException:
+    """Cancel one occurrence (identified by its original start) without touching the rest."""
+    if not _occurrence_exists(rule, original_start):
+        raise ValueError('Not an occurrence of this booking')
+    exception, _ = RecurringBookingException.objects.update_or_create(
+        recurrence=rule, occurrence_start=original_start,
+        defaults={'action': OccurrenceAction.CANCELLED, 'start_time': None, 'end_time': None},
+    )
+    return exception
+
+
+def move_occurrence(rule, original_start, start, end) -> RecurringBookingException:
+    """Move one occurrence to ``[start, end)`` on the same resource, if the new slot has room."""
+    if not _occurrence_exists(rule, original_start):
+        raise ValueError('Not an occurrence of this booking')
+    if end <= start or end - start > recurrence.MAX_OCCURRENCE:
+        raise ValueError('end_time must be after start_time, at most a day later')
+    if start < rule.start_time or (rule.until and start >= rule.until):
+        raise ValueError("An occurrence can only move within the booking's start and until")
+    with transaction.atomic():
+        capacity, busy = _lock_resource(rule.resource_id, start, end, exclude=('recurrence', rule.pk, original_start))
+        _check(busy, rule.resident_id, start, end, capacity)
+        exception, _ = RecurringBookingException.objects.update_or_create(
+            recurrence=rule, occurrence_start=original_start,
+            defaults={'action': OccurrenceAction.MOVED, 'start_time': start, 'end_time': end},
+        )
+    return exception
+
+
+# ---------- Free-slot search ----------
+
+def free_intervals(intervals, start, end, capacity: int) -> list:
+    """
+    Sub-intervals of ``[start, end)`` where fewer than ``capacity`` of ``intervals`` are in use.
+
+    One sorted sweep over the interval edges (ends before starts at the same instant, so
+    back-to-back bookings leave no gap and no overlap); adjacent free pieces are merged.
+    """
+    edges = []
+    for lo, hi in intervals:
+        lo, hi = max(lo, start), min(hi, end)
+        if lo < hi:
+            edges.append((lo, 1))
+            edges.append((hi, -1))
+    edges.sort()
+    free, usage, cursor = [], 0, start
+    for at, step in edges + [(end, 0)]:
+        if at > cursor and usage < capacity:
+            if free and free[-1][1] == cursor:
+                free[-1] = (free[-1][0], at)
+            else:
+                free.append((cursor, at))
+        cursor = max(cursor, at)
+        usage += step
+    return free
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), dt_time.min))
+
+
+class SlotCache:
+    """
+    Thread-safe TTL cache: (resource id, local date) -> free intervals of that day.
+
+    Saving or deleting a booking (or the resource) drops every cached day of its resource;
+    the TTL bounds how long other processes can serve slots taken elsewhere (``reserve``
+    still refuses them).
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 20000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._days = defaultdict(set)  # resource id -> cached dates
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        stamp = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[1] > stamp:
+                    found[key] = entry[0]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, values: dict) -> None:
+        with self._lock:
+            if len(self._data) + len(values) > self.max_entries:
+                self._data.clear()
+                self._days.clear()
+            expires = time.monotonic() + self.ttl
+            for (resource_id, day), free in values.items():
+                self._data[(resource_id, day)] = (free, expires)
+                self._days[resource_id].add(day)
+
+    def invalidate(self, resource_id) -> None:
+        with self._lock:
+            for day in self._days.pop(resource_id, ()):
+                self._data.pop((resource_id, day), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._days.clear()
+
+
+slot_cache = SlotCache(ttl=getattr(settings, 'BOOKING_SLOT_CACHE_TTL', 60))
+
+
+def find_free_slots(building_id, start, end, duration: timedelta, resource_type=None) -> list:
+    """
+    Open intervals of at least ``duration`` in ``[start, end)`` across a building's resources
+    (optionally of one ``type``), sorted by start time.
+
+    Free time is computed per resource and local day and cached; the days not in the cache
+    are filled from one bookings query (ordered by resource and start), the recurring
+    occurrences expanded for those days only, and one sweep each.
+    """
+    resources = Resource.objects.filter(building_id=building_id)
+    if resource_type:
+        resources = resources.filter(type=resource_type)
+    resources = {rid: (name, capacity) for rid, name, capacity in resources.values_list('id', 'name', 'capacity')}
+
+    first, last = timezone.localtime(start).date(), timezone.localtime(end - timedelta(microseconds=1)).date()
+    days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    keys = [(rid, day) for rid in resources for day in days]
+    cached = slot_cache.get_many(keys)
+    missing = [key for key in keys if key not in cached]
+    if missing:
+        lo, hi = day_bounds(min(day for _, day in missing))[0], day_bounds(max(day for _, day in missing))[1]
+        booked = defaultdict(list)
+        rows = Booking.objects.filter(
+            resource_id__in={rid for rid, _ in missing}, start_time__lt=hi, end_time__gt=lo,
+            status__in=ACTIVE_STATUSES,
+        ).order_by('resource_id', 'start_time').values_list('resource_id', 'start_time', 'end_time')
+        for rid, b_start, b_end in rows:
+            booked[rid].append((b_start, b_end))
+        for rid, occs in recurrence.resource_occurrences({rid for rid, _ in missing}, lo, hi).items():
+            booked[rid].extend((occ.start, occ.end) for occ in occs)
+        fresh = {}
+        for rid, day in missing:
+            d_start, d_end = day_bounds(day)
+            fresh[(rid, day)] = free_intervals(booked[rid], d_start, d_end, max(resources[rid][1], 1))
+        slot_cache.set_many(fresh)
+        cached.update(fresh)
+
+    slots = []
+    for rid, (name, capacity) in resources.items():
+        merged = []
+        for day in days:
+            for lo, hi in cached[(rid, day)]:
+                lo, hi = max(lo, start), min(hi, end)
+                if lo >= hi:
+                    continue
+                if merged and merged[-1][1] == lo:  # runs on past midnight
+                    merged[-1] = (merged[-1][0], hi)
+                else:
+                    merged.append((lo, hi))
+        slots.extend({
+            'resource_id': rid, 'resource_name': name, 'capacity': capacity, 'start': lo, 'end': hi,
+        } for lo, hi in merged if hi - lo >= duration)
+    slots.sort(key=lambda slot: (slot['start'], slot['resource_id']))
+    return slots
+
+
+def _invalidate_slots(resource_id) -> None:
+    slot_cache.invalidate(resource_id)
+    # Again once committed, in case a search cached the old rows in between
+    transaction.on_commit(lambda: slot_cache.invalidate(resource_id))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def _booking_changed(sender, instance, **kwargs):
+    _invalidate_slots(instance.resource_id)
+
+
+@receiver(post_save, sender=RecurringBooking)
+@receiver(post_delete, sender=RecurringBooking)
+def _rule_changed(sender, instance, **kwargs):
+    _invalidate_slots(instance.resource_id)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def _resource_changed(sender, instance, **kwargs):
+    _invalidate_slots(instance.pk)
+
+
+@receiver(post_save, sender=RecurringBookingException)
+@receiver(post_delete, sender=RecurringBookingException)
+def _occurrence_changed(sender, instance, **kwargs):
+    # Created exceptions carry their rule; otherwise fetch just its resource id
+    if RecurringBookingException.recurrence.is_cached(instance):
+        resource_id = instance.recurrence.resource_id
+    else:
+        resource_id = RecurringBooking.objects.filter(pk=instance.recurrence_id).values_list(
+            'resource_id', flat=True).first()
+    if resource_id is not None:
+        _invalidate_slots(resource_id)
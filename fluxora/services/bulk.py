@@ -0,0 +1,55 @@
+# fluxora/services/bulk.py
+from django.db import NotSupportedError, connections, router, transaction
+
+# Backends that cannot return rows from a multi-row INSERT: SQL giving one id of the statement
+# just run on this connection, whether that is the first (True) or last (False) row's id, and
+# the auto-increment step
+_INSERTED_ID_SQL = {
+    'mysql': ('SELECT LAST_INSERT_ID(), @@auto_increment_increment', True),
+    'sqlite': ('SELECT last_insert_rowid(), 1', False),
+}
+
+
+def bulk_insert(model, objs, batch_size=None) -> list:
+    """
+    ``bulk_create`` that always leaves primary keys set on the instances.
+
+    Backends that cannot return rows from a multi-row INSERT (MySQL) still get one multi-row
+    INSERT per batch. The ids are then derived from ``LAST_INSERT_ID()``, which is the id of
+    the batch's first row. InnoDB hands a single INSERT with a known row count one consecutive
+    block of auto-increment values, ``@@auto_increment_increment`` apart, in any
+    ``innodb_autoinc_lock_mode``. Like ``bulk_create``, no signals are sent, so callers keep
+    doing their own post-save bookkeeping either way.
+    """
+    objs = list(objs)
+    db = router.db_for_write(model)
+    connection = connections[db]
+    manager = model._base_manager.using(db)
+    if not objs or connection.features.can_return_rows_from_bulk_insert:
+        return manager.bulk_create(objs, batch_size=batch_size)
+    if connection.vendor not in _INSERTED_ID_SQL:
+        raise NotSupportedError(f'bulk_insert cannot recover ids on {connection.vendor}')
+
+    opts = model._meta
+    with_pk = [obj for obj in objs if obj.pk is not None]
+    without_pk = [obj for obj in objs if obj.pk is None]
+    fields = [f for f in opts.concrete_fields if not f.generated and f is not opts.auto_field]
+    # Each batch must be exactly one INSERT statement for the id arithmetic to hold
+    size = max(connection.ops.bulk_batch_size(fields, without_pk), 1)
+    size = min(batch_size, size) if batch_size else size
+    sql, returns_first = _INSERTED_ID_SQL[connection.vendor]
+    with transaction.atomic(using=db, savepoint=False):
+        if with_pk:
+            manager.bulk_create(with_pk, batch_size=batch_size)
+        for offset in range(0, len(without_pk), size):
+            batch = without_pk[offset:offset + size]
+            manager.bulk_create(batch)
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                inserted_id, step = cursor.fetchone()
+            first = inserted_id if returns_first else inserted_id - (len(batch) - 1) * step
+            for i, obj in enumerate(batch):
+                obj.pk = first + i * step
+                obj._state.adding = False
+                obj._state.db = db
+    return objs
@@ -0,0 +1,431 @@
+# fluxora/services/chat.py
+import asyncio
+import atexit
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from functools import partial
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from fluxora.models import ChatRoom, Message, Resident, RoomMember
+from fluxora.services.bulk import bulk_insert
+from fluxora.services.pubsub import hub
+
+try:
+    # Closes stale DB connections around each call, like Django's request cycle does
+    from channels.db import database_sync_to_async  # type: ignore
+except Exception:
+    from asgiref.sync import sync_to_async as database_sync_to_async
+
+try:
+    from channels.layers import get_channel_layer  # type: ignore
+except Exception:
+    get_channel_layer = None
+
+# Process-wide websocket counters (frames in, throttled, dropped, ...), see /api/chat/metrics/
+ws_counters = Counter()
+
+
+def chat_topic(room_id) -> str:
+    """Pub/sub topic (and channel-layer group) for a room."""
+    return f"chat_{room_id}"
+
+
+def chat_resident(user, room_id) -> Optional[tuple]:
+    """``(resident id, display name)`` of an authenticated user in the room's building (matched by email), or None."""
+    if not (user and getattr(user, 'is_authenticated', False) and getattr(user, 'email', None)):
+        return None
+    return (
+        Resident.objects
+        .filter(user__email=user.email, building__chatroom__id=room_id)
+        .values_list('id', 'user__name')
+        .first()
+    )
+
+
+def chat_resident_id(user, room_id) -> Optional[int]:
+    """Resident id of an authenticated user in the room's building, or None."""
+    resident = chat_resident(user, room_id)
+    return resident[0] if resident else None
+
+
+class MessageBuffer:
+    """
+    Async write-behind buffer for chat ``Message`` rows.
+
+    Consumers ``add()`` messages without touching the database; a background task writes
+    them with one ``bulk_insert`` every ``flush_interval_ms`` or as soon as ``max_batch``
+    are waiting. A failed batch is put back once and dropped on its second failure. When
+    more than ``max_pending`` rows are waiting the oldest are dropped, so a database outage
+    cannot exhaust memory. ``flush()`` drains everything immediately (used on disconnect);
+    whatever is left at interpreter exit is written synchronously.
+
+    Rows get ``sent_at`` when they are flushed (``auto_now_add``), i.e. at most one flush
+    interval after they were received; id order is arrival order.
+    """
+
+    def __init__(self, flush_interval_ms: int = 250, max_batch: int = 100, max_pending: int = 10000):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = deque()  # (Message, attempts)
+        self._loop = None
+        self._lock = None
+        self._wake = None
+        self._task = None
+        self._latencies = deque(maxlen=512)
+        self.stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    # ---------- producer side ----------
+
+    def add(self, room_id, resident_id, content, key=None) -> Message:
+        """
+        Queue one message for persistence; never blocks. The instance gets its pk when flushed.
+
+        ``key`` is the frame's relay key (see ``RoomHistory``); once the row is stored its id is
+        announced to the room under that key.
+        """
+        message = Message(room_id=room_id, resident_id=resident_id, content=content)
+        message.relay_key = key
+        self._pending.append((message, 0))
+        self.stats['enqueued'] += 1
+        overflow = len(self._pending) - self.max_pending
+        for _ in range(max(0, overflow)):
+            self._pending.popleft()
+            self.stats['dropped'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], len(self._pending))
+        self._ensure_running()
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return message
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    # ---------- flushing ----------
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (tests, worker restart): rebind the primitives
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+            self._task = None
+
+    def _ensure_running(self) -> None:
+        self._bind()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if not self._pending:
+                # Idle: stop until the next add() restarts us
+                self._task = None
+                return
+
+    async def flush(self) -> int:
+        """Write everything currently buffered; returns the number of rows persisted."""
+        if not self._pending:
+            return 0
+        self._bind()
+        written = 0
+        async with self._lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                started = time.perf_counter()
+                try:
+                    await database_sync_to_async(self._write)([msg for msg, _ in batch])
+                except Exception:
+                    self.stats['failed_flushes'] += 1
+                    retry = [(msg, attempts + 1) for msg, attempts in batch if attempts == 0]
+                    self.stats['dropped'] += len(batch) - len(retry)
+                    self._pending.extendleft(reversed(retry))
+                    break
+                self._record_flush(len(batch), started)
+                written += len(batch)
+                await announce_ids([msg for msg, _ in batch])
+        return written
+
+    def flush_sync(self) -> int:
+        """Blocking flush for shutdown, when no event loop is running any more."""
+        batch = [msg for msg, _ in self._pending]
+        self._pending.clear()
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        self._write(batch)
+        self._record_flush(len(batch), started)
+        return len(batch)
+
+    def _write(self, messages: list) -> None:
+        with transaction.atomic():
+            # Ids are needed below (room pointers, read pointers, history entries)
+            bulk_insert(Message, messages, batch_size=self.max_batch)
+            # No post_save for bulk inserts; advance counters for the batch here
+            record_persisted(messages)
+
+    def _record_flush(self, count: int, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        self._latencies.append(elapsed)
+        self.stats['flushed'] += count
+        self.stats['flushes'] += 1
+        self.stats['last_flush_ms'] = round(elapsed, 3)
+
+    # ---------- metrics ----------
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pick(q):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+        return {
+            **self.stats,
+            'depth': self.depth,
+            'flush_ms_p50': pick(0.50),
+            'flush_ms_p95': pick(0.95),
+            'flush_ms_max': pick(1.0),
+        }
+
+
+async def announce_ids(messages) -> None:
+    """
+    Tell every worker the ids of freshly stored messages, keyed by the relay key of their frame,
+    so history entries recorded from the relayed frame learn their id (best effort).
+    """
+    layer = get_channel_layer() if get_channel_layer is not None else None
+    if layer is None:
+        return
+    by_room = defaultdict(list)
+    for message in messages:
+        key = getattr(message, 'relay_key', None)
+        if key is not None and message.pk is not None:
+            by_room[message.room_id].append([key, message.pk])
+    for room_id, ids in by_room.items():
+        try:
+            await layer.group_send(chat_topic(room_id), {'type': 'chat.persisted', 'ids': ids})
+        except Exception:
+            pass
+
+
+message_buffer = MessageBuffer(
+    flush_interval_ms=getattr(settings, 'CHAT_FLUSH_INTERVAL_MS', 250),
+    max_batch=getattr(settings, 'CHAT_FLUSH_BATCH', 100),
+)
+
+
+# ---------- Unread counters ----------
+
+def _sender_names(resident_ids) -> dict:
+    return dict(Resident.objects.filter(pk__in=list(resident_ids)).values_list('id', 'user__name'))
+
+
+def record_persisted(messages) -> None:
+    """
+    Update room last-message columns and members' unread counters for newly stored messages.
+
+    Costs two UPDATEs per room plus one per distinct sender, whatever the batch size.
+    A sender has implicitly read the room up to their own latest message.
+    """
+    by_room = defaultdict(list)
+    for message in messages:
+        by_room[message.room_id].append(message)
+    stamp = now()
+    for room_id, items in by_room.items():
+        if hub.subscriber_count(chat_topic(room_id)):
+            # Stored messages for in-process listeners (SSE streams), once committed
+            names = _sender_names({m.resident_id for m in items})
+            transaction.on_commit(partial(hub.publish_many, chat_topic(room_id), [{
+                'id': m.pk, 'text': m.content, 'sender': names.get(m.resident_id),
+                'sent_at': (m.sent_at or stamp).isoformat(),
+            } for m in items]))
+        last = items[-1]
+        ChatRoom.objects.filter(pk=room_id).update(
+            last_message_id=last.pk, last_message_at=last.sent_at or stamp,
+            last_message_preview=(last.content or '')[:255], last_message_resident_id=last.resident_id,
+        )
+        RoomMember.objects.filter(room_id=room_id).update(unread_count=F('unread_count') + len(items))
+        for resident_id in Counter(m.resident_id for m in items):
+            own_last = max(i for i, m in enumerate(items) if m.resident_id == resident_id)
+            after = sum(1 for m in items[own_last + 1:] if m.resident_id != resident_id)
+            RoomMember.objects.filter(room_id=room_id, resident_id=resident_id).update(
+                unread_count=after, last_read_message_id=items[own_last].pk, last_read_at=stamp,
+            )
+
+
+def mark_read(room_id, resident_id, message_id=None):
+    """
+    Move a member's read pointer forward (to the latest message by default) and recount unread.
+
+    Raises ValueError when ``message_id`` is not a message of the room.
+    """
+    member = RoomMember.objects.filter(room_id=room_id, resident_id=resident_id).first()
+    if member is None:
+        return None
+    if message_id is None:
+        message_id = Message.objects.filter(room_id=room_id).order_by('-id').values_list('id', flat=True).first()
+    if message_id is None:
+        return member
+    message_id = int(message_id)
+    if not Message.objects.filter(room_id=room_id, id=message_id).exists():
+        raise ValueError('message_id is not a message of this room')
+    if member.last_read_message_id is not None and message_id < member.last_read_message_id:
+        return member  # pointers never move backwards
+    member.last_read_message_id = message_id
+    member.last_read_at = now()
+    member.unread_count = (
+        Message.objects.filter(room_id=room_id, id__gt=message_id).exclude(resident_id=resident_id).count()
+    )
+    member.save(update_fields=['last_read_message_id', 'last_read_at', 'unread_count'])
+    return member
+
+
+@receiver(post_save, sender=Message)
+def _message_saved(sender, instance, created, **kwargs):
+    if created:
+        record_persisted([instance])
+        # Websocket frames are recorded on receipt; messages created over REST are recorded here
+        sender_name = _sender_names([instance.resident_id]).get(instance.resident_id)
+        room_history.record(instance.room_id, instance.content, sender_name, instance)
+
+
+class _Entry:
+    __slots__ = ('message', 'pk', 'key', 'text', 'sender', 'sent_at')
+
+    def __init__(self, text, sender, sent_at, pk=None, message=None, key=None):
+        self.message, self.pk, self.key = message, pk, key
+        self.text, self.sender, self.sent_at = text, sender, sent_at
+
+    @property
+    def id(self):
+        # Live entries learn their id once the write-behind buffer has flushed them
+        return self.pk if self.message is None else self.message.pk
+
+    def as_dict(self) -> dict:
+        return {'id': self.id, 'text': self.text, 'sender': self.sender, 'sent_at': self.sent_at}
+
+
+class RoomHistory:
+    """
+    Per-room ring buffer of the last ``size`` messages, for the backlog frame on connect.
+
+    A room is backfilled from the ``(room, sent_at)`` index the first time someone opens it;
+    after that ``record()`` keeps it current and ``backlog()`` is served from memory with no
+    queries. Messages recorded before the backfill (including ones still in the write-behind
+    buffer) are kept when newer than the newest stored id. At most ``max_rooms`` rooms are
+    kept (least recently used are evicted).
+
+    The ring is per process. Websocket frames carry a relay key, so every process records
+    frames relayed from other workers once (``record`` skips keys it already holds) and
+    picks up their ids from ``assign_ids``. Messages created over REST are only recorded by
+    the process that saved them; ``ttl`` seconds (0 = never) bounds how long another
+    process can miss them.
+    """
+
+    def __init__(self, size: int = 50, max_rooms: int = 1000, ttl: float = 60):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.ttl = ttl
+        self._rooms = OrderedDict()  # room_id -> (ring, backfilled_at or None)
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _ring(self, room_id):
+        room_id = int(room_id)
+        entry = self._rooms.get(room_id)
+        if entry is None:
+            entry = (deque(maxlen=self.size), None)
+            self._rooms[room_id] = entry
+            if len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+                self.stats['evictions'] += 1
+        else:
+            self._rooms.move_to_end(room_id)
+        return entry
+
+    def record(self, room_id, text, sender, message=None, key=None) -> bool:
+        """Append a message; False when an entry with the same relay ``key`` is already there."""
+        ring, _ = self._ring(room_id)
+        if key is not None and any(entry.key == key for entry in reversed(ring)):
+            return False
+        ring.append(_Entry(text, sender, now().isoformat(), message=message, key=key))
+        return True
+
+    def assign_ids(self, room_id, ids) -> None:
+        """Set ids (``[(key, id), ...]``) on entries recorded from frames relayed by other workers."""
+        entry = self._rooms.get(int(room_id))
+        if entry is None:
+            return
+        ids = dict(ids)
+        for item in entry[0]:
+            if item.message is None and item.pk is None and item.key in ids:
+                item.pk = ids[item.key]
+
+    def _load(self, room_id) -> list:
+        rows = (
+            Message.objects
+            .filter(room_id=room_id)
+            .order_by('-sent_at', '-id')
+            .values_list('id', 'content', 'resident__user__name', 'sent_at')[:self.size]
+        )
+        return [_Entry(content, sender, sent_at.isoformat(), pk=pk) for pk, content, sender, sent_at in reversed(rows)]
+
+    async def backlog(self, room_id) -> list:
+        """The room's recent messages, oldest first."""
+        ring, backfilled_at = self._ring(room_id)
+        if backfilled_at is not None and not (self.ttl and time.monotonic() - backfilled_at > self.ttl):
+            self.stats['hits'] += 1
+            return [entry.as_dict() for entry in ring]
+
+        self.stats['misses'] += 1
+        loaded = await database_sync_to_async(self._load)(room_id)
+        # No awaits from here on: frames recorded while the query ran are already in ``ring``
+        ring, _ = self._ring(room_id)
+        newest = loaded[-1].pk if loaded else 0
+        live = [entry for entry in ring if entry.id is None or entry.id > newest]
+        merged = deque(loaded + live, maxlen=self.size)
+        self._rooms[int(room_id)] = (merged, time.monotonic())
+        return [entry.as_dict() for entry in merged]
+
+    def metrics(self) -> dict:
+        return {**self.stats, 'rooms': len(self._rooms)}
+
+
+room_history = RoomHistory(
+    size=getattr(settings, 'CHAT_HISTORY_SIZE', 50),
+    max_rooms=getattr(settings, 'CHAT_HISTORY_ROOMS', 1000),
+    ttl=getattr(settings, 'CHAT_HISTORY_TTL', 60),
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        message_buffer.flush_sync()
+    except Exception:
+        # Interpreter is going down; nothing left to report to
+        pass
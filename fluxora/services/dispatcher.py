@@ -0,0 +1,303 @@
+# fluxora/services/dispatcher.py
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from fluxora.models import Notification, NotificationOutbox, OutboxChannel, OutboxStatus, Resident
+from fluxora.services import events
+from fluxora.services.ratelimit import TokenBucket
+
+DISPATCH_BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A row left in SENDING this long belongs to a dispatcher that died; put it back in the queue
+STALE_LOCK_SECONDS = 600
+
+
+class DeliveryError(Exception):
+    """A provider rejected a message."""
+
+
+class ProviderNotConfigured(DeliveryError):
+    """No real provider handles the channel; retrying cannot help."""
+
+
+# ---------- Providers ----------
+# A provider has ``send(item)`` (raise on failure) and ``close()``. ``send`` runs on worker
+# threads and must not touch the database.
+
+class EmailProvider:
+    """Django mail backend; each worker thread keeps one open connection for the whole run."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = get_connection(fail_silently=False)
+            conn.open()
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def send(self, item):
+        sender = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
+        message = EmailMessage(item.subject, item.body, sender, [item.recipient])
+        try:
+            sent = self._connection().send_messages([message])
+        except Exception:
+            # Drop the (possibly broken) session so the next message on this thread reconnects
+            self._local.connection = None
+            raise
+        if sent != 1:
+            raise DeliveryError('Email backend did not accept the message')
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+class UnconfiguredProvider:
+    """Default for channels without an integration: fails each row rather than reporting it sent."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    def send(self, item):
+        raise ProviderNotConfigured(f'No {self.channel} provider configured (settings.NOTIFICATION_PROVIDERS)')
+
+    def close(self):
+        pass
+
+
+class LocalStubProvider:
+    """
+    Offline provider for load tests: simulated latency and failure rate, counts what it "sent".
+    """
+
+    def __init__(self, latency_ms: float = 0, failure_rate: float = 0.0, seed=None):
+        self.latency = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, item):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise DeliveryError('Simulated provider failure')
+            self.sent += 1
+
+    def close(self):
+        pass
+
+
+# Channels without a default need a provider in ``settings.NOTIFICATION_PROVIDERS``
+DEFAULT_PROVIDERS = {
+    OutboxChannel.EMAIL: EmailProvider,
+}
+
+
+def default_providers() -> dict:
+    """Provider instances per channel; ``settings.NOTIFICATION_PROVIDERS`` maps channels to dotted paths."""
+    configured = getattr(settings, 'NOTIFICATION_PROVIDERS', None) or {}
+    providers = {}
+    for channel in OutboxChannel.values:
+        path = configured.get(channel)
+        if path:
+            providers[channel] = import_string(path)()
+        elif channel in DEFAULT_PROVIDERS:
+            providers[channel] = DEFAULT_PROVIDERS[channel]()
+        else:
+            providers[channel] = UnconfiguredProvider(channel)
+    return providers
+
+
+# ---------- Enqueue ----------
+
+def enqueue_notification(building_id, message: str, type: str = 'notice', subject: str = '',
+                         channels=(OutboxChannel.EMAIL,), resident_ids=None, payload=None) -> dict:
+    """
+    Fan a notice out to a building's residents.
+
+    Writes the in-app ``Notification`` rows and one outbox row per (resident, channel) with a
+    reachable address in the same transaction, both with ``bulk_create``. Residents who opted
+    out still get the in-app notification but no external delivery.
+    """
+    residents = Resident.objects.filter(building_id=building_id)
+    if resident_ids is not None:
+        residents = residents.filter(id__in=resident_ids)
+    rows = residents.order_by('id').values_list('id', 'opt_in', 'user_id', 'user__email', 'user__phone')
+
+    notifications, outbox = [], []
+    for resident_id, opt_in, user_id, email, phone in rows.iterator(chunk_size=DISPATCH_BATCH_SIZE):
+        notifications.append(Notification(building_id=building_id, resident_id=resident_id, type=type, message=message))
+        if not opt_in:
+            continue
+        targets = {
+            OutboxChannel.EMAIL: email,
+            OutboxChannel.SMS: phone,
+            # No device registry yet; push providers resolve the user id to devices
+            OutboxChannel.PUSH: f'user:{user_id}',
+        }
+        for channel in channels:
+            recipient = targets.get(channel)
+            if recipient:
+                outbox.append(NotificationOutbox(
+                    building_id=building_id, resident_id=resident_id, channel=channel,
+                    recipient=recipient, subject=subject or type.title(), body=message, payload=payload,
+                ))
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, batch_size=DISPATCH_BATCH_SIZE)
+        NotificationOutbox.objects.bulk_create(outbox, batch_size=DISPATCH_BATCH_SIZE)
+    if notifications:
+        # bulk_create skips post_save: one summary event instead of one per resident
+        events.publish(building_id, 'notification', 'broadcast', payload={
+            'type': type, 'message': message, 'count': len(notifications),
+        })
+    return {'notifications': len(notifications), 'queued': len(outbox)}
+
+
+# ---------- Dispatch ----------
+
+class Dispatcher:
+    """
+    Drains the outbox through per-channel thread pools.
+
+    Each ``run_once`` claims a batch of due rows (``SKIP LOCKED`` where the database supports
+    it, so several dispatchers can run side by side), hands them to the channel's pool, and
+    writes all outcomes back with one ``bulk_update``. Worker threads only do provider I/O;
+    the database is touched from the calling thread alone. Each channel has its own token
+    bucket, so a slow or throttled SMS gateway does not hold up email. Failed rows are retried
+    with exponential backoff and jitter until ``max_attempts``, then marked FAILED.
+    """
+
+    def __init__(self, providers=None, workers=None, rate_limits=None, batch_size=DISPATCH_BATCH_SIZE,
+                 max_attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE_SECONDS):
+        self.providers = providers if providers is not None else default_providers()
+        workers = workers or getattr(settings, 'NOTIFICATION_WORKERS', 4)
+        rate_limits = rate_limits if rate_limits is not None else getattr(settings, 'NOTIFICATION_RATE_LIMITS', {})
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.pools = {
+            channel: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'notify-{channel}')
+            for channel in self.providers
+        }
+        self.buckets = {channel: TokenBucket(rate_limits.get(channel)) for channel in self.providers}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+        for provider in self.providers.values():
+            provider.close()
+
+    def _claim(self) -> list:
+        stamp = now()
+        NotificationOutbox.objects.filter(
+            status=OutboxStatus.SENDING, locked_at__lt=stamp - timedelta(seconds=STALE_LOCK_SECONDS),
+        ).update(status=OutboxStatus.PENDING, locked_at=None)
+        with transaction.atomic():
+            qs = NotificationOutbox.objects.filter(
+                status=OutboxStatus.PENDING, next_attempt_at__lte=stamp, channel__in=list(self.providers),
+            ).order_by('next_attempt_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            items = list(qs[:self.batch_size])
+            if items:
+                NotificationOutbox.objects.filter(id__in=[item.id for item in items]).update(
+                    status=OutboxStatus.SENDING, locked_at=stamp,
+                )
+        return items
+
+    def _send(self, channel, item):
+        """Deliver one row; returns ``(error or None, whether the error is final)``."""
+        self.buckets[channel].acquire()
+        try:
+            self.providers[channel].send(item)
+        except Exception as exc:
+            return f'{type(exc).__name__}: {exc}'[:1000], isinstance(exc, ProviderNotConfigured)
+        return None, False
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(BACKOFF_MAX_SECONDS, self.backoff_base * (2 ** (attempts - 1)))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+    def run_once(self) -> dict:
+        """Claim and deliver one batch; returns counts for it."""
+        items = self._claim()
+        stats = {'claimed': len(items), 'sent': 0, 'retry': 0, 'failed': 0}
+        if not items:
+            return stats
+
+        futures = [(item, self.pools[item.channel].submit(self._send, item.channel, item)) for item in items]
+        stamp = now()
+        for item, future in futures:
+            error, final = future.result()
+            item.attempts += 1
+            item.locked_at = None
+            item.last_error = error
+            if error is None:
+                item.status, item.sent_at = OutboxStatus.SENT, stamp
+                stats['sent'] += 1
+            elif final or item.attempts >= self.max_attempts:
+                item.status = OutboxStatus.FAILED
+                stats['failed'] += 1
+            else:
+                item.status = OutboxStatus.PENDING
+                item.next_attempt_at = stamp + self._backoff(item.attempts)
+                stats['retry'] += 1
+        NotificationOutbox.objects.bulk_update(
+            items, ['status', 'attempts', 'locked_at', 'last_error', 'sent_at', 'next_attempt_at'],
+            batch_size=self.batch_size,
+        )
+        return stats
+
+    def drain(self, max_batches=None) -> dict:
+        """Run batches until nothing is due (or ``max_batches`` ran)."""
+        totals = defaultdict(int)
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            stats = self.run_once()
+            if not stats['claimed']:
+                break
+            batches += 1
+            for key, value in stats.items():
+                totals[key] += value
+        totals['batches'] = batches
+        return dict(totals)
+
+
+def dispatch_pending(**kwargs) -> dict:
+    """Drain the outbox once with a short-lived dispatcher."""
+    with Dispatcher(**kwargs) as dispatcher:
+        return dispatcher.drain()
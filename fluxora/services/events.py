@@ -0,0 +1,181 @@
+# fluxora/services/events.py
+import json
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from fluxora.models import BuildingEvent, Emergency, GateEvent, LiftStatusLog, Notification, Resident, User
+from fluxora.services.bulk import bulk_insert
+from fluxora.services.pubsub import hub
+
+try:
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer  # type: ignore
+except Exception:
+    get_channel_layer = None
+
+# Model -> event kind pushed on the building stream
+EVENT_SOURCES = {
+    GateEvent: 'gate_event',
+    LiftStatusLog: 'lift_status',
+    Emergency: 'emergency',
+    Notification: 'notification',
+}
+# device_status is published directly by fluxora.services.intercom, not from a model save
+EVENT_KINDS = tuple(EVENT_SOURCES.values()) + ('device_status',)
+WATCH_ROLES = ('admin', 'committee', 'guard', 'staff')
+# Viewer that receives every frame unredacted (see building_viewer)
+FULL_VIEW = 'full'
+RESUME_LIMIT = 1000
+PRUNE_BATCH = 5000
+
+
+def group_name(building_id) -> str:
+    return f"building_events_{building_id}"
+
+
+def snapshot(instance) -> dict:
+    """JSON-safe dict of the instance's concrete columns (datetimes/decimals as strings)."""
+    data = {f.attname: getattr(instance, f.attname) for f in instance._meta.concrete_fields}
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def as_frame(event: BuildingEvent) -> dict:
+    return {
+        'seq': event.id,
+        'kind': event.kind,
+        'action': event.action,
+        'id': event.object_id,
+        'data': event.payload,
+        'at': event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+def publish_many(events: list) -> list:
+    """
+    Log events (dicts of BuildingEvent fields) in one batch and fan them out per building.
+
+    Frames carry the row id as ``seq``, so rows go through ``bulk_insert``, which sets ids
+    even where a multi-row INSERT cannot return them.
+
+    Delivery (in-process hub for SSE, channel layer for websockets) is best effort: a missing
+    or failing channel layer never breaks the write that produced the event, and clients that
+    missed it can resume from the log.
+    """
+    if not events:
+        return []
+    rows = bulk_insert(BuildingEvent, [BuildingEvent(**event) for event in events])
+    by_building = {}
+    for row in rows:
+        by_building.setdefault(row.building_id, []).append(as_frame(row))
+    layer = get_channel_layer() if get_channel_layer is not None else None
+    for building_id, frames in by_building.items():
+        # In-process listeners (SSE) first, then websocket consumers via the channel layer
+        hub.publish_many(group_name(building_id), frames)
+        if layer is None:
+            continue
+        try:
+            async_to_sync(layer.group_send)(group_name(building_id), {'type': 'building.events', 'events': frames})
+        except Exception:
+            pass
+    return rows
+
+
+def publish(building_id, kind: str, action: str, object_id=None, payload=None) -> None:
+    publish_many([{
+        'building_id': building_id, 'kind': kind, 'action': action, 'object_id': object_id, 'payload': payload,
+    }])
+
+
+def events_since(building_id, seq: int, kinds=None, limit: int = RESUME_LIMIT):
+    """
+    Logged events after ``seq`` for a reconnecting client, oldest first.
+
+    Returns ``(frames, complete)``; ``complete`` is False when more than ``limit`` events were
+    missed, in which case the client should reload state over REST instead.
+    """
+    qs = BuildingEvent.objects.filter(building_id=building_id, id__gt=seq)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    rows = list(qs.order_by('id')[:limit + 1])
+    return [as_frame(row) for row in rows[:limit]], len(rows) <= limit
+
+
+def latest_seq(building_id) -> int:
+    return BuildingEvent.objects.filter(building_id=building_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def building_viewer(user, building_id):
+    """
+    Who is watching a building's stream: ``FULL_VIEW`` for Django staff and admin/committee/
+    guard/staff business users, the resident id for a resident of the building (who gets a
+    redacted stream, see ``visible_frames``), or None when the user may not watch it.
+    """
+    if not (user and getattr(user, 'is_authenticated', False)):
+        return None
+    if getattr(user, 'is_staff', False) or getattr(user, 'is_superuser', False):
+        return FULL_VIEW
+    email = getattr(user, 'email', None)
+    if not email:
+        return None
+    if User.objects.filter(email=email, role__in=WATCH_ROLES).exists():
+        return FULL_VIEW
+    return Resident.objects.filter(user__email=email, building_id=building_id).values_list('id', flat=True).first()
+
+
+def visible_frames(frames, viewer) -> list:
+    """
+    The frames ``viewer`` (from ``building_viewer``) may receive.
+
+    Residents get lift and device status as is, notifications addressed to them or to the
+    whole building, and their own emergencies. Gate events, other residents' emergencies and
+    broadcast summaries reach them without the payload.
+    """
+    if viewer == FULL_VIEW:
+        return list(frames)
+    visible = []
+    for frame in frames:
+        kind, data = frame.get('kind'), frame.get('data') or {}
+        if kind in ('lift_status', 'device_status'):
+            visible.append(frame)
+        elif kind == 'notification' and frame.get('action') != 'broadcast':
+            if data.get('resident_id') in (None, viewer):
+                visible.append(frame)
+        elif kind == 'emergency' and data.get('resident_id') == viewer:
+            visible.append(frame)
+        else:
+            visible.append({**frame, 'data': None})
+    return visible
+
+
+def prune_events(retention_hours=None) -> int:
+    """Delete logged events older than the resume window, in batches."""
+    hours = retention_hours or getattr(settings, 'BUILDING_EVENTS_RETENTION_HOURS', 24)
+    cutoff = now() - timedelta(hours=hours)
+    deleted = 0
+    while True:
+        ids = list(BuildingEvent.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:PRUNE_BATCH])
+        if not ids:
+            return deleted
+        deleted += BuildingEvent.objects.filter(id__in=ids).delete()[0]
+
+
+@receiver(post_save, sender=GateEvent)
+@receiver(post_save, sender=LiftStatusLog)
+@receiver(post_save, sender=Emergency)
+@receiver(post_save, sender=Notification)
+def _source_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    event = partial(
+        publish, instance.building_id, EVENT_SOURCES[sender], 'created' if created else 'updated',
+        instance.pk, snapshot(instance),
+    )
+    # Only announce rows that actually committed
+    transaction.on_commit(event)
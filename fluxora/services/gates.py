@@ -0,0 +1,209 @@
+# fluxora/services/gates.py
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDay, TruncHour
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from fluxora.models import (
+    Building, GateEvent, GateEventType, GateTrafficRollup, RollupPeriod, User,
+)
+from fluxora.services import events
+from fluxora.services.bulk import bulk_insert
+from fluxora.services.intercom import MAX_CLOCK_SKEW, parse_timestamp
+from fluxora.services.retention import retention_cutoff
+
+MAX_BATCH = 5000
+COUNTERS = {GateEventType.OPEN: 'opens', GateEventType.CLOSE: 'closes'}
+
+
+def buckets(stamp) -> dict:
+    """Start of the local hour and day containing ``stamp``, per rollup period."""
+    local = timezone.localtime(stamp)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return {RollupPeriod.HOUR: hour, RollupPeriod.DAY: hour.replace(hour=0)}
+
+
+# ---------- Incremental rollups ----------
+
+def _add(building_id, period, bucket, deltas: dict) -> None:
+    updated = GateTrafficRollup.objects.filter(building_id=building_id, period=period, bucket=bucket).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            GateTrafficRollup.objects.create(building_id=building_id, period=period, bucket=bucket, **deltas)
+    except IntegrityError:
+        # Created concurrently; add on top of it
+        _add(building_id, period, bucket, deltas)
+
+
+def record_traffic(rows) -> int:
+    """
+    Count ``(building_id, event_type, timestamp)`` rows into the hourly and daily rollups.
+
+    Rows are grouped in memory first, so a batch costs one UPDATE (or INSERT) per distinct
+    bucket, not per event. Returns the number of buckets touched.
+    """
+    deltas = defaultdict(Counter)
+    for building_id, event_type, stamp in rows:
+        counter = COUNTERS.get(event_type)
+        if counter is None:
+            continue
+        for period, bucket in buckets(stamp).items():
+            deltas[(building_id, period, bucket)][counter] += 1
+    for (building_id, period, bucket), counts in sorted(deltas.items()):
+        _add(building_id, period, bucket, dict(counts))
+    return len(deltas)
+
+
+def rebuild_rollups(building_ids=None, since=None) -> int:
+    """
+    Recompute rollups from raw events with grouped queries (for backfills and drift checks).
+
+    Defaults to the retention window: older events may already be archived, and their
+    rollups are the only counts left.
+    """
+    if since is None:
+        since = retention_cutoff()
+    qs = GateEvent.objects.all()
+    rollups = GateTrafficRollup.objects.all()
+    if building_ids is not None:
+        qs = qs.filter(building_id__in=building_ids)
+        rollups = rollups.filter(building_id__in=building_ids)
+    if since:
+        # Whole days only, so the day buckets are recomputed completely
+        since = buckets(since)[RollupPeriod.DAY]
+        qs = qs.filter(timestamp__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+    rows = []
+    for period, trunc in ((RollupPeriod.HOUR, TruncHour), (RollupPeriod.DAY, TruncDay)):
+        grouped = (
+            qs.annotate(bucket=trunc('timestamp')).values_list('building_id', 'bucket')
+            .annotate(opens=Count('id', filter=Q(event_type=GateEventType.OPEN)),
+                      closes=Count('id', filter=Q(event_type=GateEventType.CLOSE)))
+            .order_by()
+        )
+        rows.extend(
+            GateTrafficRollup(building_id=b, period=period, bucket=bucket, opens=opens, closes=closes)
+            for b, bucket, opens, closes in grouped.iterator(chunk_size=MAX_BATCH)
+        )
+    with transaction.atomic():
+        rollups.delete()
+        GateTrafficRollup.objects.bulk_create(rows, batch_size=MAX_BATCH)
+    return len(rows)
+
+
+# ---------- Batched ingestion ----------
+
+def parse_gate_event(raw):
+    """Validate one controller event; returns ``(fields, None)`` or ``(None, error message)``."""
+    if not isinstance(raw, dict):
+        return None, 'event must be an object'
+    try:
+        fields = {'building_id': int(raw.get('building', raw.get('building_id')))}
+    except (TypeError, ValueError):
+        return None, 'building must be an integer'
+    if raw.get('event_type') not in GateEventType.values:
+        return None, f"event_type must be one of {', '.join(GateEventType.values)}"
+    fields['event_type'] = raw['event_type']
+    actor = raw.get('actor', raw.get('actor_id'))
+    if actor not in (None, ''):
+        try:
+            fields['actor_id'] = int(actor)
+        except (TypeError, ValueError):
+            return None, 'actor must be an integer'
+    if raw.get('timestamp') not in (None, ''):
+        try:
+            fields['timestamp'] = parse_timestamp(raw['timestamp'])
+        except (ValueError, OverflowError, OSError):
+            return None, 'timestamp must be ISO 8601 or epoch seconds'
+        if fields['timestamp'] > timezone.now() + MAX_CLOCK_SKEW:
+            return None, 'timestamp is in the future'
+    return fields, None
+
+
+def ingest_gate_events(raw_events: list) -> list:
+    """
+    Store a batch of gate events: two existence queries, one ``bulk_insert`` (ids are needed
+    for the results and stream events), one event-stream insert and one rollup write per
+    touched bucket.
+
+    Returns one result per event, in order, like ``intercom.ingest_events``.
+    """
+    results = [None] * len(raw_events)
+    parsed = []
+    for index, raw in enumerate(raw_events):
+        fields, error = parse_gate_event(raw)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            parsed.append((index, fields))
+
+    buildings = set(Building.objects.filter(
+        id__in={f['building_id'] for _, f in parsed}).values_list('id', flat=True))
+    actors = set(User.objects.filter(
+        id__in={f['actor_id'] for _, f in parsed if 'actor_id' in f}).values_list('id', flat=True))
+    rows, indexes = [], []
+    received = timezone.now()
+    for index, fields in parsed:
+        if fields['building_id'] not in buildings:
+            results[index] = {'index': index, 'status': 'error', 'error': 'unknown building'}
+        elif 'actor_id' in fields and fields['actor_id'] not in actors:
+            results[index] = {'index': index, 'status': 'error', 'error': 'unknown actor'}
+        else:
+            fields.setdefault('timestamp', received)
+            rows.append(GateEvent(**fields))
+            indexes.append(index)
+
+    with transaction.atomic():
+        created = bulk_insert(GateEvent, rows, batch_size=MAX_BATCH)
+        record_traffic((e.building_id, e.event_type, e.timestamp) for e in created)
+    # Bulk inserts skip post_save: announce the rows on the building streams in one INSERT
+    events.publish_many([{
+        'building_id': e.building_id, 'kind': 'gate_event', 'action': 'created',
+        'object_id': e.pk, 'payload': events.snapshot(e),
+    } for e in created])
+    for index, event in zip(indexes, created):
+        results[index] = {'index': index, 'status': 'created', 'id': event.pk}
+    return results
+
+
+# ---------- Reading ----------
+
+def traffic(building_id, period: str, start, end) -> dict:
+    """Rollup series for a building plus peak buckets and an hour-of-day profile (hourly data)."""
+    start = buckets(start)[period]  # include the bucket ``start`` falls in
+    rows = list(
+        GateTrafficRollup.objects.filter(building_id=building_id, period=period, bucket__gte=start, bucket__lt=end)
+        .order_by('bucket').values_list('bucket', 'opens', 'closes')
+    )
+    series = [{
+        'bucket': timezone.localtime(bucket), 'opens': opens, 'closes': closes, 'total': opens + closes,
+    } for bucket, opens, closes in rows]
+    data = {
+        'building_id': building_id, 'period': period, 'series': series,
+        'totals': {
+            'opens': sum(r['opens'] for r in series), 'closes': sum(r['closes'] for r in series),
+        },
+        'peaks': sorted(series, key=lambda r: (-r['total'], r['bucket']))[:5],
+    }
+    if period == RollupPeriod.HOUR:
+        by_hour = Counter()
+        for row in series:
+            by_hour[row['bucket'].hour] += row['total']
+        data['hour_of_day'] = [{'hour': hour, 'total': by_hour[hour]} for hour in range(24)]
+    return data
+
+
+# Gate events are append-only (the API offers no update or delete), so rollups only ever
+# count new rows; archiving old events deliberately leaves their rollups in place.
+@receiver(post_save, sender=GateEvent)
+def _gate_event_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        record_traffic([(instance.building_id, instance.event_type, instance.timestamp)])
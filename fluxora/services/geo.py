@@ -0,0 +1,100 @@
+# fluxora/services/geo.py
+import math
+from typing import Optional, Sequence, Tuple
+
+from django.db.models import Q
+
+# numpy is optional; distances fall back to a pure-Python loop without it
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+# Grid cell size in degrees (~5.5 km of latitude); vendors are bucketed into these cells
+CELL_DEG = 0.05
+
+
+def geo_cell(lat, lng) -> Tuple[Optional[int], Optional[int]]:
+    """Return the (lat_cell, lng_cell) grid bucket for a coordinate, or (None, None)."""
+    if lat is None or lng is None:
+        return None, None
+    return math.floor(float(lat) / CELL_DEG), math.floor(float(lng) / CELL_DEG)
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> dict:
+    """
+    Degree bounding box around a point.
+
+    Returns lat_min/lat_max and a list of (lng_min, lng_max) ranges; the list has two
+    entries when the box crosses the antimeridian.
+    """
+    radius_km *= 1.001  # pad slightly so float rounding never drops an edge point
+    dlat = radius_km / KM_PER_DEG_LAT
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEG_LAT * cos_lat) >= 180.0:
+        return {'lat_min': lat_min, 'lat_max': lat_max, 'lng_ranges': [(-180.0, 180.0)]}
+    dlng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+    lng_min, lng_max = lng - dlng, lng + dlng
+    if lng_min < -180.0:
+        ranges = [(lng_min + 360.0, 180.0), (-180.0, lng_max)]
+    elif lng_max > 180.0:
+        ranges = [(lng_min, 180.0), (-180.0, lng_max - 360.0)]
+    else:
+        ranges = [(lng_min, lng_max)]
+    return {'lat_min': lat_min, 'lat_max': lat_max, 'lng_ranges': ranges}
+
+
+def cell_range(lo: float, hi: float) -> Tuple[int, int]:
+    """Inclusive grid-cell range covering [lo, hi] degrees."""
+    return math.floor(lo / CELL_DEG), math.floor(hi / CELL_DEG)
+
+
+def haversine_km(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]) -> list:
+    """Great-circle distance (km) from one point to many, computed as a single batch."""
+    if not lats:
+        return []
+    if np is not None:
+        phi1 = math.radians(lat)
+        phi2 = np.radians(np.asarray(lats, dtype=float))
+        dphi = phi2 - phi1
+        dlambda = np.radians(np.asarray(lngs, dtype=float) - lng)
+        a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+    phi1 = math.radians(lat)
+    cos_phi1 = math.cos(phi1)
+    out = []
+    for lat2, lng2 in zip(lats, lngs):
+        phi2 = math.radians(lat2)
+        a = math.sin((phi2 - phi1) / 2) ** 2 + cos_phi1 * math.cos(phi2) * math.sin(math.radians(lng2 - lng) / 2) ** 2
+        out.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return out
+
+
+def nearby(queryset, lat: float, lng: float, radius_km: float) -> list:
+    """
+    Return ``[(distance_km, pk), ...]`` for rows of ``queryset`` within ``radius_km``, nearest first.
+
+    Rows need ``lat_cell``/``lng_cell`` plus ``latitude``/``longitude`` columns. Only the grid
+    cells (and degree bounding box) around the point are fetched from the database; exact
+    distances are then computed for the candidates in one batch.
+    """
+    box = bounding_box(lat, lng, radius_km)
+    lat_cells = cell_range(box['lat_min'], box['lat_max'])
+    lng_q = Q()
+    for lo, hi in box['lng_ranges']:
+        lng_q |= Q(lng_cell__range=cell_range(lo, hi), longitude__range=(lo, hi))
+    rows = list(
+        queryset
+        .filter(lng_q, lat_cell__range=lat_cells, latitude__range=(box['lat_min'], box['lat_max']))
+        .values_list('pk', 'latitude', 'longitude')
+    )
+    if not rows:
+        return []
+    pks, lats, lngs = zip(*rows)
+    distances = haversine_km(lat, lng, [float(v) for v in lats], [float(v) for v in lngs])
+    hits = [(d, pk) for d, pk in zip(distances, pks) if d <= radius_km]
+    hits.sort()
+    return hits
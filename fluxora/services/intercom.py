@@ -0,0 +1,328 @@
+# fluxora/services/intercom.py
+import atexit
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from fluxora.models import IntercomDevice, IntercomLog
+from fluxora.services import events
+from fluxora.services.bulk import bulk_insert
+
+MAX_BATCH = 1000
+EVENT_TYPE_MAX_LENGTH = IntercomLog._meta.get_field('event_type').max_length
+# Device clocks drift; anything further ahead than this is treated as a bad timestamp
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class DeviceCache:
+    """
+    Thread-safe TTL cache of intercom device id -> building id.
+
+    Only devices that exist are cached (a newly registered device is seen on its first
+    event); saving or deleting a device drops its entry.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, device_ids) -> dict:
+        """Building id per known device id; unknown ids are left out. One query for all misses."""
+        found, missing = {}, set()
+        stamp = time.monotonic()
+        with self._lock:
+            for device_id in device_ids:
+                entry = self._data.get(device_id)
+                if entry is not None and entry[1] > stamp:
+                    found[device_id] = entry[0]
+                else:
+                    missing.add(device_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            rows = dict(IntercomDevice.objects.filter(pk__in=missing).values_list('id', 'building_id'))
+            with self._lock:
+                if len(self._data) + len(rows) > self.max_entries:
+                    self._data.clear()
+                expires = time.monotonic() + self.ttl
+                for device_id, building_id in rows.items():
+                    self._data[device_id] = (building_id, expires)
+            found.update(rows)
+        return found
+
+    def invalidate(self, device_id) -> None:
+        with self._lock:
+            self._data.pop(device_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+device_cache = DeviceCache(ttl=getattr(settings, 'INTERCOM_DEVICE_CACHE_TTL', 300))
+
+
+def parse_timestamp(value):
+    """ISO 8601 string or epoch seconds -> aware datetime; naive values are in TIME_ZONE."""
+    if isinstance(value, bool):
+        raise ValueError('timestamp must be ISO 8601 or epoch seconds')
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    if isinstance(value, str):
+        parsed = parse_datetime(value.strip())
+        if parsed is not None:
+            return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+    raise ValueError('timestamp must be ISO 8601 or epoch seconds')
+
+
+def parse_event(raw: dict):
+    """Validate one webhook event; returns ``(fields, None)`` or ``(None, error message)``."""
+    if not isinstance(raw, dict):
+        return None, 'event must be an object'
+    try:
+        device_id = int(raw.get('device_id'))
+    except (TypeError, ValueError):
+        return None, 'device_id must be an integer'
+    event_type = raw.get('event_type')
+    if not isinstance(event_type, str) or not event_type.strip():
+        return None, 'event_type is required'
+    if len(event_type) > EVENT_TYPE_MAX_LENGTH:
+        return None, f'event_type is longer than {EVENT_TYPE_MAX_LENGTH} characters'
+    fields = {'device_id': device_id, 'event_type': event_type}
+    if raw.get('timestamp') not in (None, ''):
+        try:
+            fields['timestamp'] = parse_timestamp(raw['timestamp'])
+        except (ValueError, OverflowError, OSError):
+            return None, 'timestamp must be ISO 8601 or epoch seconds'
+        if fields['timestamp'] > timezone.now() + MAX_CLOCK_SKEW:
+            return None, 'timestamp is in the future'
+    details = raw.get('details')
+    if details is not None and not isinstance(details, str):
+        details = json.dumps(details)
+    fields['details'] = details
+    return fields, None
+
+
+def ingest_events(raw_events: list) -> list:
+    """
+    Store a batch of intercom events with one device lookup (cached) and one ``bulk_insert``
+    (so every result has its id, also on MySQL).
+
+    Returns one result per event, in order: ``{"index", "status": "created", "id"}`` or
+    ``{"index", "status": "error", "error"}``. Invalid events do not stop the rest.
+    """
+    results = [None] * len(raw_events)
+    parsed = []
+    for index, raw in enumerate(raw_events):
+        fields, error = parse_event(raw)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            parsed.append((index, fields))
+
+    known = device_cache.resolve({fields['device_id'] for _, fields in parsed})
+    logs, indexes = [], []
+    received = timezone.now()
+    for index, fields in parsed:
+        if fields['device_id'] not in known:
+            results[index] = {'index': index, 'status': 'error', 'error': 'unknown device'}
+            continue
+        fields.setdefault('timestamp', received)
+        logs.append(IntercomLog(**fields))
+        indexes.append(index)
+
+    for index, log in zip(indexes, bulk_insert(IntercomLog, logs, batch_size=MAX_BATCH)):
+        results[index] = {'index': index, 'status': 'created', 'id': log.pk}
+    # A device that reports events is alive
+    heartbeats.beat_many({log.device_id for log in logs}, received)
+    return results
+
+
+# ---------- Heartbeats ----------
+
+class HeartbeatTracker:
+    """
+    In-memory last-seen map for intercom devices, written through to the database.
+
+    ``beat`` only touches memory. Pending timestamps are written with one ``bulk_update``
+    ``flush_interval`` seconds after the first unwritten beat (a daemon timer), by the
+    sweeper task and at exit. The per-building device lists behind ``health`` are reloaded
+    from the database at most every ``flush_interval`` and merged with local beats, so health
+    checks rarely query yet still see heartbeats received by other processes.
+    """
+
+    def __init__(self, flush_interval: float = 30.0, offline_after: float = 180.0):
+        self.flush_interval = flush_interval
+        self.offline_after = offline_after
+        self._last_seen = {}  # device id -> datetime
+        self._pending = {}  # device id -> datetime not yet written
+        self._buildings = {}  # building id -> (loaded at, {device id: name})
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def beat_many(self, device_ids, at=None) -> None:
+        at = at or timezone.now()
+        with self._lock:
+            for device_id in device_ids:
+                last = self._last_seen.get(device_id)
+                if last is None or at > last:
+                    self._last_seen[device_id] = at
+                    self._pending[device_id] = at
+            if self._pending and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def beat(self, device_id, at=None) -> None:
+        self.beat_many([device_id], at)
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # The entries were put back; try again next interval
+            self.beat_many([])
+        finally:
+            connections.close_all()  # this timer thread's connections
+
+    def flush(self) -> int:
+        """Write pending last-seen times (never moving one backwards); returns devices written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with transaction.atomic():
+                revived = list(
+                    IntercomDevice.objects.filter(pk__in=list(pending), is_online=False)
+                    .values_list('id', 'building_id', 'device_name')
+                )
+                IntercomDevice.objects.bulk_update([
+                    IntercomDevice(
+                        pk=device_id, is_online=True,
+                        last_seen_at=Greatest(Coalesce(F('last_seen_at'), Value(at)), Value(at)),
+                    ) for device_id, at in pending.items()
+                ], ['last_seen_at', 'is_online'], batch_size=MAX_BATCH)
+        except Exception:
+            with self._lock:
+                for device_id, at in pending.items():
+                    if at >= self._pending.get(device_id, at):
+                        self._pending[device_id] = at
+            raise
+        _publish_status(revived, 'online', pending)
+        return len(pending)
+
+    def _devices(self, building_id) -> dict:
+        with self._lock:
+            cached = self._buildings.get(building_id)
+        if cached is not None and time.monotonic() - cached[0] < self.flush_interval:
+            return cached[1]
+        rows = IntercomDevice.objects.filter(building_id=building_id).values_list('id', 'device_name', 'last_seen_at')
+        devices = {}
+        with self._lock:
+            for device_id, name, last_seen in rows:
+                devices[device_id] = name
+                known = self._last_seen.get(device_id)
+                if last_seen and (known is None or last_seen > known):
+                    self._last_seen[device_id] = last_seen
+            self._buildings[building_id] = (time.monotonic(), devices)
+        return devices
+
+    def health(self, building_id) -> dict:
+        """Online/offline per device of a building, from the in-memory map."""
+        devices = self._devices(building_id)
+        stamp = timezone.now()
+        rows = []
+        for device_id, name in sorted(devices.items()):
+            last_seen = self._last_seen.get(device_id)
+            age = (stamp - last_seen).total_seconds() if last_seen else None
+            rows.append({
+                'device_id': device_id, 'device_name': name, 'last_seen_at': last_seen,
+                'seconds_since_seen': round(age, 1) if age is not None else None,
+                'online': age is not None and age <= self.offline_after,
+            })
+        online = sum(1 for row in rows if row['online'])
+        return {'building_id': building_id, 'online': online, 'offline': len(rows) - online, 'devices': rows}
+
+    def invalidate(self, device_id=None, deleted: bool = False) -> None:
+        """Reload device lists on the next health check; a deleted device is dropped entirely."""
+        with self._lock:
+            self._buildings.clear()
+            if deleted:
+                self._last_seen.pop(device_id, None)
+                self._pending.pop(device_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._last_seen.clear()
+            self._pending.clear()
+            self._buildings.clear()
+
+
+heartbeats = HeartbeatTracker(
+    flush_interval=getattr(settings, 'INTERCOM_HEARTBEAT_FLUSH_SECONDS', 30),
+    offline_after=getattr(settings, 'INTERCOM_OFFLINE_AFTER_SECONDS', 180),
+)
+
+
+@atexit.register
+def _flush_heartbeats_on_exit():
+    try:
+        heartbeats.flush()
+    except Exception:
+        pass
+
+
+def _publish_status(devices, action: str, seen=None) -> None:
+    events.publish_many([{
+        'building_id': building_id, 'kind': 'device_status', 'action': action, 'object_id': device_id,
+        'payload': {
+            'device_id': device_id, 'device_name': name, 'online': action == 'online',
+            'last_seen_at': seen[device_id].isoformat() if seen and seen.get(device_id) else None,
+        },
+    } for device_id, building_id, name, *_ in devices])
+
+
+def sweep_offline_devices(offline_after=None) -> dict:
+    """
+    Mark devices not heard from within the timeout offline and announce each on its building's
+    event stream (``device_status`` / ``offline``). Flushes this process's heartbeats first.
+    """
+    heartbeats.flush()
+    timeout = offline_after if offline_after is not None else heartbeats.offline_after
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Q(last_seen_at__lt=cutoff) | Q(last_seen_at__isnull=True)
+    with transaction.atomic():
+        # Locked so a concurrent heartbeat flush cannot revive a row between the read and the write
+        went_offline = list(
+            IntercomDevice.objects.select_for_update().filter(stale, is_online=True)
+            .values_list('id', 'building_id', 'device_name', 'last_seen_at')
+        )
+        if went_offline:
+            IntercomDevice.objects.filter(pk__in=[row[0] for row in went_offline]).update(is_online=False)
+    _publish_status(went_offline, 'offline', {row[0]: row[3] for row in went_offline})
+    return {'offline': len(went_offline)}
+
+
+@receiver(post_save, sender=IntercomDevice)
+@receiver(post_delete, sender=IntercomDevice)
+def _invalidate_device(sender, instance, **kwargs):
+    device_cache.invalidate(instance.pk)
+    heartbeats.invalidate(instance.pk, deleted=kwargs.get('signal') is post_delete)
@@ -0,0 +1,121 @@
+# fluxora/services/lifts.py
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from fluxora.models import LiftCurrentStatus, LiftStatus, LiftStatusLog
+
+UP_STATUSES = (LiftStatus.OPERATIONAL,)
+
+
+def record_status(building_id, asset_id, status: str, reported_at, log_id=None) -> None:
+    """
+    Fold one status report into the lift's current-status row.
+
+    Conditional UPDATEs only: a report older than the one already applied is ignored, and
+    ``since`` moves only when the status actually changes.
+    """
+    current = LiftCurrentStatus.objects.filter(
+        building_id=building_id, asset_id=asset_id, last_reported_at__lte=reported_at,
+    )
+    if current.exclude(status=status).update(
+        status=status, since=reported_at, last_reported_at=reported_at, last_log_id=log_id,
+    ):
+        return
+    if current.filter(status=status).update(last_reported_at=reported_at, last_log_id=log_id):
+        return
+    if LiftCurrentStatus.objects.filter(building_id=building_id, asset_id=asset_id).exists():
+        return  # a newer report is already applied
+    try:
+        with transaction.atomic():
+            LiftCurrentStatus.objects.create(
+                building_id=building_id, asset_id=asset_id, status=status,
+                since=reported_at, last_reported_at=reported_at, last_log_id=log_id,
+            )
+    except IntegrityError:
+        # A concurrent first report created the row; apply ours on top of it
+        record_status(building_id, asset_id, status, reported_at, log_id)
+
+
+def current_statuses(building_id) -> list:
+    """Every lift of a building with its current status: one indexed query, O(lifts)."""
+    rows = (
+        LiftCurrentStatus.objects.filter(building_id=building_id)
+        .order_by('asset_id')
+        .values_list('asset_id', 'asset__name', 'status', 'since', 'last_reported_at')
+    )
+    return [{
+        'asset_id': asset_id, 'asset_name': name, 'status': status, 'up': status in UP_STATUSES,
+        'since': since, 'last_reported_at': reported_at,
+    } for asset_id, name, status, since, reported_at in rows]
+
+
+def lift_uptime(building_id, start, end, asset_id=None) -> list:
+    """
+    Seconds spent in each status per lift between ``start`` and ``end``, in one pass over the log.
+
+    The status at ``start`` comes from the last report before it (a correlated subquery on the
+    lift list, so one query for all lifts); time before a lift's first known report is
+    ``unknown`` and left out of ``uptime_pct``. Only rows still in the live table are read:
+    months moved to the archive count as ``unknown``.
+    """
+    end = min(end, now())
+    lifts = LiftCurrentStatus.objects.filter(building_id=building_id)
+    logs = LiftStatusLog.objects.filter(building_id=building_id, timestamp__gte=start, timestamp__lt=end)
+    if asset_id is not None:
+        lifts = lifts.filter(asset_id=asset_id)
+        logs = logs.filter(asset_id=asset_id)
+    before_start = LiftStatusLog.objects.filter(
+        building_id=building_id, asset_id=OuterRef('asset_id'), timestamp__lt=start,
+    ).order_by('-timestamp', '-id').values('status')[:1]
+    # asset_id = NULL never matches in the subquery; the unnamed lift needs its own lookup
+    unnamed_before = LiftStatusLog.objects.filter(
+        building_id=building_id, asset_id__isnull=True, timestamp__lt=start,
+    ).order_by('-timestamp', '-id').values('status')[:1]
+
+    state, names = {}, {}
+    for lift_asset, name, initial in lifts.annotate(initial=Subquery(before_start)).values_list(
+        'asset_id', 'asset__name', 'initial',
+    ):
+        if lift_asset is None:
+            initial = unnamed_before.values_list('status', flat=True).first()
+        state[lift_asset] = [initial, start]
+        names[lift_asset] = name
+    seconds = defaultdict(lambda: defaultdict(float))
+    transitions = defaultdict(int)
+
+    for lift_asset, status, stamp in logs.order_by('timestamp', 'id').values_list(
+        'asset_id', 'status', 'timestamp',
+    ).iterator(chunk_size=5000):
+        current = state.setdefault(lift_asset, [None, start])
+        seconds[lift_asset][current[0] or 'unknown'] += (stamp - current[1]).total_seconds()
+        if current[0] is not None and current[0] != status:
+            transitions[lift_asset] += 1
+        current[0], current[1] = status, stamp
+
+    results = []
+    for lift_asset, (status, since) in sorted(state.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+        spent = seconds[lift_asset]
+        spent[status or 'unknown'] += max((end - since).total_seconds(), 0)
+        known = sum(v for k, v in spent.items() if k != 'unknown')
+        up = sum(spent.get(s, 0.0) for s in UP_STATUSES)
+        results.append({
+            'asset_id': lift_asset,
+            'asset_name': names.get(lift_asset),
+            'seconds': {s: round(spent.get(s, 0.0), 3) for s in [*LiftStatus.values, 'unknown']},
+            'uptime_seconds': round(up, 3),
+            'downtime_seconds': round(known - up, 3),
+            'uptime_pct': round(up / known * 100, 3) if known else None,
+            'transitions': transitions[lift_asset],
+        })
+    return results
+
+
+@receiver(post_save, sender=LiftStatusLog)
+def _lift_status_logged(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        record_status(instance.building_id, instance.asset_id, instance.status, instance.timestamp, instance.pk)
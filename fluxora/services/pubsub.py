@@ -0,0 +1,109 @@
+# fluxora/services/pubsub.py
+import asyncio
+import threading
+from collections import Counter, deque
+
+
+class Subscription:
+    """
+    One async listener on a set of topics, bound to the event loop that created it.
+
+    Holds at most ``maxsize`` undelivered items; on overflow the oldest are dropped and
+    counted in ``dropped`` so the reader can tell it missed something.
+    """
+
+    def __init__(self, hub, topics, maxsize: int = 1000):
+        self.hub = hub
+        self.topics = tuple(topics)
+        self.maxsize = maxsize
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+        self._items = deque()
+        self._ready = asyncio.Event()
+
+    def _deliver(self, items) -> None:
+        # Always runs on ``self.loop``
+        for item in items:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+        self._ready.set()
+
+    async def get(self, timeout: float = None, linger: float = 0.0) -> list:
+        """
+        Wait up to ``timeout`` seconds for items and return everything queued (``[]`` on timeout).
+
+        ``linger`` keeps collecting for that long after the first item arrives, so bursts
+        come back as one batch.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        if linger:
+            await asyncio.sleep(linger)
+        self._ready.clear()
+        items = list(self._items)
+        self._items.clear()
+        return items
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    """
+    In-process topic pub/sub for async readers, fed from any thread.
+
+    ``publish`` is safe to call from sync code (signal handlers, views, worker threads): items
+    are handed to each subscriber's own event loop with ``call_soon_threadsafe``. Delivery is
+    process-local; it backs the SSE endpoints for single-process deployments without Channels.
+    """
+
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def subscribe(self, topics, maxsize: int = 1000) -> Subscription:
+        subscription = Subscription(self, topics, maxsize)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        self.stats['subscribed'] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def publish_many(self, topic: str, items: list) -> int:
+        """Deliver ``items`` to every subscriber of ``topic``; returns the number of subscribers."""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, list(items))
+            except RuntimeError:
+                # Its event loop is gone (client disconnected mid-shutdown)
+                self.unsubscribe(subscription)
+        self.stats['published'] += len(items)
+        return len(subscribers)
+
+    def publish(self, topic: str, item) -> int:
+        return self.publish_many(topic, [item])
+
+    def subscriber_count(self, topic=None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._topics.get(topic, ()))
+            return len({s for subscribers in self._topics.values() for s in subscribers})
+
+
+hub = Hub()
@@ -0,0 +1,48 @@
+# fluxora/services/ratelimit.py
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at ``rate`` tokens per second up to ``capacity``.
+
+    A rate of ``None``/``0`` means unlimited.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity or max(self.rate, 1.0))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        current = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (current - self._updated) * self.rate)
+        self._updated = current
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take ``tokens`` if available right now; never blocks."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` would be available (0 when they already are)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block the calling thread until ``tokens`` are available, then take them."""
+        while not self.try_acquire(tokens):
+            time.sleep(self.wait_time(tokens))
@@ -0,0 +1,120 @@
+# fluxora/services/recurrence.py
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from fluxora.models import OccurrenceAction, RecurrenceFrequency, RecurringBooking, RecurringBookingException
+
+# Occurrences may not overlap their own rule, so none is longer than a day
+MAX_OCCURRENCE = timedelta(days=1)
+
+Occurrence = namedtuple('Occurrence', 'recurrence_id resource_id resident_id start end original_start moved')
+
+
+def weekdays_of(rule) -> list:
+    """ISO weekdays (Mon=1) a weekly rule repeats on; defaults to its first occurrence's."""
+    days = sorted({int(day) for day in rule.weekdays.split(',') if day.strip()}) if rule.weekdays else []
+    return days or [timezone.localtime(rule.start_time).isoweekday()]
+
+
+def expand(rule, start, end):
+    """
+    Yield the original ``(start, end)`` of every occurrence of ``rule`` that intersects
+    ``[start, end)``, in order.
+
+    Jumps straight to the first period that can reach the window, so the cost depends on the
+    window, not on how long ago the rule began. Occurrences keep the first one's local
+    wall-clock time.
+    """
+    first = timezone.localtime(rule.start_time)
+    length = rule.end_time - rule.start_time
+    stop = min(end, rule.until) if rule.until else end
+    from_day = max(first.date(), timezone.localtime(start - length).date())
+
+    def at(day):
+        return timezone.make_aware(datetime.combine(day, first.time()))
+
+    if rule.frequency == RecurrenceFrequency.DAILY:
+        step = timedelta(days=rule.interval)
+        day = first.date() + (from_day - first.date()).days // rule.interval * step
+        while (occurrence := at(day)) < stop:
+            if occurrence >= rule.start_time and occurrence + length > start:
+                yield occurrence, occurrence + length
+            day += step
+        return
+
+    week = first.date() - timedelta(days=first.weekday())
+    weeks = (from_day - week).days // 7
+    week += timedelta(weeks=weeks - weeks % rule.interval)
+    days = weekdays_of(rule)
+    while True:
+        for weekday in days:
+            occurrence = at(week + timedelta(days=weekday - 1))
+            if occurrence >= stop:
+                return
+            if occurrence >= rule.start_time and occurrence + length > start:
+                yield occurrence, occurrence + length
+        week += timedelta(weeks=rule.interval)
+
+
+def occurrences(rule, exceptions, start, end) -> list:
+    """Occurrences of one rule in ``[start, end)`` with its exceptions (keyed by original start) applied."""
+    found = []
+    for lo, hi in expand(rule, start, end):
+        if lo not in exceptions:
+            found.append(Occurrence(rule.pk, rule.resource_id, rule.resident_id, lo, hi, lo, False))
+    for original, (action, lo, hi) in exceptions.items():
+        if action == OccurrenceAction.MOVED and lo < end and hi > start:
+            found.append(Occurrence(rule.pk, rule.resource_id, rule.resident_id, lo, hi, original, True))
+    found.sort(key=lambda occ: occ.start)
+    return found
+
+
+def _touching(start, end) -> Q:
+    # Exceptions of occurrences that would intersect the window, or were moved into it
+    return (
+        Q(occurrence_start__gte=start - MAX_OCCURRENCE, occurrence_start__lt=end)
+        | Q(action=OccurrenceAction.MOVED, start_time__lt=end, end_time__gt=start)
+    )
+
+
+def rule_occurrences(rule, start, end) -> list:
+    """Occurrences of one rule in ``[start, end)`` (one exceptions query)."""
+    rows = rule.exceptions.filter(_touching(start, end)).values_list(
+        'occurrence_start', 'action', 'start_time', 'end_time',
+    )
+    return occurrences(rule, {original: (action, lo, hi) for original, action, lo, hi in rows}, start, end)
+
+
+def resource_occurrences(resource_ids, start, end, exclude_rule_id=None, lock=False) -> dict:
+    """
+    Active recurring occurrences per resource id in ``[start, end)``: one query for the rules,
+    one for their exceptions in the window (none when no rule applies). ``lock`` makes both
+    locking reads, for use under the resource lock.
+    """
+    rules = RecurringBooking.objects.filter(
+        resource_id__in=resource_ids, status__in=('pending', 'confirmed'), start_time__lt=end,
+    ).filter(Q(until__isnull=True) | Q(until__gt=start - MAX_OCCURRENCE))
+    if exclude_rule_id is not None:
+        rules = rules.exclude(pk=exclude_rule_id)
+    rules = list(rules.select_for_update() if lock else rules)
+    found = defaultdict(list)
+    if not rules:
+        return found
+    exceptions = defaultdict(dict)
+    rows = RecurringBookingException.objects.filter(recurrence__in=rules).filter(_touching(start, end))
+    rows = (rows.select_for_update() if lock else rows).values_list(
+        'recurrence_id', 'occurrence_start', 'action', 'start_time', 'end_time',
+    )
+    for rule_id, original, action, lo, hi in rows:
+        exceptions[rule_id][original] = (action, lo, hi)
+    for rule in rules:
+        found[rule.resource_id].extend(occurrences(rule, exceptions[rule.pk], start, end))
+    return found
+
+
+def is_occurrence(rule, original_start) -> bool:
+    """True when ``original_start`` is the start of one of the rule's (unmodified) occurrences."""
+    return any(lo == original_start for lo, _ in expand(rule, original_start, original_start + timedelta(microseconds=1)))
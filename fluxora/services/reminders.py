@@ -0,0 +1,104 @@
+# fluxora/services/reminders.py
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from fluxora.models import DeliveryStatus, Invoice, InvoiceReminder
+
+REMINDER_CHUNK_SIZE = 500
+
+
+def due_invoice_rows(days_before_due: int = 1, chunk_size: int = REMINDER_CHUNK_SIZE):
+    """
+    Stream ``(invoice_id, number, amount, due_date, email)`` for pending invoices due within N days
+    or overdue that have not had a successful reminder today.
+
+    A server-side cursor (``iterator``) over a values_list keeps memory flat regardless of
+    how many invoices are due; the recipient email comes from the same JOIN.
+    """
+    today = date.today()
+    start_of_day = datetime.combine(today, dt_time.min)
+    if settings.USE_TZ:
+        start_of_day = timezone.make_aware(start_of_day)
+    reminded_today = InvoiceReminder.objects.filter(
+        status=DeliveryStatus.SENT, sent_at__gte=start_of_day,
+    ).values('invoice_id')
+    return (
+        Invoice.objects
+        .filter(status='pending', due_date__lte=today + timedelta(days=days_before_due))
+        .exclude(id__in=reminded_today)
+        .order_by('id')
+        .values_list('id', 'invoice_number', 'amount', 'due_date', 'resident__user__email')
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def build_reminder(number, amount, due_date, recipient, from_email=None) -> EmailMessage:
+    subject = f"Reminder: Invoice {number} due {due_date}"
+    body = f"Dear resident, your invoice {number} of amount {amount} is due on {due_date}."
+    sender = from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
+    return EmailMessage(subject, body, sender, [recipient])
+
+
+def _deliver(connection, batch: list) -> list:
+    """
+    Send one chunk over the shared connection and return InvoiceReminder rows for it.
+
+    Messages go through ``send_messages`` one at a time on the already-open connection:
+    the backend only reports a count per call, and this way a bad address is pinned to its
+    own invoice instead of failing (or double-sending) the whole chunk.
+    """
+    results = []
+    for invoice_id, recipient, message in batch:
+        try:
+            ok = connection.send_messages([message]) == 1
+            error = None if ok else 'Backend did not accept the message'
+        except Exception as exc:
+            ok, error = False, f'{type(exc).__name__}: {exc}'[:1000]
+            # The session may be unusable after an SMTP error; start a fresh one for the rest
+            try:
+                connection.close()
+                connection.open()
+            except Exception:
+                pass
+        results.append(InvoiceReminder(
+            invoice_id=invoice_id, recipient=recipient, error=error,
+            status=DeliveryStatus.SENT if ok else DeliveryStatus.FAILED,
+        ))
+    return results
+
+
+def send_invoice_reminders(days_before_due: int = 1, chunk_size: int = REMINDER_CHUNK_SIZE,
+                           connection=None) -> dict:
+    """
+    Email reminders for due invoices through one reused mail connection, recording each outcome.
+
+    Rows are streamed and handled ``chunk_size`` at a time: build the messages, send them,
+    then ``bulk_create`` the delivery results, so a run touches the DB once per chunk.
+    """
+    stats = {'reminders_sent': 0, 'failed': 0, 'skipped': 0}
+    connection = connection or get_connection(fail_silently=False)
+    connection.open()
+    try:
+        batch = []
+        for invoice_id, number, amount, due_date, recipient in due_invoice_rows(days_before_due, chunk_size):
+            if not recipient:
+                stats['skipped'] += 1
+                continue
+            batch.append((invoice_id, recipient, build_reminder(number, amount, due_date, recipient)))
+            if len(batch) >= chunk_size:
+                _record(_deliver(connection, batch), stats)
+                batch = []
+        if batch:
+            _record(_deliver(connection, batch), stats)
+    finally:
+        connection.close()
+    return stats
+
+
+def _record(results: list, stats: dict) -> None:
+    InvoiceReminder.objects.bulk_create(results, batch_size=REMINDER_CHUNK_SIZE)
+    for row in results:
+        stats['reminders_sent' if row.status == DeliveryStatus.SENT else 'failed'] += 1
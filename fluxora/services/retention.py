@@ -0,0 +1,261 @@
+# fluxora/services/retention.py
+import gzip
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from fluxora.models import ArchivePartition, DocumentAuditLog, GateEvent, IntercomLog, LiftStatusLog
+
+# Archived model -> (timestamp field, lookup path to its building)
+ARCHIVE_SOURCES = {
+    IntercomLog: ('timestamp', 'device__building_id'),
+    GateEvent: ('timestamp', 'building_id'),
+    LiftStatusLog: ('timestamp', 'building_id'),
+    DocumentAuditLog: ('event_time', 'document__building_id'),
+}
+DELETE_BATCH = 2000
+EXPORT_CHUNK = 2000
+
+
+def source_name(model) -> str:
+    return model._meta.db_table
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def retention_cutoff(days=None) -> datetime:
+    """
+    Start of the month that is ``days`` ago (local time): everything before it may be archived.
+
+    Whole months are archived at once, so each (building, month) file is normally written once;
+    rows are kept live for at least ``days``.
+    """
+    days = days if days is not None else getattr(settings, 'LOG_RETENTION_DAYS', 180)
+    edge = timezone.localtime() - timedelta(days=days)
+    return edge.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+# ---------- Writing ----------
+
+def _encode(row: dict) -> str:
+    # isoformat keeps microseconds (DjangoJSONEncoder rounds to milliseconds), so keyset
+    # cursors over archived rows stay exact
+    return json.dumps(
+        {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()},
+        cls=DjangoJSONEncoder, separators=(',', ':'),
+    )
+
+
+def _read_lines(path: str):
+    with default_storage.open(path, 'rb') as fh, gzip.GzipFile(fileobj=fh) as gz:
+        for line in gz:
+            if line.strip():
+                yield line.decode('utf-8')
+
+
+def _write_partition(path: str, records: list) -> str:
+    """Write ``(ts, id, line)`` records, sorted, as gzip NDJSON; returns the stored name."""
+    records.sort(key=lambda r: (r[0], r[1]))
+    with SpooledTemporaryFile(max_size=8 * 1024 * 1024) as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode='wb') as gz:
+            for _, _, line in records:
+                gz.write(line.encode('utf-8') + b'\n')
+        tmp.seek(0)
+        return default_storage.save(path, File(tmp))
+
+
+def _delete_rows(model, ids: list, batch_size: int, pause: float) -> int:
+    """Delete by primary key in short autocommit statements so no lock is held for long."""
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        deleted += model._base_manager.filter(pk__in=ids[start:start + batch_size]).delete()[0]
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def archive_partition(model, building_id, month: date, cutoff: datetime, batch_size=DELETE_BATCH, pause=0.0) -> dict:
+    """
+    Move one building-month of ``model`` rows older than ``cutoff`` into its archive file.
+
+    The file is written and catalogued before any row is deleted, and rows already in an
+    existing file (from an earlier, interrupted run) are not written twice, so a crash at any
+    point can simply be re-run.
+    """
+    ts_field, building_path = ARCHIVE_SOURCES[model]
+    source = source_name(model)
+    start = timezone.make_aware(datetime(month.year, month.month, 1))
+    end = timezone.make_aware(datetime(month.year + month.month // 12, month.month % 12 + 1, 1))
+    attnames = [f.attname for f in model._meta.concrete_fields]
+    rows = (
+        model._base_manager
+        .filter(**{building_path: building_id})
+        .filter(**{f'{ts_field}__gte': start, f'{ts_field}__lt': min(end, cutoff)})
+        .order_by(ts_field, 'pk')
+        .values_list(*attnames)
+    )
+
+    partition = ArchivePartition.objects.filter(source=source, building_id=building_id, month=month).first()
+    records, archived_ids = [], set()
+    if partition is not None:
+        for line in _read_lines(partition.path):
+            row = json.loads(line)
+            records.append((parse_datetime(row[ts_field]), row['id'], line))
+            archived_ids.add(row['id'])
+
+    ids = []
+    for values in rows.iterator(chunk_size=EXPORT_CHUNK):
+        row = dict(zip(attnames, values))
+        ids.append(row['id'])
+        if row['id'] not in archived_ids:
+            records.append((row[ts_field], row['id'], _encode(row)))
+    if not ids:
+        return {'archived': 0, 'deleted': 0}
+
+    path = f"{getattr(settings, 'LOG_ARCHIVE_PREFIX', 'archive')}/{source}/{building_id}/{month:%Y-%m}.ndjson.gz"
+    stored = _write_partition(path, records)
+    old_path = partition.path if partition is not None else None
+    with transaction.atomic():
+        ArchivePartition.objects.update_or_create(
+            source=source, building_id=building_id, month=month,
+            defaults={
+                'path': stored, 'row_count': len(records),
+                'min_ts': records[0][0], 'max_ts': records[-1][0],
+            },
+        )
+    if old_path and old_path != stored:
+        default_storage.delete(old_path)
+    archive_reader.evict(old_path)
+    deleted = _delete_rows(model, ids, batch_size, pause)
+    return {'archived': len(ids), 'deleted': deleted}
+
+
+def archive_logs(days=None, models=None, batch_size=None, pause=0.0) -> dict:
+    """Archive every (building, month) older than the retention window; counts per source."""
+    cutoff = retention_cutoff(days)
+    batch_size = batch_size or getattr(settings, 'LOG_ARCHIVE_DELETE_BATCH', DELETE_BATCH)
+    totals = {}
+    for model in models or ARCHIVE_SOURCES:
+        ts_field, building_path = ARCHIVE_SOURCES[model]
+        groups = (
+            model._base_manager.filter(**{f'{ts_field}__lt': cutoff})
+            .annotate(archive_building=F(building_path), archive_month=TruncMonth(ts_field))
+            .values_list('archive_building', 'archive_month').distinct()
+        )
+        counts = defaultdict(int)
+        for building_id, month in list(groups):
+            result = archive_partition(model, building_id, month_start(month), cutoff, batch_size, pause)
+            counts['partitions'] += 1
+            counts['archived'] += result['archived']
+            counts['deleted'] += result['deleted']
+        totals[source_name(model)] = dict(counts)
+    return totals
+
+
+# ---------- Reading ----------
+
+class ArchiveReader:
+    """
+    Decoded archive files, kept in a small LRU per process.
+
+    A partition is held as parallel sorted lists of ``(timestamp, id)`` keys and row dicts,
+    so a keyset page is a bisect plus a slice.
+    """
+
+    def __init__(self, max_partitions: int = 8):
+        self.max_partitions = max_partitions
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, model, path: str):
+        with self._lock:
+            if path in self._cache:
+                self._cache.move_to_end(path)
+                return self._cache[path]
+        ts_field = ARCHIVE_SOURCES[model][0]
+        keys, rows = [], []
+        for line in _read_lines(path):
+            row = json.loads(line)
+            keys.append((parse_datetime(row[ts_field]), row['id']))
+            rows.append(row)
+        with self._lock:
+            self._cache[path] = (keys, rows)
+            while len(self._cache) > self.max_partitions:
+                self._cache.popitem(last=False)
+        return keys, rows
+
+    def evict(self, path) -> None:
+        with self._lock:
+            self._cache.pop(path, None)
+
+
+archive_reader = ArchiveReader(getattr(settings, 'LOG_ARCHIVE_READER_CACHE', 8))
+
+
+def _instance(model, row: dict):
+    fields = {f.attname: f.to_python(row.get(f.attname)) for f in model._meta.concrete_fields}
+    instance = model(**fields)
+    instance._state.adding = False
+    return instance
+
+
+def merge_archived(model, field: str, live_rows: list, cursor, limit: int) -> list:
+    """
+    Merge archived rows of ``model`` into one keyset page of live rows.
+
+    ``cursor`` is ``None`` or ``(reverse, ts, pk)`` as decoded by ``KeysetPagination``;
+    ``live_rows`` are already in page order (newest first, or oldest first when reverse).
+    Only partitions that can still contribute to the first ``limit`` rows are read, so pages
+    served from live data never touch the archive.
+    """
+    if model not in ARCHIVE_SOURCES:
+        return live_rows
+    partitions = ArchivePartition.objects.filter(source=source_name(model))
+    reverse, c_ts, c_pk = cursor if cursor is not None else (False, None, None)
+    if reverse:
+        partitions = partitions.filter(max_ts__gte=c_ts).order_by('min_ts')
+    elif cursor is not None:
+        partitions = partitions.filter(min_ts__lte=c_ts).order_by('-max_ts')
+    else:
+        partitions = partitions.order_by('-max_ts')
+
+    def key(obj):
+        return (getattr(obj, field), obj.pk)
+
+    page = list(live_rows)
+    seen = {obj.pk for obj in page}
+    for path, min_ts, max_ts in partitions.values_list('path', 'min_ts', 'max_ts'):
+        if len(page) >= limit:
+            edge = getattr(page[limit - 1], field)
+            if (min_ts > edge) if reverse else (max_ts < edge):
+                break
+        keys, rows = archive_reader.load(model, path)
+        if reverse:
+            lo = bisect_right(keys, (c_ts, c_pk))
+            picked = range(lo, min(lo + limit, len(keys)))
+        else:
+            hi = len(keys) if cursor is None else bisect_left(keys, (c_ts, c_pk))
+            picked = range(hi - 1, max(hi - limit, 0) - 1, -1)
+        for i in picked:
+            if keys[i][1] not in seen:
+                seen.add(keys[i][1])
+                page.append(_instance(model, rows[i]))
+        page.sort(key=key, reverse=not reverse)
+        del page[limit:]
+    return page
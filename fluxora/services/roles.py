@@ -0,0 +1,122 @@
+# fluxora/services/roles.py
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fluxora.models import User
+
+ADMIN_ROLES = ('admin', 'committee')
+_MISSING = object()
+
+
+class RoleCache:
+    """
+    Small thread-safe TTL cache: (auth user id, email) -> business role (or None).
+
+    Entries are tagged with the email and business user id they were resolved from so a
+    save/delete of that business user can drop them, even if its email changed.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            role, expires, _ = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return _MISSING
+            return role
+
+    def set(self, key, role, business_user_id=None) -> None:
+        tags = (('email', key[1]), ('id', business_user_id))
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            elif len(self._data) >= self.max_entries:
+                # Evict the entry closest to expiry
+                self._drop(min(self._data, key=lambda k: self._data[k][1]))
+            self._data[key] = (role, time.monotonic() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, email: Optional[str] = None, business_user_id=None) -> None:
+        with self._lock:
+            for tag in (('email', email), ('id', business_user_id)):
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def _drop(self, key) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+role_cache = RoleCache(ttl=getattr(settings, 'ROLE_CACHE_TTL', 60))
+
+
+def business_role(request) -> Optional[str]:
+    """
+    Role of the business ``User`` matching the authenticated user's email, or None.
+
+    Memoized on the request (so stacked permission classes share one lookup) and in the
+    process-wide TTL cache, which is invalidated when the business user is saved or deleted.
+    """
+    user = getattr(request, 'user', None)
+    if not (user and user.is_authenticated and getattr(user, 'email', None)):
+        return None
+    # DRF wraps the Django request; memoize on the underlying one so all wrappers see it
+    holder = getattr(request, '_request', request)
+    memo = getattr(holder, '_fluxora_business_role', _MISSING)
+    if memo is not _MISSING:
+        return memo
+
+    key = (user.pk, user.email)
+    role = role_cache.get(key)
+    if role is _MISSING:
+        row = User.objects.filter(email=user.email).values_list('id', 'role').first()
+        business_user_id, role = row if row else (None, None)
+        role_cache.set(key, role, business_user_id)
+    holder._fluxora_business_role = role
+    return role
+
+
+def has_admin_role(request) -> bool:
+    """True for Django staff/superusers or business users with an admin/committee role."""
+    user = getattr(request, 'user', None)
+    if not (user and user.is_authenticated):
+        return False
+    if getattr(user, 'is_staff', False) or getattr(user, 'is_superuser', False):
+        return True
+    try:
+        return business_role(request) in ADMIN_ROLES
+    except Exception:
+        return False
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _invalidate_business_role(sender, instance, **kwargs):
+    role_cache.invalidate(email=instance.email, business_user_id=instance.pk)
@@ -0,0 +1,221 @@
+# fluxora/services/stats.py
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from fluxora.models import (
+    Booking, Building, BuildingStats, Invoice, Payment, Resource, Ticket, Unit,
+)
+
+
+# ---------- Full recompute ----------
+
+def _open_tickets(building_ids) -> dict:
+    return dict(
+        Ticket.objects.filter(building_id__in=building_ids, status='open')
+        .values_list('building_id').annotate(n=Count('id')).order_by()
+    )
+
+
+def _occupied_units(building_ids) -> dict:
+    return dict(
+        Unit.objects.filter(building_id__in=building_ids, status='occupied')
+        .values_list('building_id').annotate(n=Count('id')).order_by()
+    )
+
+
+def _payments_sum(building_ids) -> dict:
+    # Payment has no building column; it belongs to its invoice's building
+    return dict(
+        Payment.objects.filter(invoice__building_id__in=building_ids)
+        .values_list('invoice__building_id').annotate(s=Sum('amount')).order_by()
+    )
+
+
+def refresh_building_stats(building_ids=None) -> int:
+    """Recompute the rollup rows for the given buildings (all when None) with grouped queries."""
+    if building_ids is None:
+        building_ids = list(Building.objects.values_list('id', flat=True))
+    building_ids = [int(b) for b in building_ids]
+    if not building_ids:
+        return 0
+    invoices = dict(
+        Invoice.objects.filter(building_id__in=building_ids)
+        .values_list('building_id').annotate(n=Count('id')).order_by()
+    )
+    bookings = dict(
+        Booking.objects.filter(resource__building_id__in=building_ids)
+        .values_list('resource__building_id').annotate(n=Count('id')).order_by()
+    )
+    payments = _payments_sum(building_ids)
+    tickets = _open_tickets(building_ids)
+    units = _occupied_units(building_ids)
+    existing = set(Building.objects.filter(id__in=building_ids).values_list('id', flat=True))
+    stamp = now()
+    for bid in existing:
+        BuildingStats.objects.update_or_create(building_id=bid, defaults={
+            'invoices_count': invoices.get(bid, 0),
+            'payments_sum': payments.get(bid) or Decimal('0'),
+            'open_tickets': tickets.get(bid, 0),
+            'bookings_count': bookings.get(bid, 0),
+            'occupied_units': units.get(bid, 0),
+            'refreshed_at': stamp,
+        })
+    return len(existing)
+
+
+# ---------- Incremental updates ----------
+
+def bump(building_id, **deltas) -> None:
+    """Add deltas (e.g. ``invoices_count=1``) to a building's rollup row."""
+    if not building_id:
+        return
+    updated = BuildingStats.objects.filter(building_id=building_id).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    if not updated:
+        # No row yet: a full recompute already includes the change that triggered this
+        refresh_building_stats([building_id])
+
+
+def _set(building_id, **values) -> None:
+    if not building_id:
+        return
+    if not BuildingStats.objects.filter(building_id=building_id).update(**values):
+        refresh_building_stats([building_id])
+
+
+_MISSING = object()
+
+# Where each tracked model's building comes from, and the field whose change moves it
+_BUILDING_LOOKUP = {
+    Invoice: ('building', 'building_id'),
+    Payment: ('invoice', 'invoice__building_id'),
+    Ticket: ('building', 'building_id'),
+    Unit: ('building', 'building_id'),
+    Booking: ('resource', 'resource__building_id'),
+    Resource: ('building', 'building_id'),
+}
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Ticket)
+@receiver(pre_save, sender=Unit)
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=Resource)
+def _remember_building(sender, instance, update_fields=None, **kwargs):
+    """
+    Record the building a row belonged to before an update, so post_save can move its deltas.
+
+    One pk lookup per update; skipped for inserts and for ``update_fields`` saves that leave
+    the building (or the row it comes through) alone.
+    """
+    instance._stats_old_building = _MISSING
+    field, lookup = _BUILDING_LOOKUP[sender]
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not {field, f'{field}_id'} & set(update_fields):
+        return
+    instance._stats_old_building = sender._base_manager.filter(pk=instance.pk).values_list(lookup, flat=True).first()
+
+
+def _moved_from(instance, building_id):
+    """The building an updated row left, or None when it stayed put."""
+    old = getattr(instance, '_stats_old_building', _MISSING)
+    if old is _MISSING or old == building_id:
+        return None
+    return old
+
+
+@receiver(post_save, sender=Invoice)
+def _invoice_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.building_id, invoices_count=1)
+        return
+    old = _moved_from(instance, instance.building_id)
+    if old is not None:
+        # The invoice takes its count and its payments with it
+        paid = Payment.objects.filter(invoice_id=instance.pk).aggregate(s=Sum('amount'))['s'] or Decimal('0')
+        bump(old, invoices_count=-1, payments_sum=-paid)
+        bump(instance.building_id, invoices_count=1, payments_sum=paid)
+
+
+@receiver(post_delete, sender=Invoice)
+def _invoice_deleted(sender, instance, **kwargs):
+    bump(instance.building_id, invoices_count=-1)
+
+
+def _payment_building(payment):
+    return Invoice.objects.filter(pk=payment.invoice_id).values_list('building_id', flat=True).first()
+
+
+@receiver(post_save, sender=Payment)
+def _payment_saved(sender, instance, created, **kwargs):
+    building_id = _payment_building(instance)
+    if created:
+        bump(building_id, payments_sum=instance.amount)
+        return
+    # Amount may have changed; recompute this building's sum (and the old one's on a move)
+    buildings = {building_id, _moved_from(instance, building_id)} - {None}
+    sums = _payments_sum(buildings)
+    for bid in buildings:
+        _set(bid, payments_sum=sums.get(bid) or Decimal('0'))
+
+
+@receiver(post_delete, sender=Payment)
+def _payment_deleted(sender, instance, **kwargs):
+    bump(_payment_building(instance), payments_sum=-instance.amount)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def _ticket_changed(sender, instance, **kwargs):
+    # Status transitions are not visible in post_save; one indexed count per building is enough
+    buildings = {instance.building_id, _moved_from(instance, instance.building_id)} - {None}
+    counts = _open_tickets(buildings)
+    for bid in buildings:
+        _set(bid, open_tickets=counts.get(bid, 0))
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def _unit_changed(sender, instance, **kwargs):
+    buildings = {instance.building_id, _moved_from(instance, instance.building_id)} - {None}
+    counts = _occupied_units(buildings)
+    for bid in buildings:
+        _set(bid, occupied_units=counts.get(bid, 0))
+
+
+def _booking_building(booking):
+    return Resource.objects.filter(pk=booking.resource_id).values_list('building_id', flat=True).first()
+
+
+@receiver(post_save, sender=Booking)
+def _booking_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(_booking_building(instance), bookings_count=1)
+        return
+    building_id = _booking_building(instance)
+    old = _moved_from(instance, building_id)
+    if old is not None:
+        bump(old, bookings_count=-1)
+        bump(building_id, bookings_count=1)
+
+
+@receiver(post_delete, sender=Booking)
+def _booking_deleted(sender, instance, **kwargs):
+    bump(_booking_building(instance), bookings_count=-1)
+
+
+@receiver(post_save, sender=Resource)
+def _resource_saved(sender, instance, created, **kwargs):
+    old = None if created else _moved_from(instance, instance.building_id)
+    if old is not None:
+        moved = Booking.objects.filter(resource_id=instance.pk).count()
+        if moved:
+            bump(old, bookings_count=-moved)
+            bump(instance.building_id, bookings_count=moved)
@@ -0,0 +1,142 @@
+# fluxora/sse.py
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .services import events
+from .services.chat import chat_resident_id, chat_topic, room_history
+from .services.pubsub import hub
+
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+def sse_frame(event: str, data, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+def _event_stream(iterator) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(iterator, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+def _needs_asgi(request):
+    # A WSGI worker would have to consume the endless async iterator before responding
+    if 'wsgi.version' in request.META:
+        return JsonResponse({'detail': 'Event streams need the ASGI server'}, status=501)
+    return None
+
+
+async def building_events_sse(request, building_id):
+    """
+    Server-Sent Events version of ``ws/buildings/<id>/events/`` for deployments without Channels.
+
+    Same frames and filters: ``?kinds=`` and ``?since=`` (or the browser's ``Last-Event-ID``
+    on reconnect, which is the last ``seq`` delivered). Fed by the in-process hub, so it sees
+    events produced by this process.
+    """
+    refused = _needs_asgi(request)
+    if refused is not None:
+        return refused
+    user = await request.auser()
+    viewer = await sync_to_async(events.building_viewer)(user, building_id)
+    if viewer is None:
+        return JsonResponse({'detail': 'Not allowed'}, status=403)
+
+    kinds = [k for k in request.GET.get('kinds', '').split(',') if k in events.EVENT_KINDS] or None
+    since = request.GET.get('since') or request.headers.get('Last-Event-ID')
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        since = None
+    batch_delay = getattr(settings, 'BUILDING_EVENTS_BATCH_MS', 100) / 1000.0
+
+    # Subscribe before reading the log so nothing falls between replay and live
+    subscription = hub.subscribe([events.group_name(building_id)])
+    if since is None:
+        replay, complete = [], True
+        last_seq = await sync_to_async(events.latest_seq)(building_id)
+    else:
+        replay, complete = await sync_to_async(events.events_since)(building_id, since, kinds)
+        last_seq = max([since] + [frame['seq'] for frame in replay])
+        replay = events.visible_frames(replay, viewer)
+        if not complete:
+            last_seq = max(last_seq, await sync_to_async(events.latest_seq)(building_id))
+
+    async def stream():
+        nonlocal last_seq
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            if not complete:
+                yield sse_frame('reset', {'reason': 'too_far_behind', 'last_seq': last_seq}, last_seq)
+            elif replay:
+                yield sse_frame('events', {'replay': True, 'events': replay, 'last_seq': last_seq}, last_seq)
+            while True:
+                frames = await subscription.get(timeout=HEARTBEAT_SECONDS, linger=batch_delay)
+                if not frames:
+                    yield ': ping\n\n'
+                    continue
+                fresh = [
+                    f for f in frames
+                    if (f['seq'] is None or f['seq'] > last_seq) and (kinds is None or f['kind'] in kinds)
+                ]
+                if not fresh:
+                    continue
+                last_seq = max([last_seq] + [f['seq'] for f in fresh if f['seq'] is not None])
+                fresh = events.visible_frames(fresh, viewer)
+                if not fresh:
+                    continue
+                yield sse_frame('events', {'events': fresh, 'last_seq': last_seq}, last_seq)
+        finally:
+            subscription.close()
+
+    return _event_stream(stream())
+
+
+async def chat_sse(request, room_id):
+    """
+    Server-Sent Events stream of a chat room: a ``backlog`` event, then each stored message.
+
+    Messages are posted over REST (``/api/chat/messages/``) when websockets are unavailable.
+    """
+    refused = _needs_asgi(request)
+    if refused is not None:
+        return refused
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    # Same membership rule as the websocket: residents of the room's building only
+    if await sync_to_async(chat_resident_id)(user, room_id) is None:
+        return JsonResponse({'detail': 'Not a resident of this room\'s building'}, status=403)
+
+    subscription = hub.subscribe([chat_topic(room_id)])
+    backlog = await room_history.backlog(room_id)
+    last_id = max([m['id'] for m in backlog if m['id'] is not None], default=0)
+
+    async def stream():
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            yield sse_frame('backlog', {'messages': backlog})
+            while True:
+                messages = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                if not messages:
+                    yield ': ping\n\n'
+                    continue
+                for message in messages:
+                    if message['id'] is not None and message['id'] <= last_id:
+                        continue  # already in the backlog
+                    yield sse_frame('message', message, message['id'])
+        finally:
+            subscription.close()
+
+    return _event_stream(stream())
@@ -1,6 +1,4 @@
 # fluxora/tasks.py
-from datetime import date, timedelta
-from django.db.models import Q
 
 # Celery shared_task decorator (fallback if Celery not installed)
 try:
@@ -11,8 +9,38 @@ except Exception:
             return func
         return _decorator
 
-from .models import Invoice
-from fluxora.services.notifications import notify_email
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import BillingJob
+from fluxora.services import reminders
+from fluxora.services.billing import claim_billing_job, process_billing_job, unclaimed_billing_jobs
+from fluxora.services.dispatcher import dispatch_pending
+from fluxora.services.events import prune_events
+from fluxora.services.gates import rebuild_rollups
+from fluxora.services.intercom import sweep_offline_devices
+from fluxora.services.retention import archive_logs
+from fluxora.services.stats import refresh_building_stats
+
+
+def enqueue(task, *args, **kwargs) -> bool:
+    """
+    Hand a task to Celery; False when the broker is unreachable.
+
+    Nothing runs in the request when the broker is down: callers leave their work queued in the
+    database for the periodic sweepers. Only without Celery installed (local dev) does the task
+    run in-process.
+    """
+    delay = getattr(task, 'delay', None)
+    if delay is None:
+        task(*args, **kwargs)
+        return True
+    try:
+        delay(*args, **kwargs)
+    except Exception:
+        return False
+    return True
 
 
 @shared_task(name='fluxora.tasks.send_invoice_reminders')
@@ -20,20 +48,85 @@ def send_invoice_reminders(days_before_due: int = 1):
     """
     Send reminders for pending invoices that are due within N days or overdue.
     """
-    today = date.today()
-    soon = today + timedelta(days=days_before_due)
-    qs = Invoice.objects.filter(status='pending').filter(Q(due_date__lte=soon))
-    count = 0
-    for inv in qs.select_related('resident__user'):
-        recipient = getattr(getattr(inv.resident, 'user', None), 'email', None)
-        if not recipient:
-            continue
-        subj = f"Reminder: Invoice {inv.invoice_number} due {inv.due_date}"
-        body = f"Dear resident, your invoice {inv.invoice_number} of amount {inv.amount} is due on {inv.due_date}."
-        try:
-            notify_email(recipient, subj, body)
-            count += 1
-        except Exception:
-            # Swallow errors in batch; logging is handled by email backend/handlers
-            continue
-    return {'reminders_sent': count}
+    return reminders.send_invoice_reminders(days_before_due)
+
+
+@shared_task(name='fluxora.tasks.run_billing_job')
+def run_billing_job(job_id: int):
+    """
+    Run or resume a BillingJob (monthly invoices / utility bills) in committed chunks.
+
+    The job is claimed first, so duplicate deliveries and sweeper re-dispatches are no-ops.
+    """
+    if not claim_billing_job(job_id):
+        job = BillingJob.objects.filter(pk=job_id).only('status').first()
+        return {'job_id': job_id, 'status': job.status if job else 'missing'}
+    job = BillingJob.objects.get(pk=job_id)
+    job = process_billing_job(job)
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'processed': job.processed,
+        'total': job.total,
+        'created': job.created_count,
+        'skipped': job.skipped_count,
+    }
+
+
+@shared_task(name='fluxora.tasks.sweep_billing_jobs')
+def sweep_billing_jobs():
+    """
+    Re-dispatch billing jobs left queued (broker was down at submit time) or abandoned by a dead worker.
+    """
+    job_ids = unclaimed_billing_jobs()
+    for job_id in job_ids:
+        enqueue(run_billing_job, job_id)
+    return {'dispatched': len(job_ids)}
+
+
+@shared_task(name='fluxora.tasks.refresh_dashboard_stats')
+def refresh_dashboard_stats(building_ids=None):
+    """
+    Recompute the per-building dashboard rollups (reconciles any drift from bulk writes).
+    """
+    return {'buildings_refreshed': refresh_building_stats(building_ids)}
+
+
+@shared_task(name='fluxora.tasks.dispatch_notifications')
+def dispatch_notifications():
+    """
+    Deliver due notification outbox rows (email/SMS/push) through the channel worker pools.
+    """
+    return dispatch_pending()
+
+
+@shared_task(name='fluxora.tasks.prune_building_events')
+def prune_building_events():
+    """
+    Drop building stream events older than the resume window.
+    """
+    return {'deleted': prune_events()}
+
+
+@shared_task(name='fluxora.tasks.archive_device_logs')
+def archive_device_logs(days=None):
+    """
+    Move device/audit log months past the retention window into archive files, then delete them.
+    """
+    return archive_logs(days)
+
+
+@shared_task(name='fluxora.tasks.sweep_intercom_devices')
+def sweep_intercom_devices():
+    """
+    Mark intercom devices without a recent heartbeat offline and announce them on the building stream.
+    """
+    return sweep_offline_devices()
+
+
+@shared_task(name='fluxora.tasks.reconcile_gate_rollups')
+def reconcile_gate_rollups(days=2):
+    """
+    Recompute the last few days of gate traffic rollups from raw events (repairs any drift).
+    """
+    return rebuild_rollups(since=timezone.now() - timedelta(days=days))
@@ -1,3 +1,1533 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+from base64 import b64encode
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import Sum
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .consumers import ChatConsumer, OutboundBuffer
+from .fastpath import compile_serializer
+from .pagination import KeysetPagination
+from .services import events, geo
+from .services.billing import claim_billing_job, fail_billing_job, generate_monthly_invoices, process_billing_job
+from .services.bulk import bulk_insert
+from .services.bookings import BookingConflict, cancel_occurrence, reserve, slot_cache
+from .services.chat import MessageBuffer, RoomHistory, chat_topic, get_channel_layer, mark_read
+from .services.dispatcher import Dispatcher, LocalStubProvider, enqueue_notification
+from .services.gates import rebuild_rollups
+from .services.intercom import device_cache, heartbeats, sweep_offline_devices
+from .services.ratelimit import TokenBucket
+from .services.retention import archive_logs
+from .services.stats import refresh_building_stats
+from .services.roles import has_admin_role, role_cache
+from .services.reminders import send_invoice_reminders
+from .models import (
+    User, Building, Unit, Resident, BillType, Invoice, InvoiceItem,
+    Ticket, TicketImage, Notification, InvoiceReminder, NotificationOutbox,
+    IntercomDevice, IntercomLog, GateEvent, ArchivePartition,
+    Asset, LiftStatusLog, LiftCurrentStatus, BuildingEvent, GateTrafficRollup,
+    Resource, Booking, RecurringBooking, BuildingStats, Payment, Service, Vendor, UtilityMeter, UtilityBill, ChatRoom, RoomMember, Message, BillingJob, BillingJobType, JobStatus,
+)
+from .tasks import run_billing_job, sweep_billing_jobs
+from .views import BillingJobSerializer, InvoiceSerializer, NotificationSerializer, TicketSerializer
+
+
+class FastListParityTests(TestCase):
+    """The compiled values() list renderer must emit exactly what the DRF serializers emit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(name='Owner', email='owner@example.com', password_hash='x', bio='b' * 500)
+        cls.building = Building.objects.create(name='Tower', address='Road 1', amenities_json={'gym': True})
+        unit = Unit.objects.create(building=cls.building, unit_number='A1', size_sqft=Decimal('950.50'))
+        resident = Resident.objects.create(user=owner, building=cls.building, unit=unit)
+        bill_type = BillType.objects.create(name='Service')
+        for i in range(3):
+            inv = Invoice.objects.create(
+                invoice_number=f'INV-{i}', resident=resident, building=cls.building,
+                bill_type=bill_type if i else None, amount=Decimal('2150.75'),
+                due_date=date(2025, 1, 10 + i), status='pending' if i else 'paid',
+            )
+            InvoiceItem.objects.create(invoice=inv, description='Service', unit_price=2000, total_amount=2000)
+            if i:
+                InvoiceItem.objects.create(invoice=inv, description='Water', quantity=Decimal('1.5'),
+                                           unit_price=Decimal('100.50'), total_amount=Decimal('150.75'),
+                                           utility_bill_id=i)
+        ticket = Ticket.objects.create(building=cls.building, resident=resident, category='Plumbing',
+                                       description='Leak ' * 50, priority='high')
+        Ticket.objects.create(building=cls.building, resident=resident, category='Lift', description='Stuck')
+        TicketImage.objects.create(ticket=ticket, image_path='tickets/1/a.jpg')
+        Notification.objects.create(building=cls.building, resident=resident, type='bill', message='Due soon')
+        Notification.objects.create(building=cls.building, type='notice', message='Water off', is_read=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser('root', 'root@example.com', 'pw'))
+
+    def assertParity(self, url):
+        fast = self.client.get(url)
+        slow = self.client.get(url + ('&' if '?' in url else '?') + 'fast=0')
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(slow.status_code, 200)
+        self.assertEqual(fast.json(), slow.json())
+        return fast.json()
+
+    def test_serializers_compile(self):
+        for serializer_class in (InvoiceSerializer, TicketSerializer, NotificationSerializer):
+            self.assertIsNotNone(compile_serializer(serializer_class()), serializer_class.__name__)
+
+    def test_unsupported_serializer_falls_back(self):
+        self.assertIsNone(compile_serializer(BillingJobSerializer()))
+
+    def test_invoices_with_nested_items(self):
+        data = self.assertParity('/api/invoices/')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(sum(len(inv['items']) for inv in data['results']), 5)
+
+    def test_tickets_with_nested_images(self):
+        data = self.assertParity('/api/tickets/')
+        self.assertEqual(data['count'], 2)
+
+    def test_notifications(self):
+        self.assertParity('/api/notifications/')
+
+    def test_sparse_fieldsets(self):
+        self.assertParity('/api/invoices/?fields=id,invoice_number,amount,items')
+        self.assertParity('/api/tickets/?omit=description,images')
+        data = self.assertParity('/api/notifications/?fields=message')
+        self.assertEqual(set(data['results'][0]), {'message'})
+
+    def test_sparse_fieldset_keeps_method_field_columns(self):
+        for _ in range(3):
+            BillingJob.objects.create(job_type=BillingJobType.MONTHLY_INVOICES, building=self.building,
+                                      total=4, processed=1)
+        self.client.get('/api/billing-jobs/?fields=id')  # warm the role lookup
+        with self.assertNumQueries(2):  # count + page, no per-row loads for progress
+            response = self.client.get('/api/billing-jobs/?fields=id,progress')
+        self.assertEqual([job['progress'] for job in response.json()['results']], [25.0] * 3)
+
+    def test_filters_and_pagination(self):
+        self.assertParity(f'/api/invoices/?building_id={self.building.id}&status=pending')
+        self.assertParity('/api/invoices/?page=1')
+
+
+class BillingJobClaimTests(TestCase):
+    """Resuming a job must claim it with a conditional UPDATE so only one run proceeds."""
+
+    def setUp(self):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        self.job = BillingJob.objects.create(job_type=BillingJobType.MONTHLY_INVOICES, building=building)
+
+    def test_claims_once(self):
+        self.assertTrue(claim_billing_job(self.job.id))
+        self.assertFalse(claim_billing_job(self.job.id))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobStatus.RUNNING)
+
+    def test_failed_and_stale_running_jobs_are_claimable(self):
+        fail_billing_job(self.job.id, 'broker down')
+        self.assertTrue(claim_billing_job(self.job.id))
+        BillingJob.objects.filter(pk=self.job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertFalse(claim_billing_job(self.job.id, stale_after=7200))
+        self.assertTrue(claim_billing_job(self.job.id, stale_after=60))
+
+    def test_completed_job_is_not_failed(self):
+        BillingJob.objects.filter(pk=self.job.id).update(status=JobStatus.COMPLETED)
+        fail_billing_job(self.job.id, 'late error')
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobStatus.COMPLETED)
+
+
+class BillingJobRunTests(TestCase):
+    """Billing jobs are claimed by whoever runs them and resume after their last committed chunk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.bill_type = BillType.objects.create(name='Service')
+        cls.residents = [
+            Resident.objects.create(building=cls.building, user=User.objects.create(
+                name=f'R{i}', email=f'r{i}@example.com', password_hash='x'))
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser('root', 'root@example.com', 'pw'))
+
+    def _job(self, **kwargs):
+        return BillingJob.objects.create(
+            job_type=BillingJobType.MONTHLY_INVOICES, building=self.building,
+            params_json={'bill_type_id': self.bill_type.id, 'billing_month': '2025-03',
+                         'due_date': '2025-03-10'},
+            **kwargs,
+        )
+
+    def test_resume_skips_committed_chunks_without_duplicate_invoices(self):
+        job = self._job()
+        real = generate_monthly_invoices
+        calls = []
+
+        def crash_on_second_chunk(*args, **kwargs):
+            calls.append(kwargs['residents'])
+            if len(calls) == 2:
+                raise RuntimeError('worker died')
+            return real(*args, **kwargs)
+
+        with mock.patch('fluxora.services.billing.generate_monthly_invoices', side_effect=crash_on_second_chunk):
+            job = process_billing_job(job, chunk_size=2)
+        self.assertEqual((job.status, job.processed, job.created_count), (JobStatus.FAILED, 2, 2))
+        self.assertEqual(job.cursor, self.residents[1].id)
+
+        # An invoice that slipped in for a later resident (e.g. created by hand) is not duplicated
+        late = self.residents[3]
+        Invoice.objects.create(invoice_number=f'AUTO-{late.id}-202503', resident=late, building=self.building,
+                               amount=Decimal('2000'), due_date=date(2025, 3, 10))
+        with mock.patch('fluxora.services.billing.generate_monthly_invoices', side_effect=real) as spy:
+            self.assertEqual(run_billing_job(job.id)['status'], JobStatus.COMPLETED)
+        resumed = [r for call in spy.call_args_list for r in call.kwargs['residents']]
+        self.assertEqual([rid for rid, _ in resumed], [r.id for r in self.residents[2:]])
+
+        job.refresh_from_db()
+        self.assertEqual((job.processed, job.created_count, job.skipped_count), (5, 4, 1))
+        numbers = list(Invoice.objects.values_list('invoice_number', flat=True))
+        self.assertEqual(len(numbers), 5)
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertEqual(InvoiceItem.objects.count(), 4)
+
+        self.assertEqual(run_billing_job(job.id)['status'], JobStatus.COMPLETED)
+        self.assertEqual(Invoice.objects.count(), 5)
+
+    def test_executor_claims_before_running(self):
+        job = self._job(status=JobStatus.RUNNING)
+        self.assertEqual(run_billing_job(job.id)['status'], JobStatus.RUNNING)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_broker_down_leaves_job_queued_for_the_sweeper(self):
+        with mock.patch('fluxora.views.run_billing_job.delay', side_effect=ConnectionError) as delay:
+            response = self.client.post('/api/invoices/generate-monthly/', {
+                'building_id': self.building.id, 'bill_type_id': self.bill_type.id,
+                'billing_month': '2025-03', 'due_date': '2025-03-10',
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], JobStatus.QUEUED)
+        delay.assert_called_once_with(response.data['id'])
+        self.assertFalse(Invoice.objects.exists())
+
+        with override_settings(BILLING_JOB_SWEEP_SECONDS=-1), \
+                mock.patch('fluxora.tasks.run_billing_job.delay', side_effect=run_billing_job) as delay:
+            self.assertEqual(sweep_billing_jobs(), {'dispatched': 1})
+        delay.assert_called_once_with(response.data['id'])
+        self.assertEqual(BillingJob.objects.get().status, JobStatus.COMPLETED)
+        self.assertEqual(Invoice.objects.count(), 5)
+
+    def test_resume_requeues_failed_job(self):
+        job = self._job(status=JobStatus.FAILED)
+        url = f'/api/billing-jobs/{job.id}/resume/'
+        with mock.patch('fluxora.views.run_billing_job.delay', side_effect=ConnectionError):
+            response = self.client.post(url)
+        self.assertEqual((response.status_code, response.data['status']), (202, JobStatus.QUEUED))
+        BillingJob.objects.filter(pk=job.id).update(status=JobStatus.RUNNING)
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+
+class MonthlyInvoiceParityTests(TestCase):
+    """The set-based monthly invoice engine must write what the old per-resident loop wrote."""
+
+    MONTH = '2025-03'
+    DUE = date(2025, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.empty = Building.objects.create(name='Annex', address='Road 2')
+        cls.bill_type = BillType.objects.create(name='Service')
+        for i in range(3):
+            unit = Unit.objects.create(building=cls.building, unit_number=f'A{i}')
+            Resident.objects.create(building=cls.building, unit=unit, user=User.objects.create(
+                name=f'R{i}', email=f'r{i}@example.com', password_hash='x'))
+            for j, kind in enumerate(['water', 'gas'][:i]):
+                meter = UtilityMeter.objects.create(unit=unit, type=kind, meter_number=f'M{i}{j}')
+                UtilityBill.objects.create(meter=meter, reading_date=date(2025, 2, 28), reading_value=10,
+                                           amount=Decimal('123.45') + i)
+                UtilityBill.objects.create(meter=meter, reading_date=date(2025, 1, 28), reading_value=5,
+                                           amount=Decimal('99.99'), status='paid')
+        # no unit, so never any utility lines
+        Resident.objects.create(building=cls.building, user=User.objects.create(
+            name='Lodger', email='lodger@example.com', password_hash='x'))
+
+    def _legacy(self, building_id, include_utilities):
+        """The per-resident loop generate_monthly ran before the set-based engine."""
+        created = []
+        for r in Resident.objects.filter(building_id=building_id):
+            inv = Invoice.objects.create(
+                invoice_number=f"AUTO-{r.id}-{self.MONTH.replace('-', '')}", resident=r,
+                building_id=building_id, bill_type_id=self.bill_type.id, amount=0, due_date=self.DUE,
+                status='pending',
+            )
+            InvoiceItem.objects.create(invoice=inv, description='Monthly Service Charge', quantity=1,
+                                       unit_price=2000, tax_amount=0, total_amount=2000)
+            total = inv.items.aggregate(s=Sum('total_amount'))['s'] or 0
+            if include_utilities and r.unit_id:
+                bills = UtilityBill.objects.filter(meter__unit_id=r.unit_id, status='pending')
+                for b in bills:
+                    InvoiceItem.objects.create(invoice=inv, description=f'Utility {b.meter.type} {b.reading_date}',
+                                               quantity=1, unit_price=b.amount, tax_amount=0,
+                                               total_amount=b.amount, utility_bill_id=b.id)
+                total = inv.items.aggregate(s=Sum('total_amount'))['s'] or total
+            inv.amount = total
+            inv.save()
+            created.append(inv.id)
+        return created
+
+    def _snapshot(self, building_id):
+        invoices = {}
+        for inv in Invoice.objects.filter(building_id=building_id).prefetch_related('items'):
+            items = sorted(
+                (i.description, i.quantity, i.unit_price, i.tax_amount, i.total_amount, i.utility_bill_id)
+                for i in inv.items.all()
+            )
+            invoices[inv.invoice_number] = (inv.resident_id, inv.bill_type_id, inv.amount, inv.due_date,
+                                             inv.status, items)
+        return invoices
+
+    def _run_legacy(self, building_id, include_utilities):
+        with transaction.atomic():
+            created = self._legacy(building_id, include_utilities)
+            snapshot = self._snapshot(building_id)
+            transaction.set_rollback(True)
+        return created, snapshot
+
+    def _run_engine(self, building_id, include_utilities, **kwargs):
+        return generate_monthly_invoices(building_id, self.bill_type.id, self.MONTH, self.DUE,
+                                         include_utilities=include_utilities, **kwargs)
+
+    def test_matches_legacy_loop(self):
+        for include_utilities in (False, True):
+            with self.subTest(include_utilities=include_utilities), transaction.atomic():
+                legacy_ids, expected = self._run_legacy(self.building.id, include_utilities)
+                result = self._run_engine(self.building.id, include_utilities, chunk_size=3)
+                self.assertEqual(len(result['created_invoices']), len(legacy_ids))
+                self.assertEqual(self._snapshot(self.building.id), expected)
+                transaction.set_rollback(True)
+        self.assertTrue(any(len(items) == 3 for *_, items in expected.values()))
+
+    def test_building_without_residents(self):
+        _, expected = self._run_legacy(self.empty.id, True)
+        result = self._run_engine(self.empty.id, True)
+        self.assertEqual(expected, {})
+        self.assertEqual(result['created_invoices'], [])
+        self.assertEqual(result['stats']['invoices'], 0)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_skips_residents_already_invoiced(self):
+        _, expected = self._run_legacy(self.building.id, True)
+        first = Resident.objects.filter(building=self.building).order_by('id').first()
+        invoice = Invoice.objects.create(invoice_number=f'AUTO-{first.id}-202503', resident=first,
+                                         building=self.building, amount=Decimal('1.00'), due_date=self.DUE)
+
+        result = self._run_engine(self.building.id, True)
+        self.assertEqual(result['stats']['skipped'], 1)
+        self.assertEqual(len(result['created_invoices']), len(expected) - 1)
+        snapshot = self._snapshot(self.building.id)
+        self.assertEqual(snapshot[invoice.invoice_number][2], Decimal('1.00'))
+        del snapshot[invoice.invoice_number], expected[invoice.invoice_number]
+        self.assertEqual(snapshot, expected)
+
+        rerun = self._run_engine(self.building.id, True)
+        self.assertEqual(rerun['created_invoices'], [])
+        self.assertEqual(rerun['stats']['skipped'], len(expected) + 1)
+
+
+class BuildingStatsRollupTests(TestCase):
+    """Incremental rollup updates must match a full recompute, including rows moved between buildings."""
+
+    FIELDS = ('invoices_count', 'payments_sum', 'open_tickets', 'bookings_count', 'occupied_units')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.a = Building.objects.create(name='A', address='Road 1')
+        cls.b = Building.objects.create(name='B', address='Road 2')
+        cls.resident = Resident.objects.create(building=cls.a, user=User.objects.create(
+            name='R', email='r@example.com', password_hash='x'))
+
+    def setUp(self):
+        refresh_building_stats()
+
+    def _rollups(self):
+        return {
+            row['building_id']: tuple(row[f] for f in self.FIELDS)
+            for row in BuildingStats.objects.values('building_id', *self.FIELDS)
+        }
+
+    def assertInSync(self):
+        incremental = self._rollups()
+        refresh_building_stats()
+        self.assertEqual(incremental, self._rollups())
+
+    def test_create_update_delete_and_move(self):
+        invoice = Invoice.objects.create(invoice_number='INV-1', resident=self.resident, building=self.a,
+                                         amount=Decimal('500'), due_date=date(2025, 3, 10))
+        other = Invoice.objects.create(invoice_number='INV-2', resident=self.resident, building=self.b,
+                                       amount=Decimal('300'), due_date=date(2025, 3, 10))
+        payment = Payment.objects.create(invoice=invoice, resident=self.resident, amount=Decimal('200'), method='cash')
+        Payment.objects.create(invoice=invoice, resident=self.resident, amount=Decimal('50'), method='cash')
+        unit = Unit.objects.create(building=self.a, unit_number='1A', status='occupied')
+        ticket = Ticket.objects.create(building=self.a, resident=self.resident, category='Lift', description='x')
+        hall = Resource.objects.create(building=self.a, name='Hall')
+        start = timezone.now()
+        booking = Booking.objects.create(resource=hall, resident=self.resident, start_time=start,
+                                         end_time=start + timedelta(hours=1))
+        self.assertEqual(self._rollups()[self.a.id], (1, Decimal('250'), 1, 1, 1))
+        self.assertInSync()
+
+        payment.amount = Decimal('120')
+        payment.save()
+        ticket.status = 'resolved'
+        ticket.save()
+        self.assertInSync()
+
+        # Moves: each row's contribution leaves the old building and lands on the new one
+        invoice.building = self.b
+        invoice.save()
+        self.assertEqual(self._rollups()[self.b.id][:2], (2, Decimal('170')))
+        self.assertInSync()
+        payment.invoice = other
+        payment.save()
+        ticket.status = 'open'
+        ticket.building = self.b
+        ticket.save()
+        unit.building = self.b
+        unit.save(update_fields=['building'])
+        self.assertInSync()
+        booking.resource = Resource.objects.create(building=self.b, name='Gym')
+        booking.save()
+        self.assertInSync()
+        hall.building = self.b
+        hall.save()
+        booking.resource = hall
+        booking.save()
+        hall.building = self.a
+        hall.save()
+        self.assertEqual(self._rollups()[self.a.id], (0, Decimal('0'), 0, 1, 0))
+        self.assertInSync()
+
+        # Saves that cannot move a row skip the extra lookup
+        with self.assertNumQueries(3):  # UPDATE, the open-ticket count, the rollup UPDATE
+            ticket.save(update_fields=['description'])
+
+        for row in (booking, ticket, unit, payment):
+            row.delete()
+        Payment.objects.all().delete()
+        invoice.delete()
+        self.assertInSync()
+        self.assertEqual(self._rollups()[self.b.id], (1, Decimal('0'), 0, 0, 0))
+
+
+class InvoiceReminderTests(TestCase):
+    """Reminders stream through one mail connection and record a delivery row per invoice."""
+
+    @classmethod
+    def setUpTestData(cls):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        due = date.today() + timedelta(days=1)
+        for i in range(5):
+            user = User.objects.create(name=f'R{i}', email=f'r{i}@example.com' if i else '', password_hash='x')
+            resident = Resident.objects.create(user=user, building=building)
+            Invoice.objects.create(invoice_number=f'INV-{i}', resident=resident, building=building,
+                                   amount=Decimal('100.00'), due_date=due)
+        Invoice.objects.create(invoice_number='INV-LATER', resident=resident, building=building,
+                               amount=Decimal('100.00'), due_date=due + timedelta(days=30))
+
+    def test_sends_due_invoices_in_chunks(self):
+        result = send_invoice_reminders(days_before_due=1, chunk_size=2)
+        self.assertEqual(result, {'reminders_sent': 4, 'failed': 0, 'skipped': 1})
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(InvoiceReminder.objects.filter(status='sent').count(), 4)
+        self.assertIn('INV-1', mail.outbox[0].subject)
+
+    def test_rerun_same_day_does_not_resend(self):
+        send_invoice_reminders()
+        self.assertEqual(send_invoice_reminders()['reminders_sent'], 0)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_failures_are_recorded_per_invoice(self):
+        class FlakyBackend(LocmemBackend):
+            def send_messages(self, messages):
+                if messages[0].to == ['r2@example.com']:
+                    raise OSError('mailbox unavailable')
+                return super().send_messages(messages)
+
+        result = send_invoice_reminders(connection=FlakyBackend())
+        self.assertEqual((result['reminders_sent'], result['failed']), (3, 1))
+        failed = InvoiceReminder.objects.get(status='failed')
+        self.assertEqual(failed.recipient, 'r2@example.com')
+        self.assertIn('mailbox unavailable', failed.error)
+
+
+class NotificationDispatcherTests(TestCase):
+    """Outbox fan-out and delivery through the per-channel worker pools."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        for i in range(4):
+            user = User.objects.create(name=f'R{i}', email=f'r{i}@example.com', password_hash='x',
+                                       phone=f'+100{i}' if i % 2 else None)
+            Resident.objects.create(user=user, building=cls.building, opt_in=i != 3)
+
+    def test_enqueue_writes_in_app_and_outbox_rows(self):
+        result = enqueue_notification(self.building.id, 'Lift maintenance', channels=['email', 'sms'])
+        # Everyone gets the in-app row; the opted-out resident and missing phones get no delivery
+        self.assertEqual(result, {'notifications': 4, 'queued': 4})
+        self.assertEqual(Notification.objects.filter(message='Lift maintenance').count(), 4)
+        self.assertEqual(NotificationOutbox.objects.filter(channel='sms').count(), 1)
+
+    def test_dispatch_retries_then_fails(self):
+        enqueue_notification(self.building.id, 'Water off', channels=['email', 'push'])
+        providers = {'email': LocalStubProvider(), 'push': LocalStubProvider(failure_rate=1.0)}
+        with Dispatcher(providers=providers, workers=2, rate_limits={}, max_attempts=2, backoff_base=0) as dispatcher:
+            totals = dispatcher.drain()
+        self.assertEqual(totals['sent'], 3)
+        self.assertEqual((totals['retry'], totals['failed']), (3, 3))
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+        failed = NotificationOutbox.objects.filter(status='failed')
+        self.assertTrue(all(row.attempts == 2 and 'Simulated' in row.last_error for row in failed))
+
+    def test_unconfigured_channels_fail_instead_of_sending(self):
+        enqueue_notification(self.building.id, 'Gas check', channels=['sms', 'push'])
+        with override_settings(NOTIFICATION_PROVIDERS={}), Dispatcher(workers=1, rate_limits={}) as dispatcher:
+            totals = dispatcher.drain()
+        self.assertEqual((totals['sent'], totals['retry'], totals['failed']), (0, 0, 4))
+        self.assertFalse(NotificationOutbox.objects.filter(status='sent').exists())
+
+    def test_broadcast_queues_without_dispatching_in_the_request(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser('root', 'root@example.com', 'pw'))
+        url = '/api/notifications/broadcast/'
+        response = client.post(url, {'building_id': self.building.id, 'message': 'Hi', 'channels': 'sms'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('fluxora.views.dispatch_notifications.delay', side_effect=ConnectionError):
+            response = client.post(url, {'building_id': self.building.id, 'message': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 3)
+
+    def test_broadcast_validates_resident_ids(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser('root', 'root@example.com', 'pw'))
+        url = '/api/notifications/broadcast/'
+        for resident_ids in ['1,2', 3, ['1'], [True], [1.5], {'id': 1}]:
+            with self.subTest(resident_ids=resident_ids):
+                response = client.post(url, {'building_id': self.building.id, 'message': 'Hi',
+                                             'resident_ids': resident_ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        resident = Resident.objects.filter(building=self.building).order_by('id').first()
+        with mock.patch('fluxora.views.dispatch_notifications.delay') as delay:
+            response = client.post(url, {'building_id': self.building.id, 'message': 'Hi',
+                                         'resident_ids': [resident.id]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {'notifications': 1, 'queued': 1})
+        delay.assert_called_once_with()
+
+
+class ChatMetricsTests(TestCase):
+    """Process-level chat metrics are for committee/admin only, reads included."""
+
+    def test_non_admin_is_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user('resident', 'r@example.com', 'pw'))
+        self.assertEqual(client.get('/api/chat/metrics/').status_code, 403)
+        client.force_authenticate(get_user_model().objects.create_superuser('root', 'root@example.com', 'pw'))
+        self.assertEqual(client.get('/api/chat/metrics/').status_code, 200)
+
+
+class RoleCacheTests(TestCase):
+    """Business roles are cached per auth user, but a role or email change applies immediately."""
+
+    def setUp(self):
+        role_cache.clear()
+        self.addCleanup(role_cache.clear)
+        self.auth_user = get_user_model().objects.create_user('boss', 'boss@example.com', 'pw')
+        self.business_user = User.objects.create(name='Boss', email='boss@example.com', password_hash='x',
+                                                 role='committee')
+        self.client = APIClient()
+        self.client.force_authenticate(self.auth_user)
+
+    def _is_admin(self):
+        request = RequestFactory().post('/')
+        request.user = self.auth_user
+        return has_admin_role(request)
+
+    def test_cache_hit_skips_the_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self._is_admin())
+        with self.assertNumQueries(0):
+            self.assertTrue(self._is_admin())
+
+    def test_role_change_invalidates(self):
+        self.assertTrue(self._is_admin())
+        self.business_user.role = 'resident'
+        self.business_user.save()
+        self.assertFalse(self._is_admin())
+        self.business_user.role = 'admin'
+        self.business_user.save(update_fields=['role'])
+        self.assertTrue(self._is_admin())
+
+    def test_email_change_invalidates(self):
+        self.assertTrue(self._is_admin())
+        self.business_user.email = 'former-boss@example.com'
+        self.business_user.save()
+        self.assertFalse(self._is_admin())
+
+        # A different business user taking over the email is picked up just as fast
+        User.objects.create(name='New boss', email='boss@example.com', password_hash='x', role='admin')
+        self.assertTrue(self._is_admin())
+
+    def test_demoted_user_is_denied_on_the_next_request(self):
+        self.assertEqual(self.client.get('/api/chat/metrics/').status_code, 200)
+        self.assertEqual(self.client.get('/api/chat/metrics/').status_code, 200)
+        self.business_user.role = 'resident'
+        self.business_user.save()
+        self.assertEqual(self.client.get('/api/chat/metrics/').status_code, 403)
+        self.business_user.delete()
+        self.assertEqual(self.client.get('/api/chat/metrics/').status_code, 403)
+
+
+class BulkInsertTests(TestCase):
+    """Without RETURNING, rows still go in as multi-row INSERTs and get their real ids back."""
+
+    def setUp(self):
+        patcher = mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batched_inserts_recover_ids(self):
+        Building.objects.create(name='Existing', address='Road 0')
+        buildings = [Building(name=f'T{i}', address='Road') for i in range(7)]
+        buildings.insert(3, Building(pk=10_000, name='Preset', address='Road'))
+        # One INSERT plus one id lookup per batch of three, one INSERT for the preset pk
+        with self.assertNumQueries(7):
+            rows = bulk_insert(Building, buildings, batch_size=3)
+        self.assertIs(rows[0], buildings[0])
+        self.assertTrue(all(b.pk and not b._state.adding for b in buildings))
+        self.assertEqual(len({b.pk for b in buildings}), 8)
+        self.assertEqual(dict(Building.objects.filter(pk__in=[b.pk for b in buildings]).values_list('pk', 'name')),
+                         {b.pk: b.name for b in buildings})
+
+    def test_unsupported_backend(self):
+        with mock.patch.object(connection, 'vendor', 'oracle'), self.assertRaises(NotSupportedError):
+            bulk_insert(Building, [Building(name='T', address='Road')])
+        self.assertEqual(bulk_insert(Building, []), [])
+
+
+class ChatBufferTests(TestCase):
+    """Write-behind flushes need real message ids, including on backends without RETURNING."""
+
+    @classmethod
+    def setUpTestData(cls):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        cls.room = ChatRoom.objects.create(name='Lobby', building=building)
+        cls.other_room = ChatRoom.objects.create(name='Garden', building=building)
+        cls.resident = Resident.objects.create(building=building, user=User.objects.create(
+            name='Ann', email='ann@example.com', password_hash='x'))
+        RoomMember.objects.create(room=cls.room, resident=cls.resident)
+
+    def test_flush_sets_ids_without_bulk_returning(self):
+        buffer = MessageBuffer()
+        messages = [Message(room_id=self.room.id, resident_id=self.resident.id, content=f'm{i}') for i in range(3)]
+        buffer._pending.extend((message, 0) for message in messages)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assertEqual(buffer.flush_sync(), 3)
+        self.assertTrue(all(message.pk for message in messages))
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message_id, messages[-1].pk)
+        member = RoomMember.objects.get(room=self.room, resident=self.resident)
+        self.assertEqual(member.last_read_message_id, messages[-1].pk)
+
+    def test_mark_read_rejects_foreign_message(self):
+        foreign = Message.objects.create(room=self.other_room, resident=self.resident, content='elsewhere')
+        with self.assertRaises(ValueError):
+            mark_read(self.room.id, self.resident.id, foreign.id)
+
+
+class BackpressureTests(TestCase):
+    """Token buckets and per-connection send queues that keep noisy or slow sockets in check."""
+
+    def test_token_bucket(self):
+        clock = mock.Mock(return_value=100.0)
+        bucket = TokenBucket(2, 3, clock=clock)
+        self.assertEqual([bucket.try_acquire() for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(bucket.wait_time(), 0.5)
+        clock.return_value = 100.25
+        self.assertFalse(bucket.try_acquire())
+        self.assertAlmostEqual(bucket.wait_time(), 0.25)
+        clock.return_value = 110.0  # refills up to the burst size only
+        self.assertEqual(bucket.wait_time(), 0.0)
+        self.assertEqual(sum(bucket.try_acquire() for _ in range(5)), 3)
+
+        unlimited = TokenBucket(0)
+        self.assertTrue(all(unlimited.try_acquire() for _ in range(100)))
+        self.assertEqual(unlimited.wait_time(), 0.0)
+
+    def test_outbound_buffer_drops_oldest_and_reports_the_gap(self):
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        async def scenario():
+            buffer = OutboundBuffer(send, maxsize=2)
+            for n in range(4):
+                buffer.put({'n': n})
+            self.assertEqual(buffer.depth, 2)
+            buffer.start()
+            await asyncio.sleep(0.01)
+            buffer.put({'n': 4})
+            await asyncio.sleep(0.01)
+            await buffer.close()
+
+        async_to_sync(scenario)()
+        self.assertEqual(sent, [{'type': 'gap', 'dropped': 2}, {'n': 2}, {'n': 3}, {'n': 4}])
+
+    def test_outbound_buffer_coalesces_by_key(self):
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        async def scenario():
+            buffer = OutboundBuffer(send, maxsize=10)
+            buffer.put({'type': 'read', 'unread_count': 5}, coalesce_key='read')
+            buffer.put({'text': 'hi'})
+            buffer.put({'type': 'read', 'unread_count': 2}, coalesce_key='read')
+            self.assertEqual(buffer.depth, 2)
+            buffer.start()
+            await asyncio.sleep(0.01)
+            await buffer.close()
+
+        async_to_sync(scenario)()
+        self.assertEqual(sent, [{'type': 'read', 'unread_count': 2}, {'text': 'hi'}])
+
+
+class ChatConsumerTests(TransactionTestCase):
+    """Chat sockets are for residents of the room's building; senders are named by the server."""
+
+    def setUp(self):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        self.room = ChatRoom.objects.create(name='Lobby', building=building)
+        Resident.objects.create(building=building, user=User.objects.create(
+            name='Ann', email='ann@example.com', password_hash='x'))
+        self.member = get_user_model().objects.create_user('ann', 'ann@example.com', 'pw')
+        self.outsider = get_user_model().objects.create_user('eve', 'eve@example.com', 'pw')
+
+    def connect(self, user):
+        scope = {'type': 'websocket', 'path': f'/ws/chat/{self.room.id}/', 'user': user,
+                 'url_route': {'kwargs': {'room_id': self.room.id}}}
+        return ApplicationCommunicator(ChatConsumer.as_asgi(), scope)
+
+    def test_outsider_is_closed_and_sender_is_not_spoofable(self):
+        async def scenario():
+            outsider = self.connect(self.outsider)
+            await outsider.send_input({'type': 'websocket.connect'})
+            self.assertEqual(await outsider.receive_output(), {'type': 'websocket.close', 'code': 4403})
+
+            member = self.connect(self.member)
+            await member.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await member.receive_output())['type'], 'websocket.accept')
+            self.assertEqual(json.loads((await member.receive_output())['text'])['type'], 'backlog')
+            await member.send_input({'type': 'websocket.receive',
+                                     'text': json.dumps({'type': 'message', 'text': 'hello', 'sender': 'Admin'})})
+            self.assertEqual(json.loads((await member.receive_output())['text']), {'text': 'hello', 'sender': 'Ann'})
+            await member.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await member.wait()
+
+        async_to_sync(scenario)()
+
+    @override_settings(CHAT_RATE_PER_SEC=20, CHAT_RATE_BURST=1)
+    def test_one_throttled_notice_per_burst(self):
+        async def scenario():
+            member = self.connect(self.member)
+            await member.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await member.receive_output())['type'], 'websocket.accept')
+            await member.receive_output()  # backlog
+            frames = []
+            for burst in range(2):
+                for i in range(3):
+                    await member.send_input({'type': 'websocket.receive',
+                                             'text': json.dumps({'type': 'message', 'text': f'{burst}-{i}'})})
+                await asyncio.sleep(0.02)
+                while not await member.receive_nothing(timeout=0.02):
+                    frames.append(json.loads((await member.receive_output())['text']))
+                await asyncio.sleep(0.06)  # refill one token
+            await member.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await member.wait()
+            return frames
+
+        frames = async_to_sync(scenario)()
+        self.assertEqual([f.get('type', f.get('text')) for f in frames], ['0-0', 'throttled', '1-0', 'throttled'])
+        self.assertTrue(all(0 < f['retry_after'] <= 0.05 for f in frames if f.get('type') == 'throttled'))
+
+    def test_chat_loadgen_runs_in_a_throwaway_room(self):
+        out = StringIO()
+        call_command('chat_loadgen', readers=1, slow=1, noisy=1, duration=0.3, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Done.', output)
+        self.assertRegex(output, r'readers received min=[1-9]')
+        self.assertEqual(ChatRoom.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(Building.objects.filter(name__startswith='Bench').exists())
+
+    def test_bench_websockets_runs_in_throwaway_rooms(self):
+        out = StringIO()
+        call_command('bench_websockets', clients=4, rooms=2, messages=3, rate=0, stdout=out)
+        output = out.getvalue()
+        self.assertIn('delivered 12/12', output)
+        self.assertEqual(ChatRoom.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(Building.objects.filter(name__startswith='Bench').exists())
+
+    def test_relayed_frames_are_recorded_once_per_process(self):
+        async def receive(communicator):
+            return json.loads((await communicator.receive_output())['text'])
+
+        async def scenario(history):
+            first, second = self.connect(self.member), self.connect(self.member)
+            for communicator in (first, second):
+                await communicator.send_input({'type': 'websocket.connect'})
+                self.assertEqual((await communicator.receive_output())['type'], 'websocket.accept')
+                self.assertEqual((await receive(communicator))['type'], 'backlog')
+
+            await first.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'message', 'text': 'local'})})
+            for communicator in (first, second):
+                self.assertEqual(await receive(communicator), {'text': 'local', 'sender': 'Ann'})
+
+            # A frame relayed by another worker, then the ids it announces after its flush
+            layer = get_channel_layer()
+            await layer.group_send(chat_topic(self.room.id), {
+                'type': 'chat.message', 'text': 'remote', 'sender': 'Bob', 'key': 'other-worker-1',
+            })
+            for communicator in (first, second):
+                self.assertEqual(await receive(communicator), {'text': 'remote', 'sender': 'Bob'})
+            self.assertEqual([m['text'] for m in await history.backlog(self.room.id)], ['local', 'remote'])
+            self.assertIsNone((await history.backlog(self.room.id))[1]['id'])
+
+            await layer.group_send(chat_topic(self.room.id), {'type': 'chat.persisted', 'ids': [['other-worker-1', 999]]})
+            for communicator in (first, second):
+                await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+                await communicator.wait()
+            return await history.backlog(self.room.id)
+
+        history = RoomHistory(ttl=0)
+        with mock.patch('fluxora.consumers.room_history', history):
+            backlog = async_to_sync(scenario)(history)
+        self.assertEqual([(m['id'], m['text']) for m in backlog],
+                         [(Message.objects.get(content='local').id, 'local'), (999, 'remote')])
+
+    def test_sse_requires_the_same_membership(self):
+        async def status_for(user):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            response = await client.get(f'/api/sse/chat/{self.room.id}/')
+            if response.streaming:
+                await response.streaming_content.aclose()
+            return response.status_code
+
+        self.assertEqual(async_to_sync(status_for)(self.outsider), 403)
+        self.assertEqual(async_to_sync(status_for)(self.member), 200)
+
+
+class IntercomWebhookTests(TestCase):
+    """Single and batched device events on the intercom webhook."""
+
+    @classmethod
+    def setUpTestData(cls):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        cls.device = IntercomDevice.objects.create(building=building, device_name='Gate', ip_address='10.0.0.2')
+
+    def setUp(self):
+        device_cache.clear()
+        heartbeats.clear()
+        self.client = APIClient()
+
+    def test_single_event_keeps_contract(self):
+        response = self.client.post('/api/intercom/webhook', {'device_id': self.device.id, 'event_type': 'ring'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(IntercomLog.objects.filter(pk=response.data['id']).exists())
+        response = self.client.post('/api/intercom/webhook', {'device_id': 999999, 'event_type': 'ring'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_reports_per_event_results_and_honours_timestamp(self):
+        batch = [
+            {'device_id': self.device.id, 'event_type': 'door_open', 'timestamp': '2025-03-01T07:30:00Z'},
+            {'device_id': 999999, 'event_type': 'ring'},
+            {'device_id': self.device.id},
+            {'device_id': self.device.id, 'event_type': 'ring', 'details': {'unit': '4B'}},
+        ]
+        with self.assertNumQueries(2):  # device lookup + one INSERT
+            response = self.client.post('/api/intercom/webhook', batch, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'error', 'created'])
+        self.assertEqual(response.data['results'][1]['error'], 'unknown device')
+        first = IntercomLog.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(first.timestamp.isoformat(), '2025-03-01T07:30:00+00:00')
+        self.assertEqual(IntercomLog.objects.get(pk=response.data['results'][3]['id']).details, '{"unit": "4B"}')
+        # Warm cache: the next batch only inserts
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/intercom/webhook', {'events': batch[:1]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_ids_without_bulk_returning(self):
+        batch = [{'device_id': self.device.id, 'event_type': 'ring'}] * 2
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            single = self.client.post('/api/intercom/webhook', batch[0], format='json')
+            many = self.client.post('/api/intercom/webhook', batch, format='json')
+        self.assertIsNotNone(single.data['id'])
+        ids = [r['id'] for r in many.data['results']]
+        self.assertEqual(IntercomLog.objects.filter(pk__in=ids).count(), 2)
+
+
+class LogArchiveTests(TestCase):
+    """Old device log months move to archive files and stay readable through the list endpoint."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.buildings = [Building.objects.create(name=f'T{i}', address='Road') for i in range(2)]
+        now = timezone.now()
+        for i in range(30):
+            event = GateEvent.objects.create(building=self.buildings[i % 2], event_type='open')
+            # One event every ten days, going back about ten months
+            GateEvent.objects.filter(pk=event.pk).update(timestamp=now - timedelta(days=10 * i, minutes=i))
+        user = get_user_model().objects.create_user('guard', 'guard@example.com', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def _walk(self):
+        ids, url = [], '/api/gate-events/?page_size=7'
+        while url:
+            page = self.client.get(url).data
+            ids.extend(row['id'] for row in page['results'])
+            url = page['next']
+        return ids
+
+    def test_archive_then_page_through_live_and_archived_rows(self):
+        before = self._walk()
+        self.assertEqual(len(before), 30)
+
+        totals = archive_logs(days=90)['gate_events']
+        live = GateEvent.objects.count()
+        self.assertEqual(totals['archived'], 30 - live)
+        self.assertEqual(totals['deleted'], 30 - live)
+        self.assertTrue(0 < live < 30)
+        self.assertEqual(ArchivePartition.objects.filter(source='gate_events').count(), totals['partitions'])
+        self.assertEqual(self._walk(), before)
+
+        # Nothing left to move; a second run is a no-op
+        self.assertEqual(archive_logs(days=90)['gate_events'], {})
+        self.assertEqual(self._walk(), before)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages are stable under equal timestamps, walk both ways and reject forged cursors."""
+
+    @classmethod
+    def setUpTestData(cls):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        cls.at = timezone.now().replace(microsecond=0)
+        events = [GateEvent.objects.create(building=building, event_type='open') for _ in range(8)]
+        # Five events share one timestamp, so only the pk orders them
+        for i, event in enumerate(events):
+            GateEvent.objects.filter(pk=event.pk).update(timestamp=cls.at - timedelta(minutes=max(0, i - 4)))
+        cls.newest_first = list(GateEvent.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('guard', 'guard@example.com', 'pw'))
+
+    def _cursor(self, url):
+        return parse_qs(urlsplit(url).query)['cursor'][0]
+
+    def _page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, [row['id'] for row in response.data['results']]
+
+    def test_cursor_round_trip(self):
+        factory = RequestFactory()
+        paginator = KeysetPagination()
+        paginator.request = Request(factory.get('/api/gate-events/', {'page_size': 3}))
+        paginator.field = 'timestamp'
+        event = GateEvent.objects.get(pk=self.newest_first[2])
+        for reverse in (False, True):
+            url = paginator.encode_cursor(reverse, event)
+            self.assertIn('page_size=3', url)
+            decoded = paginator.decode_cursor(Request(factory.get('/', {'cursor': self._cursor(url)})))
+            self.assertEqual(decoded, (reverse, event.timestamp, event.pk))
+        self.assertIsNone(paginator.decode_cursor(Request(factory.get('/'))))
+
+    def test_ties_are_broken_by_pk(self):
+        seen, url = [], '/api/gate-events/?page_size=2'
+        while url:
+            data, ids = self._page(url)
+            seen.extend(ids)
+            url = data['next']
+        self.assertEqual(seen, self.newest_first)
+
+    def test_previous_cursor_walks_back(self):
+        first, first_ids = self._page('/api/gate-events/?page_size=3')
+        self.assertIsNone(first['previous'])
+        second, second_ids = self._page(first['next'])
+        third, third_ids = self._page(second['next'])
+        self.assertEqual(first_ids + second_ids + third_ids, self.newest_first)
+        self.assertIsNone(third['next'])
+
+        back, back_ids = self._page(third['previous'])
+        self.assertEqual(back_ids, second_ids)
+        self.assertEqual(self._page(back['next'])[1], third_ids)
+        start, start_ids = self._page(back['previous'])
+        self.assertEqual(start_ids, first_ids)
+        self.assertIsNone(start['previous'])
+
+    def test_garbage_cursor_is_not_a_server_error(self):
+        def b64(text):
+            return b64encode(text.encode()).decode()
+
+        for cursor in ['!!!', 'abc', 'é', b64('t=yesterday&k=1'), b64('t=2025-01-01T00:00:00&k=x'),
+                       b64('k=1'), b64('t=2025-13-45T00:00:00&k=1'), b64encode(b'\xff\xfe').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/gate-events/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+
+class LiftStatusTests(TestCase):
+    """Current-status snapshot maintenance and the one-pass uptime report."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.lift = Asset.objects.create(building=cls.building, name='Lift A', type='lift')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+
+    def _log(self, status, at):
+        log = LiftStatusLog.objects.create(building=self.building, asset=self.lift, status=status)
+        LiftStatusLog.objects.filter(pk=log.pk).update(timestamp=at)
+        return log
+
+    def test_snapshot_tracks_latest_report(self):
+        for status in ('operational', 'operational', 'offline'):
+            LiftStatusLog.objects.create(building=self.building, asset=self.lift, status=status)
+        LiftStatusLog.objects.create(building=self.building, status='maintenance')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/lifts/current/?building_id={self.building.id}')
+        lifts = {row['asset_id']: row for row in response.data['lifts']}
+        self.assertEqual(lifts[self.lift.id]['status'], 'offline')
+        self.assertEqual(lifts[None]['status'], 'maintenance')
+        self.assertEqual(LiftCurrentStatus.objects.count(), 2)
+
+    def test_uptime_over_window(self):
+        start = timezone.now() - timedelta(hours=10)
+        self._log('offline', start - timedelta(hours=1))  # state carried into the window
+        self._log('operational', start + timedelta(hours=2))
+        self._log('maintenance', start + timedelta(hours=8))
+        response = self.client.get('/api/lifts/uptime/', {
+            'building_id': self.building.id, 'start': start.isoformat(), 'end': (start + timedelta(hours=9)).isoformat(),
+        })
+        lift = response.data['lifts'][0]
+        self.assertEqual(lift['seconds']['offline'], 2 * 3600)
+        self.assertEqual(lift['seconds']['operational'], 6 * 3600)
+        self.assertEqual(lift['seconds']['maintenance'], 3600)
+        self.assertEqual(lift['transitions'], 2)
+        self.assertAlmostEqual(lift['uptime_pct'], 66.667, places=3)
+
+
+class IntercomHeartbeatTests(TestCase):
+    """Heartbeats land in memory, are written through, and silent devices are swept offline."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.gate, cls.lobby = (
+            IntercomDevice.objects.create(building=cls.building, device_name=name, ip_address=f'10.0.0.{i}')
+            for i, name in enumerate(('Gate', 'Lobby'))
+        )
+
+    def setUp(self):
+        device_cache.clear()
+        heartbeats.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+
+    def test_health_answers_from_memory(self):
+        response = self.client.post('/api/intercom/heartbeat', {'device_ids': [self.gate.id, 999999]}, format='json')
+        self.assertEqual(response.data, {'received': 1, 'unknown': [999999]})
+        response = self.client.post('/api/intercom/heartbeat', {'device_ids': str(self.gate.id)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.get(f'/api/intercom/devices/health/?building_id={self.building.id}')
+        with self.assertNumQueries(0):
+            health = self.client.get(f'/api/intercom/devices/health/?building_id={self.building.id}').data
+        self.assertEqual((health['online'], health['offline']), (1, 1))
+        self.assertIsNone(IntercomDevice.objects.get(pk=self.gate.pk).last_seen_at)  # not written yet
+
+        self.assertEqual(heartbeats.flush(), 1)
+        gate = IntercomDevice.objects.get(pk=self.gate.pk)
+        self.assertTrue(gate.is_online and gate.last_seen_at is not None)
+        self.assertEqual(BuildingEvent.objects.filter(kind='device_status', action='online').count(), 1)
+
+    def test_sweeper_marks_silent_devices_offline(self):
+        heartbeats.beat_many([self.gate.id, self.lobby.id], timezone.now() - timedelta(minutes=10))
+        heartbeats.beat(self.gate.id)
+        self.assertEqual(sweep_offline_devices(), {'offline': 1})
+        self.assertFalse(IntercomDevice.objects.get(pk=self.lobby.pk).is_online)
+        self.assertTrue(IntercomDevice.objects.get(pk=self.gate.pk).is_online)
+        offline = BuildingEvent.objects.get(kind='device_status', action='offline')
+        self.assertEqual(offline.object_id, self.lobby.id)
+        self.assertEqual(sweep_offline_devices(), {'offline': 0})
+
+
+class BuildingEventStreamTests(TestCase):
+    """Stream frames carry real seqs, and residents only see their own personal payloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.ann, cls.bob = (
+            Resident.objects.create(building=cls.building, user=User.objects.create(
+                name=name, email=f'{name.lower()}@example.com', password_hash='x'))
+            for name in ('Ann', 'Bob')
+        )
+
+    def test_publish_sets_seq_without_bulk_returning(self):
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            rows = events.publish_many([
+                {'building_id': self.building.id, 'kind': 'lift_status', 'action': 'updated'} for _ in range(2)
+            ])
+        self.assertTrue(all(row.pk for row in rows))
+        self.assertEqual([f['seq'] for f in events.events_since(self.building.id, 0)[0]], [r.pk for r in rows])
+
+    def test_residents_get_a_redacted_stream(self):
+        staff = get_user_model().objects.create_user('guard', 'g@example.com', 'pw', is_staff=True)
+        ann = get_user_model().objects.create_user('ann', 'ann@example.com', 'pw')
+        self.assertEqual(events.building_viewer(staff, self.building.id), events.FULL_VIEW)
+        self.assertEqual(events.building_viewer(ann, self.building.id), self.ann.id)
+        frames = [
+            {'seq': 1, 'kind': 'notification', 'action': 'created', 'data': {'resident_id': self.ann.id}},
+            {'seq': 2, 'kind': 'notification', 'action': 'created', 'data': {'resident_id': self.bob.id}},
+            {'seq': 3, 'kind': 'emergency', 'action': 'created', 'data': {'resident_id': self.bob.id}},
+            {'seq': 4, 'kind': 'gate_event', 'action': 'created', 'data': {'actor_id': 7}},
+            {'seq': 5, 'kind': 'lift_status', 'action': 'updated', 'data': {'status': 'down'}},
+        ]
+        visible = events.visible_frames(frames, self.ann.id)
+        self.assertEqual([f['seq'] for f in visible], [1, 3, 4, 5])
+        self.assertEqual([f['data'] is None for f in visible], [False, True, True, False])
+
+
+class GateTrafficTests(TestCase):
+    """Batched gate uploads keep the hourly/daily rollups in step with the raw events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+        self.hour = timezone.localtime().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+    def _rollups(self):
+        return sorted(GateTrafficRollup.objects.values_list('period', 'bucket', 'opens', 'closes'))
+
+    def test_batch_updates_rollups(self):
+        events = [
+            {'building': self.building.id, 'event_type': 'open', 'timestamp': (self.hour + timedelta(minutes=m)).isoformat()}
+            for m in (1, 5, 59)
+        ] + [
+            {'building': self.building.id, 'event_type': 'close', 'timestamp': (self.hour + timedelta(hours=1)).isoformat()},
+            {'building': 999999, 'event_type': 'open'},
+            {'building': self.building.id, 'event_type': 'jammed'},
+        ]
+        response = self.client.post('/api/gate-events/batch/', events, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (4, 2))
+        self.assertEqual(response.data['results'][4]['error'], 'unknown building')
+        self.assertEqual(BuildingEvent.objects.filter(kind='gate_event').count(), 4)
+
+        GateEvent.objects.create(building=self.building, event_type='close')  # single-row path
+        hourly = dict(
+            (bucket, (opens, closes)) for period, bucket, opens, closes in self._rollups() if period == 'hour'
+        )
+        self.assertEqual(hourly[self.hour], (3, 0))
+        self.assertEqual(hourly[self.hour + timedelta(hours=1)], (0, 1))
+        self.assertEqual(sum(c for _, c in hourly.values()), 2)
+
+        incremental = self._rollups()
+        rebuild_rollups()
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_traffic_reads_rollups(self):
+        self.client.post('/api/gate-events/batch/', [
+            {'building': self.building.id, 'event_type': 'open', 'timestamp': (self.hour + timedelta(hours=h)).isoformat()}
+            for h in (0, 0, 0, 1)
+        ], format='json')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/gate-events/traffic/', {
+                'building_id': self.building.id, 'start': (self.hour - timedelta(hours=1)).isoformat(),
+            })
+        self.assertEqual(response.data['totals'], {'opens': 4, 'closes': 0})
+        self.assertEqual(response.data['peaks'][0]['bucket'], self.hour)
+        self.assertEqual(response.data['hour_of_day'][self.hour.hour]['total'], 3)
+        day = self.client.get('/api/gate-events/traffic/', {'building_id': self.building.id, 'period': 'day'})
+        self.assertEqual(day.data['totals']['opens'], 4)
+
+    def test_ids_without_bulk_returning_and_events_are_append_only(self):
+        batch = [{'building': self.building.id, 'event_type': 'open'}] * 2
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post('/api/gate-events/batch/', batch, format='json')
+        ids = [r['id'] for r in response.data['results']]
+        self.assertEqual(GateEvent.objects.filter(pk__in=ids).count(), 2)
+        streamed = BuildingEvent.objects.filter(kind='gate_event')
+        self.assertEqual(sorted(streamed.values_list('object_id', flat=True)), sorted(ids))
+        self.assertTrue(all(e.payload['id'] in ids for e in streamed))
+
+        url = f'/api/gate-events/{ids[0]}/'
+        self.assertEqual(self.client.patch(url, {'event_type': 'close'}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(url).status_code, 405)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class BookingConflictTests(TransactionTestCase):
+    """Overlap and capacity checks under the resource lock, including parallel requests."""
+
+    def setUp(self):
+        building = Building.objects.create(name='Tower', address='Road 1')
+        unit = Unit.objects.create(building=building, unit_number='1A')
+        self.residents = [
+            Resident.objects.create(
+                user=User.objects.create(name=f'R{i}', email=f'r{i}@example.com', password_hash='x'),
+                building=building, unit=unit,
+            ) for i in range(8)
+        ]
+        self.hall = Resource.objects.create(building=building, name='Hall', capacity=1)
+        self.gym = Resource.objects.create(building=building, name='Gym', capacity=3)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+
+    def _post(self, resident, start, hours=1, resource=None):
+        return self.client.post('/api/bookings/', {
+            'resource': (resource or self.hall).id, 'resident': resident.id,
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=hours)).isoformat(),
+        }, format='json')
+
+    def test_overlap_and_capacity(self):
+        first = self._post(self.residents[0], self.start, hours=2)
+        self.assertEqual(first.status_code, 201)
+        clash = self._post(self.residents[1], self.start + timedelta(hours=1))
+        self.assertEqual(clash.status_code, 409)
+        self.assertEqual(clash.data['conflicts'], [first.data['id']])
+        self.assertEqual(self._post(self.residents[1], self.start + timedelta(hours=2)).status_code, 201)  # back to back
+
+        # Capacity 3: two bookings that do not overlap each other leave room for a third across both
+        for resident, offset in ((0, 0), (1, 0), (2, 2)):
+            self._post(self.residents[resident], self.start + timedelta(hours=offset), hours=2, resource=self.gym)
+        self.assertEqual(self._post(self.residents[3], self.start + timedelta(hours=1), hours=2, resource=self.gym).status_code, 201)
+        self.assertEqual(self._post(self.residents[4], self.start + timedelta(hours=1), resource=self.gym).status_code, 409)
+        self.assertEqual(self._post(self.residents[0], self.start + timedelta(hours=1), resource=self.gym).status_code, 409)
+
+        Booking.objects.filter(pk=first.data['id']).update(status='cancelled')
+        self.assertEqual(self._post(self.residents[2], self.start).status_code, 201)
+
+    # SQLite ignores row locks (and its shared-cache test database cannot run parallel writers)
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_reservations_of_one_slot(self):
+        barrier = threading.Barrier(len(self.residents))
+        outcomes = []
+
+        def book(resident, resource):
+            try:
+                barrier.wait()
+                reserve(resource.id, resident.id, self.start, self.start + timedelta(hours=1))
+                outcomes.append('booked')
+            except BookingConflict:
+                outcomes.append('conflict')
+            except Exception as exc:
+                outcomes.append(repr(exc))
+            finally:
+                connection.close()
+
+        for resource, capacity in ((self.hall, 1), (self.gym, 3)):
+            outcomes.clear()
+            threads = [threading.Thread(target=book, args=(r, resource)) for r in self.residents]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sorted(outcomes), ['booked'] * capacity + ['conflict'] * (len(self.residents) - capacity))
+            self.assertEqual(Booking.objects.filter(resource=resource).count(), capacity)
+
+
+class FreeSlotSearchTests(TestCase):
+    """Free-slot search across resources, served from the per-day cache until bookings change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.residents = [
+            Resident.objects.create(
+                user=User.objects.create(name=f'R{i}', email=f'r{i}@example.com', password_hash='x'),
+                building=cls.building,
+            ) for i in range(2)
+        ]
+        cls.court_a = Resource.objects.create(building=cls.building, name='Court A', type='court')
+        cls.court_b = Resource.objects.create(building=cls.building, name='Court B', type='court', capacity=2)
+        Resource.objects.create(building=cls.building, name='Hall', type='hall')
+        cls.day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=2)
+
+    def setUp(self):
+        slot_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+
+    def _book(self, resource, start_hour, hours, resident=0):
+        start = self.day + timedelta(hours=start_hour)
+        return reserve(resource.id, self.residents[resident].id, start, start + timedelta(hours=hours))
+
+    def _search(self, **params):
+        return self.client.get('/api/resources/free-slots/', {
+            'building_id': self.building.id, 'type': 'court', 'duration': 60,
+            'start': (self.day + timedelta(hours=8)).isoformat(), 'end': (self.day + timedelta(hours=20)).isoformat(),
+            **params,
+        }).data['slots']
+
+    def _hours(self, slots, resource):
+        return [((s['start'] - self.day).total_seconds() / 3600, (s['end'] - self.day).total_seconds() / 3600)
+                for s in slots if s['resource_id'] == resource.id]
+
+    def test_gaps_across_resources(self):
+        self._book(self.court_a, 9, 2)
+        self._book(self.court_a, 11, 1)  # back to back: one busy block
+        self._book(self.court_a, 12.5, 1)  # leaves a 30 minute gap, too short
+        self._book(self.court_b, 10, 4)  # capacity 2: still free
+        slots = self._search()
+        self.assertEqual(self._hours(slots, self.court_a), [(8, 9), (13.5, 20)])
+        self.assertEqual(self._hours(slots, self.court_b), [(8, 20)])
+        self.assertEqual({s['resource_name'] for s in slots}, {'Court A', 'Court B'})
+
+    def test_cache_invalidated_by_bookings(self):
+        with self.assertNumQueries(3):  # resources, bookings, recurring rules (none, so no exceptions)
+            self._search()
+        with self.assertNumQueries(1):  # resources only; the day's free time is cached
+            self._search()
+        booking = self._book(self.court_b, 8, 12)
+        self.assertEqual(self._hours(self._search(), self.court_b), [(8, 20)])
+        self._book(self.court_b, 8, 12, resident=1)
+        self.assertEqual(self._hours(self._search(), self.court_b), [])
+        booking.delete()
+        self.assertEqual(self._hours(self._search(), self.court_b), [(8, 20)])
+
+
+class RecurringBookingTests(TestCase):
+    """Recurring bookings are one row, expanded per window, and take part in conflict checks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name='Tower', address='Road 1')
+        cls.gym = Resource.objects.create(building=cls.building, name='Gym', type='gym')
+        cls.residents = [
+            Resident.objects.create(
+                user=User.objects.create(name=f'R{i}', email=f'r{i}@example.com', password_hash='x'),
+                building=cls.building,
+            ) for i in range(2)
+        ]
+        today = timezone.localtime().replace(hour=18, minute=0, second=0, microsecond=0)
+        cls.monday = today + timedelta(days=7 - today.weekday())  # next week's Monday, 18:00
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('ops', 'ops@example.com', 'pw'))
+        # Mondays and Wednesdays, 18:00-19:00, since two years ago and open-ended
+        first = self.monday - timedelta(weeks=104)
+        response = self.client.post('/api/recurring-bookings/', {
+            'resource': self.gym.id, 'resident': self.residents[0].id, 'frequency': 'weekly', 'weekdays': '3,1',
+            'start_time': first.isoformat(), 'end_time': (first + timedelta(hours=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.rule_id = response.data['id']
+
+    def _occurrences(self, url=None, start='start', end='end'):
+        url = url or f'/api/recurring-bookings/{self.rule_id}/occurrences/'
+        response = self.client.get(url, {
+            start: self.monday.isoformat(), end: (self.monday + timedelta(weeks=1)).isoformat(),
+        })
+        return [(o['start_time'], o['moved']) for o in response.data['occurrences']]
+
+    def _book(self, start, resident=1):
+        return self.client.post('/api/bookings/', {
+            'resource': self.gym.id, 'resident': self.residents[resident].id,
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat(),
+        }, format='json')
+
+    def test_exception_changes_invalidate_cached_slots(self):
+        rule = RecurringBooking.objects.get(pk=self.rule_id)
+        key = (self.gym.id, self.monday.date())
+        for _ in range(2):  # created with the rule at hand, then updated from a fetched row
+            slot_cache.set_many({key: []})
+            cancel_occurrence(rule, self.monday)
+            self.assertEqual(slot_cache.get_many([key]), {})
+
+    def test_bad_datetimes_are_rejected(self):
+        base = f'/api/recurring-bookings/{self.rule_id}'
+        for url, data in (
+            (f'{base}/occurrences/', {'start': '2026-02-30'}),
+            (f'{base}/occurrences/', {'end': 'soon'}),
+            (f'/api/resources/{self.gym.id}/availability/', {'start_from': '2026-13-01T00:00'}),
+            ('/api/resources/free-slots/', {'building_id': self.building.id, 'start': '2026-02-30T10:00'}),
+            ('/api/lifts/uptime/', {'building_id': self.building.id, 'end': '2026-13-01'}),
+            ('/api/gate-events/traffic/', {'building_id': self.building.id, 'start': 'yesterday'}),
+        ):
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('ISO 8601', response.data['detail'])
+        response = self.client.post(f'{base}/cancel-occurrence/', {'occurrence_start': '2026-02-30T18:00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'{base}/move-occurrence/', {
+            'occurrence_start': self.monday.isoformat(), 'start_time': 17, 'end_time': '2026-01-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_expanded_lazily_within_window(self):
+        wednesday = self.monday + timedelta(days=2)
+        self.assertEqual(self._occurrences(), [(self.monday, False), (wednesday, False)])
+        availability = self._occurrences(f'/api/resources/{self.gym.id}/availability/', 'start_from', 'end_to')
+        self.assertEqual(availability, [(self.monday, False), (wednesday, False)])
+        self.assertEqual((RecurringBooking.objects.count(), Booking.objects.count()), (1, 0))
+
+    def test_occurrences_conflict_with_single_bookings(self):
+        clash = self._book(self.monday + timedelta(minutes=30))
+        self.assertEqual(clash.status_code, 409)
+        self.assertEqual(clash.data['recurring_conflicts'], [{'recurrence_id': self.rule_id, 'start': self.monday}])
+
+        url = f'/api/recurring-bookings/{self.rule_id}/'
+        self.client.post(url + 'cancel-occurrence/', {'occurrence_start': self.monday.isoformat()}, format='json')
+        self.assertEqual(self._book(self.monday + timedelta(minutes=30)).status_code, 201)
+
+        # Move Wednesday's occurrence onto the new booking: refused; to Thursday: fine
+        wednesday = self.monday + timedelta(days=2)
+        move = {'occurrence_start': wednesday.isoformat(), 'start_time': (self.monday + timedelta(minutes=15)).isoformat(),
+                'end_time': (self.monday + timedelta(minutes=75)).isoformat()}
+        self.assertEqual(self.client.post(url + 'move-occurrence/', move, format='json').status_code, 409)
+        thursday = wednesday + timedelta(days=1)
+        move.update(start_time=thursday.isoformat(), end_time=(thursday + timedelta(hours=1)).isoformat())
+        self.assertEqual(self.client.post(url + 'move-occurrence/', move, format='json').status_code, 200)
+        self.assertEqual(self._occurrences(), [(thursday, True)])
+        self.assertEqual(self._book(wednesday).status_code, 201)
+
+        bad = {'occurrence_start': (wednesday + timedelta(minutes=5)).isoformat()}
+        self.assertEqual(self.client.post(url + 'cancel-occurrence/', bad, format='json').status_code, 400)
+
+    def test_new_rule_checked_against_existing_bookings(self):
+        self._book(self.monday + timedelta(weeks=3, days=1))  # a Tuesday a few weeks out
+        start = self.monday + timedelta(days=1)
+        response = self.client.post('/api/recurring-bookings/', {
+            'resource': self.gym.id, 'resident': self.residents[1].id, 'frequency': 'weekly',
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.data['conflicts']), 1)
+
+
+class VendorNearbyTests(TestCase):
+    """Grid-cell lookups must find exactly what a full scan within the radius would, nearest first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Plumbing')
+        other = Service.objects.create(name='Electrical')
+        cls.origin = (23.049990, 90.049990)  # just below a cell corner on both axes
+        cls.vendors = {}
+        for name, lat, lng in [
+            ('corner', '23.050010', '90.050010'),  # diagonal neighbour cell, a few metres away
+            ('north', '23.070000', '90.049990'),   # ~2.2 km
+            ('south', '23.010000', '90.049990'),   # ~4.4 km
+            ('edge', '23.049990', '90.098000'),    # ~4.9 km east, two cells over
+            ('outside', '23.049990', '90.110000'),  # ~6.1 km
+        ]:
+            cls.vendors[name] = Vendor.objects.create(service=cls.service, name=name, latitude=lat, longitude=lng)
+        Vendor.objects.create(service=other, name='other service', latitude='23.049990', longitude='90.049990')
+        Vendor.objects.create(service=cls.service, name='no coordinates')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('u', 'u@example.com', 'pw'))
+
+    def _names(self, hits):
+        names = dict(Vendor.objects.values_list('pk', 'name'))
+        return [names[pk] for _, pk in hits]
+
+    def test_radius_filter_and_order_across_cell_boundaries(self):
+        qs = Vendor.objects.filter(service=self.service)
+        hits = geo.nearby(qs, *self.origin, 5)
+        self.assertEqual(self._names(hits), ['corner', 'north', 'south', 'edge'])
+        self.assertEqual([d for d, _ in hits], sorted(d for d, _ in hits))
+        self.assertTrue(all(d <= 5 for d, _ in hits))
+        self.assertEqual(self._names(geo.nearby(qs, *self.origin, 1)), ['corner'])
+        self.assertEqual(self._names(geo.nearby(qs, *self.origin, 7))[-1], 'outside')
+
+    def test_antimeridian(self):
+        east = Vendor.objects.create(service=self.service, name='east', latitude='10.000000', longitude='179.999000')
+        west = Vendor.objects.create(service=self.service, name='west', latitude='10.000000', longitude='-179.999000')
+        hits = geo.nearby(Vendor.objects.filter(service=self.service), 10.0, 179.9995, 1)
+        self.assertEqual([pk for _, pk in hits], [east.pk, west.pk])
+
+    def test_moving_vendor_changes_cell(self):
+        qs = Vendor.objects.filter(service=self.service)
+        vendor = self.vendors['outside']
+        old_cell = (vendor.lat_cell, vendor.lng_cell)
+        vendor.latitude, vendor.longitude = Decimal('23.049000'), Decimal('90.049000')
+        vendor.save(update_fields=['latitude', 'longitude'])
+        vendor.refresh_from_db()
+        self.assertNotEqual((vendor.lat_cell, vendor.lng_cell), old_cell)
+        self.assertEqual((vendor.lat_cell, vendor.lng_cell), geo.geo_cell(vendor.latitude, vendor.longitude))
+        self.assertIn('outside', self._names(geo.nearby(qs, *self.origin, 1)))
+
+        vendor.latitude = Decimal('24.000000')
+        vendor.save()
+        self.assertNotIn('outside', self._names(geo.nearby(qs, *self.origin, 50)))
+        self.assertIn('outside', self._names(geo.nearby(qs, 24.0, 90.049, 1)))
+
+    def test_endpoint_limit_and_offset(self):
+        params = {'service_id': self.service.id, 'lat': self.origin[0], 'lng': self.origin[1], 'radius_km': 5}
+        response = self.client.get('/api/vendors/nearby/', {**params, 'limit': 2, 'offset': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['limit'], response.data['offset']), (4, 2, 1))
+        self.assertEqual([r['name'] for r in response.data['results']], ['north', 'south'])
+        self.assertLess(response.data['results'][0]['distance_km'], response.data['results'][1]['distance_km'])
+
+        response = self.client.get('/api/vendors/nearby/', {**params, 'offset': 10})
+        self.assertEqual((response.data['count'], response.data['results']), (4, []))
+        response = self.client.get('/api/vendors/nearby/', {**params, 'limit': 0})
+        self.assertEqual(response.data['limit'], 1)
+        self.assertEqual(self.client.get('/api/vendors/nearby/', {**params, 'limit': 'x'}).status_code, 400)
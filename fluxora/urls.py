@@ -2,6 +2,7 @@
 
 from django.urls import path
 
+from .sse import building_events_sse, chat_sse
 from .views import (
     # Simple HTML pages
     home, login_view, logout_view, signup_view,
@@ -19,11 +20,11 @@ from .views import (
     StaffViewSet, AttendanceViewSet,
     AppointmentViewSet, VisitorViewSet,
     TicketViewSet, TicketImageViewSet,
-    ResourceViewSet, BookingViewSet,
+    ResourceViewSet, BookingViewSet, RecurringBookingViewSet,
     PollViewSet, OptionViewSet, VoteViewSet,
     DocumentViewSet, DocumentACLUserViewSet, DocumentACLRoleViewSet, DocumentAuditLogViewSet,
     EmergencyViewSet,
-    IntercomDeviceViewSet, IntercomLogViewSet, IntercomWebhookView,
+    IntercomDeviceViewSet, IntercomLogViewSet, IntercomHeartbeatView, IntercomWebhookView,
     ChatRoomViewSet, RoomMemberViewSet, MessageViewSet,
     ListingViewSet, RentalRequestViewSet, ContractViewSet,
     UtilityMeterViewSet, UtilityBillViewSet,
@@ -35,6 +36,7 @@ from .views import (
     ParkingSlotViewSet, VehicleViewSet,
     MLModelViewSet, MLTrainingRunViewSet, MLCityPriceCacheViewSet, PriceEstimateAPIView,
     ActivityLogViewSet, BuildingSettingViewSet, AdminOverviewAPIView,
+    BillingJobViewSet, ChatInboxAPIView, ChatMetricsAPIView,
 )
 
 # Helper: make list/detail views for a ViewSet
@@ -217,7 +219,7 @@ asset_maintenance_detail = make_detail(AssetMaintenanceViewSet)
 
 # Gate & Lift
 gate_events_list = make_list(GateEventViewSet)
-gate_events_detail = make_detail(GateEventViewSet)
+gate_events_detail = GateEventViewSet.as_view({'get': 'retrieve'})
 
 lift_status_list = make_list(LiftStatusLogViewSet)
 lift_status_detail = make_detail(LiftStatusLogViewSet)
@@ -228,6 +230,7 @@ waste_schedules_detail = make_detail(WasteScheduleViewSet)
 
 notifications_list = make_list(NotificationViewSet)
 notifications_detail = make_detail(NotificationViewSet)
+notifications_broadcast = NotificationViewSet.as_view({'post': 'broadcast'})
 
 # Events & Community
 events_list = make_list(EventViewSet)
@@ -327,10 +330,16 @@ urlpatterns += [
 
     # Resources & Bookings
     path('api/resources/', make_list(ResourceViewSet), name='resources-list'),
+    path('api/resources/free-slots/', ResourceViewSet.as_view({'get': 'free_slots'}), name='resource-free-slots'),
     path('api/resources/<int:pk>/', make_detail(ResourceViewSet), name='resources-detail'),
     path('api/resources/<int:pk>/availability/', ResourceViewSet.as_view({'get': 'availability'}), name='resource-availability'),
     path('api/bookings/', make_list(BookingViewSet), name='bookings-list'),
     path('api/bookings/<int:pk>/', make_detail(BookingViewSet), name='bookings-detail'),
+    path('api/recurring-bookings/', make_list(RecurringBookingViewSet), name='recurring-bookings-list'),
+    path('api/recurring-bookings/<int:pk>/', make_detail(RecurringBookingViewSet), name='recurring-bookings-detail'),
+    path('api/recurring-bookings/<int:pk>/occurrences/', RecurringBookingViewSet.as_view({'get': 'occurrences'}), name='recurring-booking-occurrences'),
+    path('api/recurring-bookings/<int:pk>/cancel-occurrence/', RecurringBookingViewSet.as_view({'post': 'cancel_occurrence'}), name='recurring-booking-cancel-occurrence'),
+    path('api/recurring-bookings/<int:pk>/move-occurrence/', RecurringBookingViewSet.as_view({'post': 'move_occurrence'}), name='recurring-booking-move-occurrence'),
 
     # Polls & Surveys
     path('api/polls/', make_list(PollViewSet), name='polls-list'),
@@ -361,17 +370,26 @@ urlpatterns += [
     # Intercom
     path('api/intercom/devices/', make_list(IntercomDeviceViewSet), name='intercom-devices-list'),
     path('api/intercom/devices/<int:pk>/', make_detail(IntercomDeviceViewSet), name='intercom-devices-detail'),
+    path('api/intercom/devices/health/', IntercomDeviceViewSet.as_view({'get': 'health'}), name='intercom-devices-health'),
     path('api/intercom/logs/', make_list(IntercomLogViewSet), name='intercom-logs-list'),
     path('api/intercom/logs/<int:pk>/', make_detail(IntercomLogViewSet), name='intercom-logs-detail'),
     path('api/intercom/webhook', IntercomWebhookView.as_view(), name='intercom-webhook'),
+    path('api/intercom/heartbeat', IntercomHeartbeatView.as_view(), name='intercom-heartbeat'),
 
     # Chat
     path('api/chat/rooms/', make_list(ChatRoomViewSet), name='chat-rooms-list'),
     path('api/chat/rooms/<int:pk>/', make_detail(ChatRoomViewSet), name='chat-rooms-detail'),
+    path('api/chat/rooms/<int:pk>/read/', ChatRoomViewSet.as_view({'post': 'read'}), name='chat-rooms-read'),
+    path('api/chat/inbox/', ChatInboxAPIView.as_view(), name='chat-inbox'),
     path('api/chat/members/', make_list(RoomMemberViewSet), name='chat-members-list'),
     path('api/chat/members/<int:pk>/', make_detail(RoomMemberViewSet), name='chat-members-detail'),
     path('api/chat/messages/', make_list(MessageViewSet), name='chat-messages-list'),
     path('api/chat/messages/<int:pk>/', make_detail(MessageViewSet), name='chat-messages-detail'),
+    path('api/chat/metrics/', ChatMetricsAPIView.as_view(), name='chat-metrics'),
+
+    # Server-Sent Events (fallback for deployments without Channels)
+    path('api/sse/buildings/<int:building_id>/events/', building_events_sse, name='sse-building-events'),
+    path('api/sse/chat/<int:room_id>/', chat_sse, name='sse-chat'),
 
     # Rental
     path('api/listings/', make_list(ListingViewSet), name='listings-list'),
@@ -388,6 +406,11 @@ urlpatterns += [
     path('api/utility-bills/<int:pk>/', make_detail(UtilityBillViewSet), name='utility-bills-detail'),
     path('api/utility-bills/generate/', UtilityBillViewSet.as_view({'post': 'generate'}), name='utility-bills-generate'),
 
+    # Background jobs
+    path('api/billing-jobs/', BillingJobViewSet.as_view({'get': 'list'}), name='billing-jobs-list'),
+    path('api/billing-jobs/<int:pk>/', BillingJobViewSet.as_view({'get': 'retrieve'}), name='billing-jobs-detail'),
+    path('api/billing-jobs/<int:pk>/resume/', BillingJobViewSet.as_view({'post': 'resume'}), name='billing-job-resume'),
+
     # Assets
     path('api/assets/', make_list(AssetViewSet), name='assets-list'),
     path('api/assets/<int:pk>/', make_detail(AssetViewSet), name='assets-detail'),
@@ -396,14 +419,19 @@ urlpatterns += [
 
     # Gate & Lift
     path('api/gate-events/', make_list(GateEventViewSet), name='gate-events-list'),
-    path('api/gate-events/<int:pk>/', make_detail(GateEventViewSet), name='gate-events-detail'),
+    path('api/gate-events/batch/', GateEventViewSet.as_view({'post': 'batch'}), name='gate-events-batch'),
+    path('api/gate-events/traffic/', GateEventViewSet.as_view({'get': 'traffic'}), name='gate-events-traffic'),
+    path('api/gate-events/<int:pk>/', GateEventViewSet.as_view({'get': 'retrieve'}), name='gate-events-detail'),
     path('api/lifts/status/', make_list(LiftStatusLogViewSet), name='lift-status-list'),
     path('api/lifts/status/<int:pk>/', make_detail(LiftStatusLogViewSet), name='lift-status-detail'),
+    path('api/lifts/current/', LiftStatusLogViewSet.as_view({'get': 'current'}), name='lift-status-current'),
+    path('api/lifts/uptime/', LiftStatusLogViewSet.as_view({'get': 'uptime'}), name='lift-status-uptime'),
 
     # Waste & Notifications
     path('api/waste-schedules/', make_list(WasteScheduleViewSet), name='waste-schedules-list'),
     path('api/waste-schedules/<int:pk>/', make_detail(WasteScheduleViewSet), name='waste-schedules-detail'),
     path('api/notifications/', make_list(NotificationViewSet), name='notifications-list'),
+    path('api/notifications/broadcast/', NotificationViewSet.as_view({'post': 'broadcast'}), name='notifications-broadcast'),
     path('api/notifications/<int:pk>/', make_detail(NotificationViewSet), name='notifications-detail'),
 
     # Events & Community
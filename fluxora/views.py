@@ -1,16 +1,18 @@
 from django.shortcuts import get_object_or_404, render, redirect
 from django.core.files.storage import default_storage
-from django.db.models import Count, Sum
-from django.utils.timezone import now
+from django.db.models import Count, F
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.conf import settings
 from django.utils.http import url_has_allowed_host_and_scheme
-import math
 import re
+from datetime import datetime, timedelta
 
-from rest_framework import serializers, viewsets, permissions, status
+from rest_framework import mixins, serializers, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -31,7 +33,7 @@ from .models import (
     # Tickets
     Ticket, TicketImage,
     # Resources & Bookings
-    Resource, Booking,
+    Resource, Booking, RecurringBooking,
     # Polls & Surveys
     Poll, Option, Vote,
     # Documents
@@ -49,7 +51,7 @@ from .models import (
     # Assets
     Asset, AssetMaintenance,
     # Gate & Lift
-    GateEvent, LiftStatusLog,
+    GateEvent, LiftStatusLog, RollupPeriod,
     # Waste & Notifications
     WasteSchedule, Notification,
     # Events & Community
@@ -62,8 +64,27 @@ from .models import (
     MLModel, MLTrainingRun, MLCityPriceCache,
     # Activity & Settings
     ActivityLog, BuildingSetting,
+    # Background jobs
+    BillingJob, BillingJobType, JobStatus,
+    # Dashboard rollups
+    BuildingStats,
+    # Notification outbox
+    OutboxChannel,
 )
-from .permissions import IsCommitteeOrAdmin
+from .fastpath import FastListMixin
+from .filters import sparse_fieldset
+from .pagination import KeysetPagination
+from .permissions import IsCommitteeOrAdmin, IsCommitteeOrAdminOnly
+from .services.roles import has_admin_role
+from .tasks import dispatch_notifications, enqueue, run_billing_job
+from .services import bookings, gates, geo, intercom, lifts, recurrence, stats
+from .services.billing import requeue_billing_job
+from .services.chat import chat_resident_id, mark_read, message_buffer, room_history, ws_counters
+from .services.dispatcher import enqueue_notification
+from .services.pubsub import hub
+
+NEARBY_DEFAULT_LIMIT = 50
+NEARBY_MAX_LIMIT = 500
 
 # ========= Simple HTML views =========
 
@@ -151,10 +172,32 @@ def services_directory_page(request):
 # ========= Serializers =========
 
 class AutoModelSerializer(serializers.ModelSerializer):
+    """
+    ``fields='__all__'`` serializer with sparse fieldsets for reads.
+
+    ``?fields=a,b`` keeps only those fields and ``?omit=c`` drops fields from the top-level
+    objects of a GET response; ``SparseFieldsetFilter`` narrows the queryset to match.
+    """
     class Meta:
         model = None
         fields = '__all__'
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        wanted, omitted = sparse_fieldset(self.context.get('request'))
+        if wanted:
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        for name in omitted:
+            fields.pop(name, None)
+        return fields
+
+    def _is_top_level(self):
+        # The response object itself (or an item of a top-level list), not a nested serializer
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
 
 # Core
 class UserSerializer(AutoModelSerializer):
@@ -279,6 +322,40 @@ class BookingSerializer(AutoModelSerializer):
     class Meta(AutoModelSerializer.Meta):
         model = Booking
 
+    def validate(self, attrs):
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({'end_time': 'Must be after start_time.'})
+        return attrs
+
+
+class RecurringBookingSerializer(BookingSerializer):
+    class Meta(AutoModelSerializer.Meta):
+        model = RecurringBooking
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Must be at least 1.')
+        return value
+
+    def validate_weekdays(self, value):
+        days = [day.strip() for day in (value or '').split(',') if day.strip()]
+        if any(day not in '1234567' or len(day) != 1 for day in days):
+            raise serializers.ValidationError('Comma-separated ISO weekdays (1 = Monday ... 7 = Sunday).')
+        return ','.join(sorted(set(days)))
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        until = attrs.get('until', getattr(self.instance, 'until', None))
+        if start and end and end - start > recurrence.MAX_OCCURRENCE:
+            raise serializers.ValidationError({'end_time': 'Occurrences may be at most a day long.'})
+        if start and until and until <= start:
+            raise serializers.ValidationError({'until': 'Must be after start_time.'})
+        return attrs
+
 
 # Polls
 class OptionSerializer(AutoModelSerializer):
@@ -479,25 +556,28 @@ class BuildingSettingSerializer(AutoModelSerializer):
         model = BuildingSetting
 
 
+# Background jobs
+class BillingJobSerializer(AutoModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta(AutoModelSerializer.Meta):
+        model = BillingJob
+        field_sources = {'progress': ('status', 'processed', 'total')}
+
+    def get_progress(self, obj):
+        if not obj.total:
+            return 100.0 if obj.status == JobStatus.COMPLETED else 0.0
+        return round(100.0 * obj.processed / obj.total, 1)
+
+
 # ========= Permissions (simple defaults) =========
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        # Allow Django staff/superusers
-        user = getattr(request, 'user', None)
-        if user and user.is_authenticated and (getattr(user, 'is_staff', False) or getattr(user, 'is_superuser', False)):
-            return True
-        # Fallback: map Django user -> business user by email and check role
-        try:
-            if user and user.is_authenticated and getattr(user, 'email', None):
-                bu = User.objects.filter(email=user.email).first()
-                if bu and bu.role in ('admin', 'committee'):
-                    return True
-        except Exception:
-            pass
-        return False
+        # Django staff/superusers, or business user (mapped by email) with admin/committee role
+        return has_admin_role(request)
 
 
 # ========= ViewSets & APIs =========
@@ -559,24 +639,22 @@ class VendorViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             return Response({'detail': 'service_id, lat, lng are required'}, status=400)
 
-        # Simple Haversine computation (approx)
-        def haversine(lat1, lon1, lat2, lon2):
-            R = 6371.0
-            phi1, phi2 = math.radians(lat1), math.radians(lat2)
-            dphi = math.radians(lat2 - lat1)
-            dlambda = math.radians(lon2 - lon1)
-            a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-            return 2 * R * math.asin(math.sqrt(a))
-
-        candidates = Vendor.objects.filter(service_id=service_id, latitude__isnull=False, longitude__isnull=False)
-        results = []
-        for v in candidates:
-            d = haversine(lat, lng, float(v.latitude), float(v.longitude))
-            if d <= radius_km:
-                results.append((d, v))
-        results.sort(key=lambda x: x[0])
-        data = VendorSerializer([v for _, v in results], many=True).data
-        return Response({'count': len(data), 'results': data})
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', NEARBY_DEFAULT_LIMIT)), NEARBY_MAX_LIMIT))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except (TypeError, ValueError):
+            return Response({'detail': 'limit and offset must be integers'}, status=400)
+
+        # Grid-cell + bounding-box prefilter in SQL, exact distance for the candidates only
+        hits = geo.nearby(Vendor.objects.filter(service_id=service_id), lat, lng, radius_km)
+        page = hits[offset:offset + limit]
+        vendors = Vendor.objects.select_related('service', 'building').in_bulk([pk for _, pk in page])
+        data = []
+        for distance, pk in page:
+            row = VendorSerializer(vendors[pk]).data
+            row['distance_km'] = round(distance, 3)
+            data.append(row)
+        return Response({'count': len(hits), 'limit': limit, 'offset': offset, 'results': data})
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -592,7 +670,7 @@ class BillTypeViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsCommitteeOrAdmin]
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all().select_related('resident', 'building', 'bill_type')
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -627,34 +705,20 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         if not all([building_id, bill_type_id, billing_month, due_date]):
             return Response({'detail': 'building_id, bill_type_id, billing_month, due_date required'}, status=400)
 
-        residents = Resident.objects.filter(building_id=building_id)
-        created = []
-        for r in residents:
-            inv = Invoice.objects.create(
-                invoice_number=f"AUTO-{r.id}-{billing_month.replace('-', '')}",
-                resident=r,
-                building_id=building_id,
-                bill_type_id=bill_type_id,
-                amount=0,
-                due_date=due_date,
-                status='pending'
-            )
-            # Example fixed line; replace with your business rules:
-            InvoiceItem.objects.create(invoice=inv, description='Monthly Service Charge', quantity=1, unit_price=2000, tax_amount=0, total_amount=2000)
-            total = inv.items.aggregate(s=Sum('total_amount'))['s'] or 0
-            # Optionally include utilities:
-            if include_utilities:
-                # Attach latest unpaid utility bills for this resident's unit
-                if r.unit_id:
-                    meters = UtilityMeter.objects.filter(unit_id=r.unit_id)
-                    bills = UtilityBill.objects.filter(meter__in=meters, status='pending')
-                    for b in bills:
-                        InvoiceItem.objects.create(invoice=inv, description=f'Utility {b.meter.type} {b.reading_date}', quantity=1, unit_price=b.amount, tax_amount=0, total_amount=b.amount, utility_bill_id=b.id)
-                    total = inv.items.aggregate(s=Sum('total_amount'))['s'] or total
-            inv.amount = total
-            inv.save()
-            created.append(inv.id)
-        return Response({'created_invoices': created}, status=201)
+        job = BillingJob.objects.create(
+            job_type=BillingJobType.MONTHLY_INVOICES,
+            building_id=building_id,
+            params_json={
+                'bill_type_id': bill_type_id,
+                'billing_month': billing_month,
+                'due_date': due_date,
+                'include_utilities': include_utilities,
+            },
+        )
+        # If the broker is down the job stays queued and the sweeper dispatches it later
+        enqueue(run_billing_job, job.id)
+        job.refresh_from_db()
+        return Response(BillingJobSerializer(job).data, status=202)
 
     @action(detail=True, methods=['post'])
     def remind(self, request, pk=None):
@@ -751,7 +815,7 @@ class VisitorViewSet(viewsets.ModelViewSet):
 
 
 # Tickets
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.all().select_related('building', 'resident', 'assigned_to', 'service_vendor')
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -783,15 +847,39 @@ class ResourceViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def availability(self, request, pk=None):
         resource = self.get_object()
-        start_from = request.query_params.get('start_from')
-        end_to = request.query_params.get('end_to')
+        start_from = _parse_when(request.query_params.get('start_from'), 'start_from')
+        end_to = _parse_when(request.query_params.get('end_to'), 'end_to')
         qs = Booking.objects.filter(resource=resource)
         if start_from:
             qs = qs.filter(end_time__gte=start_from)
         if end_to:
             qs = qs.filter(start_time__lte=end_to)
         data = BookingSerializer(qs.order_by('start_time'), many=True).data
-        return Response({'resource_id': resource.id, 'bookings': data})
+        # Recurring bookings are expanded for the window only (default: the next 30 days)
+        window_start = start_from or now()
+        window_end = end_to or window_start + timedelta(days=30)
+        occurrences = recurrence.resource_occurrences([resource.id], window_start, window_end)[resource.id]
+        return Response({
+            'resource_id': resource.id, 'bookings': data,
+            'occurrences': [_occurrence_data(occ) for occ in occurrences],
+        })
+
+    @action(detail=False, methods=['get'], url_path='free-slots')
+    def free_slots(self, request):
+        # Open intervals of ?duration= minutes across a building's resources (optionally one ?type=)
+        try:
+            building_id = int(request.query_params.get('building_id'))
+            duration = timedelta(minutes=int(request.query_params.get('duration', 60)))
+        except (TypeError, ValueError):
+            return Response({'detail': 'building_id is required and duration must be minutes'}, status=400)
+        start = _parse_when(request.query_params.get('start'), 'start') or now()
+        end = _parse_when(request.query_params.get('end'), 'end') or start + timedelta(days=1)
+        if start >= end or duration <= timedelta(0):
+            return Response({'detail': 'start must be before end and duration positive'}, status=400)
+        if end - start > timedelta(days=bookings.MAX_SEARCH_DAYS):
+            return Response({'detail': f'Search at most {bookings.MAX_SEARCH_DAYS} days at a time'}, status=400)
+        slots = bookings.find_free_slots(building_id, start, end, duration, request.query_params.get('type'))
+        return Response({'building_id': building_id, 'start': start, 'end': end, 'slots': slots})
 
 
 class BookingViewSet(viewsets.ModelViewSet):
@@ -799,6 +887,109 @@ class BookingViewSet(viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_create(self, serializer):
+        serializer.instance = self._reserve(dict(serializer.validated_data))
+
+    def perform_update(self, serializer):
+        booking = serializer.instance
+        data = {
+            'resource': booking.resource, 'resident': booking.resident, 'start_time': booking.start_time,
+            'end_time': booking.end_time, 'status': booking.status, **serializer.validated_data,
+        }
+        if data['status'] not in bookings.ACTIVE_STATUSES:
+            serializer.save()  # cancelling never conflicts
+        else:
+            serializer.instance = self._reserve(data, booking)
+
+    def _reserve(self, data, booking=None):
+        return bookings.reserve(
+            data.pop('resource').pk, data.pop('resident').pk, data.pop('start_time'), data.pop('end_time'),
+            booking=booking, **data,
+        )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, bookings.BookingConflict):
+            return _conflict_response(exc)
+        return super().handle_exception(exc)
+
+
+class RecurringBookingViewSet(viewsets.ModelViewSet):
+    queryset = RecurringBooking.objects.all().select_related('resource', 'resident')
+    serializer_class = RecurringBookingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.instance = bookings.reserve_recurring(RecurringBooking(**serializer.validated_data))
+
+    def perform_update(self, serializer):
+        rule = serializer.instance
+        for name, value in serializer.validated_data.items():
+            setattr(rule, name, value)
+        if rule.status not in bookings.ACTIVE_STATUSES:
+            rule.save()  # cancelling never conflicts
+        else:
+            bookings.reserve_recurring(rule)
+
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        # Occurrences in ?start=&end= (default: the next 30 days) with cancellations and moves applied
+        rule = self.get_object()
+        start = _parse_when(request.query_params.get('start'), 'start') or now()
+        end = _parse_when(request.query_params.get('end'), 'end') or start + timedelta(days=30)
+        if start >= end or end - start > timedelta(days=366):
+            return Response({'detail': 'start must be before end, at most a year apart'}, status=400)
+        return Response({
+            'recurrence_id': rule.id, 'start': start, 'end': end,
+            'occurrences': [_occurrence_data(occ) for occ in recurrence.rule_occurrences(rule, start, end)],
+        })
+
+    @action(detail=True, methods=['post'], url_path='cancel-occurrence')
+    def cancel_occurrence(self, request, pk=None):
+        rule = self.get_object()
+        original = _parse_when(request.data.get('occurrence_start'), 'occurrence_start')
+        if original is None:
+            return Response({'detail': 'occurrence_start is required'}, status=400)
+        try:
+            bookings.cancel_occurrence(rule, original)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=400)
+        return Response({'recurrence_id': rule.id, 'occurrence_start': original, 'action': 'cancelled'})
+
+    @action(detail=True, methods=['post'], url_path='move-occurrence')
+    def move_occurrence(self, request, pk=None):
+        rule = self.get_object()
+        original = _parse_when(request.data.get('occurrence_start'), 'occurrence_start')
+        start = _parse_when(request.data.get('start_time'), 'start_time')
+        end = _parse_when(request.data.get('end_time'), 'end_time')
+        if not (original and start and end):
+            return Response({'detail': 'occurrence_start, start_time and end_time are required'}, status=400)
+        try:
+            bookings.move_occurrence(rule, original, start, end)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=400)
+        return Response({
+            'recurrence_id': rule.id, 'occurrence_start': original, 'action': 'moved',
+            'start_time': start, 'end_time': end,
+        })
+
+    def handle_exception(self, exc):
+        if isinstance(exc, bookings.BookingConflict):
+            return _conflict_response(exc)
+        return super().handle_exception(exc)
+
+
+def _conflict_response(exc):
+    return Response(
+        {'detail': str(exc), 'conflicts': exc.conflicts, 'recurring_conflicts': exc.recurring}, status=409,
+    )
+
+
+def _occurrence_data(occ):
+    return {
+        'recurrence_id': occ.recurrence_id, 'resident': occ.resident_id, 'start_time': occ.start,
+        'end_time': occ.end, 'occurrence_start': occ.original_start, 'moved': occ.moved,
+    }
+
 
 # Polls
 class PollViewSet(viewsets.ModelViewSet):
@@ -892,6 +1083,9 @@ class DocumentAuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = DocumentAuditLog.objects.all().select_related('document', 'user')
     serializer_class = DocumentAuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering_field = 'event_time'
+    include_archived = True
 
 
 # SOS
@@ -907,24 +1101,73 @@ class IntercomDeviceViewSet(viewsets.ModelViewSet):
     serializer_class = IntercomDeviceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def health(self, request):
+        # Online/offline per device of a building, answered from the in-memory heartbeat map
+        try:
+            building_id = int(request.query_params.get('building_id'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'building_id is required'}, status=400)
+        return Response(intercom.heartbeats.health(building_id))
+
 
 class IntercomLogViewSet(viewsets.ModelViewSet):
     queryset = IntercomLog.objects.all().select_related('device')
     serializer_class = IntercomLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    include_archived = True
+
+
+class IntercomHeartbeatView(APIView):
+    """Device liveness pings: ``{"device_id": N}`` or ``{"device_ids": [...]}``. Memory only; written through periodically."""
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        raw = data.get('device_ids', [data.get('device_id')])
+        if not isinstance(raw, list):
+            return Response({'detail': 'device_ids must be a list of integers'}, status=400)
+        try:
+            device_ids = {int(device_id) for device_id in raw}
+        except (TypeError, ValueError):
+            return Response({'detail': 'device_id must be an integer'}, status=400)
+        if len(device_ids) > intercom.MAX_BATCH:
+            return Response({'detail': f'At most {intercom.MAX_BATCH} devices per request'}, status=400)
+        known = intercom.device_cache.resolve(device_ids)
+        intercom.heartbeats.beat_many(known)
+        unknown = sorted(device_ids - set(known))
+        if unknown and not known:
+            return Response({'detail': 'unknown device', 'unknown': unknown}, status=404)
+        return Response({'received': len(known), 'unknown': unknown})
 
 
 class IntercomWebhookView(APIView):
+    """
+    Device events: one object per request, or a batch as a JSON array (or ``{"events": [...]}``).
+
+    A batch answers with one result per event (201 when all were stored, 207 when only some
+    were, 400 when none were); a single event keeps the ``{"id": N}`` / 404 contract.
+    """
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        device_id = request.data.get('device_id')
-        event_type = request.data.get('event_type')
-        timestamp = request.data.get('timestamp')  # optional
-        details = request.data.get('details')
-        device = get_object_or_404(IntercomDevice, pk=device_id)
-        log = IntercomLog.objects.create(device=device, event_type=event_type, details=details)
-        return Response({'id': log.id}, status=201)
+        data = request.data
+        if isinstance(data, dict) and 'events' not in data:
+            result = intercom.ingest_events([data])[0]
+            if result['status'] == 'created':
+                return Response({'id': result['id']}, status=201)
+            return Response({'detail': result['error']}, status=404 if result['error'] == 'unknown device' else 400)
+
+        events = data.get('events') if isinstance(data, dict) else data
+        if not isinstance(events, list):
+            return Response({'detail': 'Expected an event object or a list of events'}, status=400)
+        if len(events) > intercom.MAX_BATCH:
+            return Response({'detail': f'At most {intercom.MAX_BATCH} events per request'}, status=400)
+        results = intercom.ingest_events(events)
+        created = sum(1 for r in results if r['status'] == 'created')
+        status = 201 if created == len(results) else 207 if created else 400
+        return Response({'created': created, 'failed': len(results) - created, 'results': results}, status=status)
 
 
 # Chat
@@ -933,6 +1176,24 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        # Advance the caller's read pointer (to message_id, or the latest message)
+        resident_id = chat_resident_id(request.user, pk)
+        if resident_id is None:
+            return Response({'detail': 'Not a resident of this room\'s building'}, status=403)
+        try:
+            member = mark_read(pk, resident_id, request.data.get('message_id'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'message_id must be the id of a message in this room'}, status=400)
+        if member is None:
+            return Response({'detail': 'Not a member of this room'}, status=404)
+        return Response({
+            'room_id': member.room_id,
+            'last_read_message_id': member.last_read_message_id,
+            'unread_count': member.unread_count,
+        })
+
 
 class RoomMemberViewSet(viewsets.ModelViewSet):
     queryset = RoomMember.objects.all().select_related('room', 'resident')
@@ -944,6 +1205,70 @@ class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all().select_related('room', 'resident').order_by('-sent_at')
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering_field = 'sent_at'
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        room_id = self.request.query_params.get('room_id')
+        if room_id:
+            # Served by idx_messages_room (room, sent_at)
+            qs = qs.filter(room_id=room_id)
+        return qs
+
+
+class ChatInboxAPIView(APIView):
+    """
+    The caller's rooms with last message and unread count, newest activity first.
+
+    One query: room_members joined to chat_rooms, whose denormalized last-message columns and
+    the member's ``unread_count`` are kept current by fluxora.services.chat.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        members = RoomMember.objects.all()
+        resident_id = request.query_params.get('resident_id')
+        if not (resident_id and has_admin_role(request)):
+            # Residents see their own memberships (business user matched by email)
+            members = members.filter(resident__user__email=request.user.email)
+        if resident_id:
+            members = members.filter(resident_id=resident_id)
+        rows = members.order_by(F('room__last_message_at').desc(nulls_last=True), 'room_id').values(
+            'room_id', 'resident_id', 'unread_count', 'last_read_message_id',
+            'room__name', 'room__building_id', 'room__is_public',
+            'room__last_message_id', 'room__last_message_at',
+            'room__last_message_preview', 'room__last_message_resident_id',
+        )
+        results = [{
+            'room_id': row['room_id'],
+            'name': row['room__name'],
+            'building_id': row['room__building_id'],
+            'is_public': row['room__is_public'],
+            'resident_id': row['resident_id'],
+            'unread_count': row['unread_count'],
+            'last_read_message_id': row['last_read_message_id'],
+            'last_message': None if row['room__last_message_at'] is None else {
+                'id': row['room__last_message_id'],
+                'sent_at': row['room__last_message_at'],
+                'preview': row['room__last_message_preview'],
+                'resident_id': row['room__last_message_resident_id'],
+            },
+        } for row in rows]
+        return Response({'total_unread': sum(r['unread_count'] for r in results), 'results': results})
+
+
+class ChatMetricsAPIView(APIView):
+    """Write-behind buffer depth and flush latency for this process (websocket workers)."""
+    permission_classes = [permissions.IsAuthenticated, IsCommitteeOrAdminOnly]
+
+    def get(self, request):
+        return Response({
+            **message_buffer.metrics(),
+            'history': room_history.metrics(),
+            'websocket': dict(ws_counters),
+            'sse': {**hub.stats, 'subscribers': hub.subscriber_count()},
+        })
 
 
 # Rental
@@ -985,15 +1310,15 @@ class UtilityBillViewSet(viewsets.ModelViewSet):
         rates_json = request.data.get('rates_json')  # optional; implement logic as needed
         if not building_id or not month:
             return Response({'detail': 'building_id and month required'}, status=400)
-        meters = UtilityMeter.objects.filter(unit__building_id=building_id)
-        created = []
-        for m in meters:
-            # Placeholder: create a bill with dummy values
-            bill = UtilityBill.objects.create(
-                meter=m, reading_date=f"{month}-28", reading_value=0, amount=0, status='pending'
-            )
-            created.append(bill.id)
-        return Response({'created_bills': created}, status=201)
+        job = BillingJob.objects.create(
+            job_type=BillingJobType.UTILITY_BILLS,
+            building_id=building_id,
+            params_json={'month': month, 'rates_json': rates_json},
+        )
+        # If the broker is down the job stays queued and the sweeper dispatches it later
+        enqueue(run_billing_job, job.id)
+        job.refresh_from_db()
+        return Response(BillingJobSerializer(job).data, status=202)
 
 
 # Assets
@@ -1010,16 +1335,94 @@ class AssetMaintenanceViewSet(viewsets.ModelViewSet):
 
 
 # Gate & Lift
-class GateEventViewSet(viewsets.ModelViewSet):
+class GateEventViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    # Append-only: the traffic rollups count events as they arrive, so edits would skew them
     queryset = GateEvent.objects.all().select_related('building', 'actor')
     serializer_class = GateEventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    include_archived = True
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        # Controller uploads: a JSON array (or {"events": [...]}) stored with one bulk insert
+        events = request.data.get('events') if isinstance(request.data, dict) else request.data
+        if not isinstance(events, list):
+            return Response({'detail': 'Expected a list of events'}, status=400)
+        if len(events) > gates.MAX_BATCH:
+            return Response({'detail': f'At most {gates.MAX_BATCH} events per request'}, status=400)
+        results = gates.ingest_gate_events(events)
+        created = sum(1 for r in results if r['status'] == 'created')
+        status = 201 if created == len(results) else 207 if created else 400
+        return Response({'created': created, 'failed': len(results) - created, 'results': results}, status=status)
+
+    @action(detail=False, methods=['get'])
+    def traffic(self, request):
+        # Opens/closes per ?period=hour|day over ?start=&end= from the rollup table (default: last 7 days)
+        try:
+            building_id = int(request.query_params.get('building_id'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'building_id is required'}, status=400)
+        period = request.query_params.get('period', RollupPeriod.HOUR)
+        if period not in RollupPeriod.values:
+            return Response({'detail': f"period must be one of {', '.join(RollupPeriod.values)}"}, status=400)
+        end = _parse_when(request.query_params.get('end'), 'end') or now()
+        start = _parse_when(request.query_params.get('start'), 'start') or end - timedelta(days=7)
+        if start >= end:
+            return Response({'detail': 'start must be before end (ISO 8601 datetimes)'}, status=400)
+        return Response({'start': start, 'end': end, **gates.traffic(building_id, period, start, end)})
 
 
 class LiftStatusLogViewSet(viewsets.ModelViewSet):
     queryset = LiftStatusLog.objects.all().select_related('building', 'asset')
     serializer_class = LiftStatusLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    include_archived = True
+
+    @action(detail=False, methods=['get'])
+    def current(self, request):
+        # Current status of every lift in a building, from the snapshot table (no log scan)
+        try:
+            building_id = int(request.query_params.get('building_id'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'building_id is required'}, status=400)
+        return Response({'building_id': building_id, 'lifts': lifts.current_statuses(building_id)})
+
+    @action(detail=False, methods=['get'])
+    def uptime(self, request):
+        # Per-lift time in each status over ?start=&end= (ISO datetimes; default: the last 7 days)
+        try:
+            building_id = int(request.query_params.get('building_id'))
+            asset_id = request.query_params.get('asset_id')
+            asset_id = int(asset_id) if asset_id else None
+        except (TypeError, ValueError):
+            return Response({'detail': 'building_id (and asset_id, if given) must be integers'}, status=400)
+        end = _parse_when(request.query_params.get('end'), 'end') or now()
+        start = _parse_when(request.query_params.get('start'), 'start') or end - timedelta(days=7)
+        if start >= end:
+            return Response({'detail': 'start must be before end (ISO 8601 datetimes)'}, status=400)
+        return Response({
+            'building_id': building_id, 'start': start, 'end': min(end, now()),
+            'lifts': lifts.lift_uptime(building_id, start, end, asset_id),
+        })
+
+
+def _parse_when(value, name):
+    """Aware datetime from an ISO 8601 datetime or date, None when absent; anything else is a 400."""
+    if value in (None, ''):
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime(day.year, day.month, day.day) if day else None
+    except (TypeError, ValueError):
+        # Well-formed but impossible values (2026-02-30, month 13) raise instead of returning None
+        parsed = None
+    if parsed is None:
+        raise ParseError(f'{name} must be an ISO 8601 date or datetime')
+    return make_aware(parsed) if is_naive(parsed) else parsed
 
 
 # Waste & Notifications
@@ -1029,11 +1432,42 @@ class WasteScheduleViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all().select_related('building', 'resident')
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['post'], permission_classes=[IsCommitteeOrAdmin])
+    def broadcast(self, request):
+        # In-app rows are written now; email/SMS/push go through the outbox dispatcher
+        building_id = request.data.get('building_id')
+        message = request.data.get('message')
+        if not building_id or not message:
+            return Response({'detail': 'building_id and message required'}, status=400)
+        channels = request.data.get('channels') or [OutboxChannel.EMAIL]
+        if not isinstance(channels, list) or not all(isinstance(c, str) for c in channels):
+            return Response({'detail': 'channels must be a list of channel names'}, status=400)
+        unknown = set(channels) - set(OutboxChannel.values)
+        if unknown:
+            return Response({'detail': f'Unknown channels: {sorted(unknown)}'}, status=400)
+        resident_ids = request.data.get('resident_ids')
+        if resident_ids is not None and not (
+            isinstance(resident_ids, list)
+            and all(isinstance(r, int) and not isinstance(r, bool) for r in resident_ids)
+        ):
+            return Response({'detail': 'resident_ids must be a list of integers'}, status=400)
+        result = enqueue_notification(
+            building_id, message,
+            type=request.data.get('type') or 'notice',
+            subject=request.data.get('subject') or '',
+            channels=channels,
+            resident_ids=resident_ids,
+        )
+        if result['queued']:
+            # Without a reachable broker the scheduled dispatch picks the rows up
+            enqueue(dispatch_notifications)
+        return Response(result, status=202)
+
 
 # Events & Community
 class EventViewSet(viewsets.ModelViewSet):
@@ -1116,6 +1550,7 @@ class ActivityLogViewSet(viewsets.ModelViewSet):
     queryset = ActivityLog.objects.all().select_related('user')
     serializer_class = ActivityLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
 
 class BuildingSettingViewSet(viewsets.ModelViewSet):
@@ -1124,21 +1559,75 @@ class BuildingSettingViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 
+# Background jobs
+class BillingJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = BillingJob.objects.all().select_related('building').order_by('-created_at')
+    serializer_class = BillingJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        building_id = self.request.query_params.get('building_id')
+        status_q = self.request.query_params.get('status')
+        if building_id:
+            qs = qs.filter(building_id=building_id)
+        if status_q:
+            qs = qs.filter(status=status_q)
+        return qs
+
+    @action(detail=True, methods=['post'], permission_classes=[IsCommitteeOrAdmin])
+    def resume(self, request, pk=None):
+        # Restart a failed/stuck job; it continues after its last committed chunk
+        job = self.get_object()
+        if job.status == JobStatus.COMPLETED:
+            return Response({'detail': 'Job already completed'}, status=400)
+        if job.status != JobStatus.QUEUED and not requeue_billing_job(job.id):
+            return Response({'detail': 'Job is already running'}, status=409)
+        # The worker claims the job; if the broker is down it stays queued for the sweeper
+        # If the broker is down the job stays queued and the sweeper dispatches it later
+        enqueue(run_billing_job, job.id)
+        job.refresh_from_db()
+        return Response(BillingJobSerializer(job).data, status=202)
+
+
 # Admin overview (multi-building)
 class AdminOverviewAPIView(APIView):
+    """Dashboard totals served from the BuildingStats rollup (one indexed read, no table scans)."""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         building_ids = request.query_params.getlist('building_ids[]') or request.query_params.getlist('building_ids')
-        qs_filter = {}
+        try:
+            building_ids = [int(b) for b in building_ids]
+        except ValueError:
+            return Response({'detail': 'building_ids must be integers'}, status=400)
+
+        rows = BuildingStats.objects.all()
         if building_ids:
-            qs_filter['building_id__in'] = building_ids
+            rows = rows.filter(building_id__in=building_ids)
+        rows = list(rows.order_by('building_id'))
+
+        # Buildings without a rollup row yet (new building, fresh deploy) are computed on demand
+        wanted = set(building_ids) if building_ids else set(Building.objects.values_list('id', flat=True))
+        missing = wanted - {r.building_id for r in rows}
+        if missing and stats.refresh_building_stats(missing):
+            rows += list(BuildingStats.objects.filter(building_id__in=missing))
+            rows.sort(key=lambda r: r.building_id)
 
         data = {
-            'invoices': Invoice.objects.filter(**qs_filter).count(),
-            'payments_sum': float(Payment.objects.filter(**qs_filter).aggregate(s=Sum('amount'))['s'] or 0),
-            'open_tickets': Ticket.objects.filter(status='open', **qs_filter).count(),
-            'bookings': Booking.objects.filter(resource__building_id__in=building_ids) .count() if building_ids else Booking.objects.count(),
-            'occupancy': Unit.objects.filter(status='occupied').count(),
+            'invoices': sum(r.invoices_count for r in rows),
+            'payments_sum': float(sum(r.payments_sum for r in rows)),
+            'open_tickets': sum(r.open_tickets for r in rows),
+            'bookings': sum(r.bookings_count for r in rows),
+            'occupancy': sum(r.occupied_units for r in rows),
+            'buildings': [{
+                'building_id': r.building_id,
+                'invoices': r.invoices_count,
+                'payments_sum': float(r.payments_sum),
+                'open_tickets': r.open_tickets,
+                'bookings': r.bookings_count,
+                'occupancy': r.occupied_units,
+                'refreshed_at': r.refreshed_at,
+            } for r in rows],
         }
         return Response(data)
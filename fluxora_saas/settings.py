@@ -179,9 +179,32 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # ?fields= / ?omit= sparse fieldsets (paired with AutoModelSerializer)
+    'DEFAULT_FILTER_BACKENDS': [
+        'fluxora.filters.SparseFieldsetFilter',
+    ],
     'PAGE_SIZE': 20,
 }
 
+# Seconds a resolved business-user role is cached per process (see fluxora.services.roles)
+ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', '60'))
+
+# A running billing job untouched for this many seconds is considered crashed and may be resumed
+BILLING_JOB_STALE_SECONDS = int(os.getenv('BILLING_JOB_STALE_SECONDS', '900'))
+# Queued billing jobs no worker picked up after this many seconds are re-dispatched by the sweeper
+BILLING_JOB_SWEEP_SECONDS = int(os.getenv('BILLING_JOB_SWEEP_SECONDS', '60'))
+
+# Seconds an intercom device id -> building lookup is cached per process (webhook ingestion)
+INTERCOM_DEVICE_CACHE_TTL = int(os.getenv('INTERCOM_DEVICE_CACHE_TTL', '300'))
+# Seconds a resource's free time per day is cached per process (free-slot search; bookings invalidate it)
+BOOKING_SLOT_CACHE_TTL = int(os.getenv('BOOKING_SLOT_CACHE_TTL', '60'))
+# How far ahead a new recurring booking's occurrences are checked for conflicts
+BOOKING_RECURRENCE_CHECK_DAYS = int(os.getenv('BOOKING_RECURRENCE_CHECK_DAYS', '365'))
+# Heartbeats are kept in memory and written through every N seconds; devices silent for longer
+# than INTERCOM_OFFLINE_AFTER_SECONDS are marked offline by the sweep-intercom-devices task
+INTERCOM_HEARTBEAT_FLUSH_SECONDS = int(os.getenv('INTERCOM_HEARTBEAT_FLUSH_SECONDS', '30'))
+INTERCOM_OFFLINE_AFTER_SECONDS = int(os.getenv('INTERCOM_OFFLINE_AFTER_SECONDS', '180'))
+
 # Channels configuration (only if channels is installed)
 if HAS_CHANNELS:
     CHANNEL_REDIS_URL = os.getenv('CHANNEL_REDIS_URL')
@@ -201,6 +224,32 @@ if HAS_CHANNELS:
             }
         }
 
+# Chat websockets (fluxora.services.chat, fluxora.consumers)
+# Write-behind buffer for Message rows
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FLUSH_INTERVAL_MS', '250'))
+CHAT_FLUSH_BATCH = int(os.getenv('CHAT_FLUSH_BATCH', '100'))
+# Recent-history ring buffer sent as a backlog frame on connect
+CHAT_HISTORY_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', '50'))
+CHAT_HISTORY_ROOMS = int(os.getenv('CHAT_HISTORY_ROOMS', '1000'))
+# Seconds before a room's history is re-read; picks up REST messages stored by other processes (0 = never)
+CHAT_HISTORY_TTL = int(os.getenv('CHAT_HISTORY_TTL', '60'))
+# Per-connection inbound frame rate (token bucket) and outbound queue bound
+CHAT_RATE_PER_SEC = float(os.getenv('CHAT_RATE_PER_SEC', '5'))
+CHAT_RATE_BURST = int(os.getenv('CHAT_RATE_BURST', '10'))
+CHAT_SEND_QUEUE = int(os.getenv('CHAT_SEND_QUEUE', '200'))
+
+# Building event stream (ws/buildings/<id>/events/, fluxora.services.events)
+BUILDING_EVENTS_BATCH_MS = int(os.getenv('BUILDING_EVENTS_BATCH_MS', '100'))
+BUILDING_EVENTS_BATCH_MAX = int(os.getenv('BUILDING_EVENTS_BATCH_MAX', '50'))
+BUILDING_EVENTS_RETENTION_HOURS = int(os.getenv('BUILDING_EVENTS_RETENTION_HOURS', '24'))  # resume window
+
+# Device log retention (fluxora.services.retention): intercom/gate/lift/document-audit rows older
+# than this many days move, a whole month at a time, into gzip NDJSON files in default storage
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '180'))
+LOG_ARCHIVE_PREFIX = os.getenv('LOG_ARCHIVE_PREFIX', 'archive')
+LOG_ARCHIVE_DELETE_BATCH = int(os.getenv('LOG_ARCHIVE_DELETE_BATCH', '2000'))
+LOG_ARCHIVE_READER_CACHE = int(os.getenv('LOG_ARCHIVE_READER_CACHE', '8'))  # decoded partitions per process
+
 # Email (SMTP) - fill from environment in production
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
@@ -211,6 +260,18 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'false').lower() == 'true'
 EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'false').lower() == 'true'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 
+# Notification dispatcher (fluxora.services.dispatcher)
+# Per-channel provider overrides, e.g. {'sms': 'myproject.sms.TwilioProvider'}; SMS and push rows
+# fail until a provider is configured for them
+NOTIFICATION_PROVIDERS = {}
+NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', '4'))
+# Sends per second per channel (0 = unlimited)
+NOTIFICATION_RATE_LIMITS = {
+    'email': float(os.getenv('NOTIFICATION_EMAIL_RATE', '20')),
+    'sms': float(os.getenv('NOTIFICATION_SMS_RATE', '5')),
+    'push': float(os.getenv('NOTIFICATION_PUSH_RATE', '100')),
+}
+
 # Optional: S3 storage (production)
 if os.getenv('AWS_STORAGE_BUCKET_NAME'):
     try:
@@ -232,6 +293,9 @@ CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Run tasks in-process (no broker needed), e.g. for local dev and tests
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
+CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
 
 # Periodic tasks (Celery Beat)
 try:
@@ -241,6 +305,34 @@ try:
             'task': 'fluxora.tasks.send_invoice_reminders',
             'schedule': crontab(hour=8, minute=0),
         },
+        'dispatch-notifications': {
+            'task': 'fluxora.tasks.dispatch_notifications',
+            'schedule': crontab(),  # every minute; picks up retries whose backoff has elapsed
+        },
+        'sweep-intercom-devices': {
+            'task': 'fluxora.tasks.sweep_intercom_devices',
+            'schedule': crontab(),  # every minute
+        },
+        'prune-building-events': {
+            'task': 'fluxora.tasks.prune_building_events',
+            'schedule': crontab(minute=30),
+        },
+        'archive-device-logs': {
+            'task': 'fluxora.tasks.archive_device_logs',
+            'schedule': crontab(hour=3, minute=15),
+        },
+        'reconcile-gate-rollups': {
+            'task': 'fluxora.tasks.reconcile_gate_rollups',
+            'schedule': crontab(hour=3, minute=45),
+        },
+        'sweep-billing-jobs': {
+            'task': 'fluxora.tasks.sweep_billing_jobs',
+            'schedule': crontab(),  # every minute; picks up jobs queued while the broker was down
+        },
+        'refresh-dashboard-stats': {
+            'task': 'fluxora.tasks.refresh_dashboard_stats',
+            'schedule': crontab(minute='*/15'),
+        },
     }
 except Exception:
     CELERY_BEAT_SCHEDULE = {}